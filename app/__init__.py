@@ -5,7 +5,6 @@ from flask_login import LoginManager
 from flask_apscheduler import APScheduler
 from datetime import datetime
 from flask_mail import Mail, Message
-from flask_migrate import Migrate
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -16,37 +15,67 @@ mail = Mail()
 scheduler = APScheduler()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
-migrate = Migrate()
 
 
-def check_reminders(app):
-    """Background job to send due reminders."""
-    from app.models import Reminder, Task  # avoid circular import
+# Ids per claim statement; SQLite allows 32766 bound parameters
+_CLAIM_CHUNK_SIZE = 1000
+
+
+def _claim_reminders(now, reminder_ids=None):
+    """Mark due reminders as sent before sending them; return our claim token.
+    
+    The scheduler leader and the process that created a reminder may both
+    dispatch it. The conditional update lets only one of them send it, and
+    the claim token tells each which rows it won. Without ``reminder_ids``
+    every due reminder is claimed in one statement; otherwise the ids go in
+    chunks that stay well within the database's limit on bound parameters.
+    Returns None if nothing was claimed.
+    """
+    from app.models import Reminder
+    import uuid
+    
+    claim_token = uuid.uuid4().hex
+    chunks = [None] if reminder_ids is None else [
+        reminder_ids[start:start + _CLAIM_CHUNK_SIZE]
+        for start in range(0, len(reminder_ids), _CLAIM_CHUNK_SIZE)
+    ]
+    claimed = 0
+    for chunk in chunks:
+        query = Reminder.query.filter(Reminder.remind_at <= now, Reminder.sent.is_(False))
+        if chunk is not None:
+            query = query.filter(Reminder.id.in_(chunk))
+        claimed += query.update(
+            {Reminder.sent: True, Reminder.claimed_by: claim_token},
+            synchronize_session=False
+        )
+    db.session.commit()
+    return claim_token if claimed else None
+
+
+def check_reminders(app, reminder_ids=None):
+    """Send due reminders, optionally limited to the given reminder ids."""
+    from app.models import Reminder  # avoid circular import
+    from app.mailer import BatchMailer
+    from app.metrics import metrics
+    from sqlalchemy.orm import joinedload
     
     try:
         with app.app_context():
-            # Check if tables exist
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            if 'reminder' not in tables:
-                print("⚠️ Reminder table not found, skipping reminder check")
+            claim_token = _claim_reminders(datetime.utcnow(), reminder_ids)
+            if claim_token is None:
                 return
             
-            now = datetime.utcnow()
-            due = Reminder.query.filter(
-                Reminder.remind_at <= now,
-                Reminder.sent.is_(False)
-            ).all()
+            # Load the claimed reminders together with their task and user in one query
+            due = Reminder.query.options(
+                joinedload(Reminder.task),
+                joinedload(Reminder.user)
+            ).filter(Reminder.claimed_by == claim_token).all()
             
-            for r in due:
-                try:
-                    if "Task Reminder:" in r.message:
-                        task_title = r.message.replace("Task Reminder: ", "")
-                        task = Task.query.filter_by(
-                            user_id=r.user_id,
-                            title=task_title
-                        ).first()
+            # Reuse one SMTP session for the whole run
+            with BatchMailer() as mailer:
+                for r in due:
+                    try:
+                        task = r.task
                         if task:
                             email_body = f"""
 Hello {r.user.first_name},
@@ -72,14 +101,14 @@ Your Task Management System
                             )
                         else:
                             msg = Message("Your Reminder", recipients=[r.user.email], body=r.message)
-                    else:
-                        msg = Message("Your Reminder", recipients=[r.user.email], body=r.message)
                     
-                    mail.send(msg)
-                    r.sent = True
-                    print(f"Sent reminder to {r.user.email}: {r.message}")
-                except Exception as e:
-                    print(f"Error sending reminder {r.id}: {e}")
+                        mailer.send(msg)
+                        metrics.reminder_lag.observe((datetime.utcnow() - r.remind_at).total_seconds())
+                        print(f"Sent reminder to {r.user.email}: {r.message}")
+                    except Exception as e:
+                        # Release the claim so the reminder is retried
+                        r.sent = False
+                        print(f"Error sending reminder {r.id}: {e}")
             db.session.commit()
     except Exception as e:
         print(f"Error in check_reminders: {e}")
@@ -87,97 +116,144 @@ Your Task Management System
         traceback.print_exc()
 
 
-def send_periodic_notifications(app):
-    """Send periodic notifications to logged-in users for their own tasks every 5 minutes."""
-    from app.models import Task, User
-    from datetime import datetime
-    
-    try:
-        with app.app_context():
-            # Check if tables exist
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            if 'user' not in tables or 'task' not in tables:
-                print("⚠️ Required tables not found, skipping periodic notifications")
-                return
-            
-            try:
-                last_notification_key = 'last_periodic_notification'
-                last_sent = app.config.get(last_notification_key)
-                now = datetime.utcnow()
-                
-                if last_sent and (now - last_sent).total_seconds() < 240:
-                    print("⏰ Skipping notification - sent recently")
-                    return
-                
-                users_with_tasks = User.query.join(Task).filter(
-                    Task.status.in_(['Pending', 'In Progress'])
-                ).distinct().all()
-                
-                if not users_with_tasks:
-                    print("⚠️ No users with pending tasks found")
-                    return
-                
-                sent_count = 0
-                for user in users_with_tasks:
-                    if not user.email or not user.email.endswith('@gmail.com'):
-                        print(f"⚠️ Skipping {user.username} - no valid Gmail address")
-                        continue
-                    
-                    user_tasks = Task.query.filter(
-                        Task.user_id == user.id,
-                        Task.status.in_(['Pending', 'In Progress'])
-                    ).all()
-                    
-                    if not user_tasks:
-                        continue
-                    
-                    task_list = []
-                    for task in user_tasks:
-                        priority_emoji = {
-                            'Low': '🟢',
-                            'Medium': '🟡', 
-                            'High': '🟠',
-                            'Urgent': '🔴'
-                        }.get(task.priority, '⚪')
-                        
-                        task_list.append(f"""
+def _format_digest(first_name, tasks):
+    """Build the periodic task-status email body for one user."""
+    task_list = []
+    for task in tasks:
+        priority_emoji = {
+            'Low': '🟢',
+            'Medium': '🟡', 
+            'High': '🟠',
+            'Urgent': '🔴'
+        }.get(task.priority, '⚪')
+        
+        task_list.append(f"""
 {priority_emoji} {task.title} ({task.status})
    📅 Due: {task.scheduled_date.strftime('%B %d, %Y') if task.scheduled_date else 'No date set'}
    ⏰ Time: {task.scheduled_time.strftime('%I:%M %p') if task.scheduled_time else 'No time set'}
    ⏱️ Duration: {f'{task.estimated_duration} minutes' if task.estimated_duration else 'Not estimated'}""")
-                    
-                    email_body = f"""
-Hello {user.first_name},
+    
+    return f"""
+Hello {first_name},
 
 Here's your current task status update:
 
 {''.join(task_list)}
 
-You have {len(user_tasks)} pending task{'s' if len(user_tasks) != 1 else ''} to work on.
+You have {len(tasks)} pending task{'s' if len(tasks) != 1 else ''} to work on.
 
 Keep up the great work! 🚀
 
 Best regards,
 Your Task Management System
-                    """.strip()
-                    
-                    try:
-                        msg = Message(
-                            f"📋 Your Task Update ({len(user_tasks)} tasks)",
-                            recipients=[user.email],
-                            body=email_body
+    """.strip()
+
+
+def send_periodic_notifications(app):
+    """Send periodic notifications to logged-in users for their own tasks every 5 minutes.
+    
+    Users are processed in chunks of DIGEST_CHUNK_SIZE ordered by user id. Each
+    chunk streams its (user, task) rows from a single ordered query and ends
+    its transaction before the next one starts. The last finished user id is
+    kept as a cursor so an interrupted run resumes where it stopped. The cursor
+    and the time of the last complete run are job state in the database, so
+    they hold across restarts and whichever process is the scheduler leader.
+    The task rows are read through the read-only engine. Only addresses
+    matching DIGEST_EMAIL_PATTERN get the digest.
+    """
+    from app.models import Task, User
+    from app.database import read_db
+    from app.mailer import BatchMailer
+    from app.jobs import add_items, out_of_time, load_state, save_state
+    from datetime import datetime
+    from itertools import groupby
+    from sqlalchemy import select
+    
+    try:
+        with app.app_context():
+            try:
+                state_key = 'periodic_notifications'
+                state = load_state(state_key, {})
+                last_sent = state.get('last_sent') and datetime.fromisoformat(state['last_sent'])
+                cursor = state.get('cursor', 0)
+                now = datetime.utcnow()
+                
+                # A resumed run skips the throttle so it can finish
+                if not cursor and last_sent and (now - last_sent).total_seconds() < 240:
+                    print("⏰ Skipping notification - sent recently")
+                    return
+                
+                open_statuses = ['Pending', 'In Progress']
+                chunk_size = int(app.config.get("DIGEST_CHUNK_SIZE", 500))
+                yield_per = int(app.config.get("DIGEST_YIELD_PER", 1000))
+                email_pattern = app.config.get("DIGEST_EMAIL_PATTERN", "%@gmail.com")
+                sent_count = 0
+                
+                # Reuse one SMTP session for the whole run
+                with BatchMailer() as mailer:
+                    while True:
+                        # Upper bound of the next chunk of users with open tasks
+                        chunk_ids = read_db.session.execute(
+                            select(Task.user_id)
+                            .where(Task.user_id > cursor, Task.status.in_(open_statuses))
+                            .distinct()
+                            .order_by(Task.user_id)
+                            .limit(chunk_size)
+                        ).scalars().all()
+                        if not chunk_ids:
+                            break
+                        chunk_end = chunk_ids[-1]
+                        
+                        rows = read_db.session.execute(
+                            select(
+                                User.id.label('user_id'), User.first_name, User.email,
+                                Task.title, Task.status, Task.priority,
+                                Task.scheduled_date, Task.scheduled_time, Task.estimated_duration
+                            )
+                            .join(User, User.id == Task.user_id)
+                            .where(
+                                Task.user_id > cursor,
+                                Task.user_id <= chunk_end,
+                                Task.status.in_(open_statuses),
+                                User.email.like(email_pattern)
+                            )
+                            .order_by(Task.user_id, Task.id)
+                            .execution_options(yield_per=yield_per)
                         )
-                        mail.send(msg)
-                        sent_count += 1
-                        print(f"✅ Sent notification to {user.email} for {len(user_tasks)} tasks")
-                    except Exception as email_error:
-                        print(f"❌ Failed to send email to {user.email}: {email_error}")
+                        
+                        chunk_sent = 0
+                        for user_id, user_rows in groupby(rows, key=lambda row: row.user_id):
+                            user_tasks = list(user_rows)
+                            first = user_tasks[0]
+                            try:
+                                msg = Message(
+                                    f"📋 Your Task Update ({len(user_tasks)} tasks)",
+                                    recipients=[first.email],
+                                    body=_format_digest(first.first_name, user_tasks)
+                                )
+                                mailer.send(msg)
+                                chunk_sent += 1
+                            except Exception as email_error:
+                                print(f"❌ Failed to send email to {first.email}: {email_error}")
+                        
+                        # End the read transaction before the next chunk
+                        read_db.session.rollback()
+                        cursor = chunk_end
+                        save_state(state_key, dict(state, cursor=cursor))
+                        db.session.commit()
+                        sent_count += chunk_sent
+                        add_items(chunk_sent)
+                        print(f"✅ Sent {chunk_sent} notifications for users up to id {chunk_end}")
+                        if out_of_time():
+                            # The cursor is kept, so the next run resumes here
+                            print(f"⏳ Digest out of time after {sent_count} notifications, resuming next run")
+                            return
                 
-                app.config[last_notification_key] = now
+                save_state(state_key, {'cursor': 0, 'last_sent': now.isoformat()})
+                db.session.commit()
                 print(f"📧 Total notifications sent: {sent_count}")
             except Exception as e:
+                db.session.rollback()
                 print(f"Error sending periodic notifications: {e}")
     except Exception as e:
         print(f"Error in send_periodic_notifications: {e}")
@@ -185,40 +261,167 @@ Your Task Management System
         traceback.print_exc()
 
 
-def cleanup_expired_otps(app):
-    """Clean up expired OTPs every 5 minutes."""
-    from app.models import LoginOTP
-    from datetime import datetime
+def _delete_token_batches(model, condition, batch_size, max_batches):
+    """Delete rows of ``model`` matching ``condition``, one chunk per transaction."""
+    from app.jobs import add_items, out_of_time
+    from sqlalchemy import select
+    
+    removed = 0
+    # Bounded per run; whatever is left is picked up next time
+    for _ in range(max_batches):
+        chunk = select(model.id).where(condition).limit(batch_size)
+        count = model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += count
+        add_items(count)
+        if count < batch_size or out_of_time():
+            break
+    return removed
+
+
+def cleanup_expired_tokens(app):
+    """Delete expired login links and reset/verification tokens every 5 minutes.
+    
+    Used tokens are kept for TOKEN_GC_USED_GRACE_HOURS after they were issued
+    (so a second click still gets a sensible message) and deleted afterwards.
+    Sent and failed outbox emails, whose bodies carry the same links and codes,
+    are deleted OUTBOX_RETENTION_HOURS after their last delivery attempt.
+    Each table is cleaned in chunks of TOKEN_GC_BATCH_SIZE rows, at most
+    TOKEN_GC_MAX_BATCHES chunks per table and condition per run.
+    """
+    from app.models import LoginOTP, PasswordResetToken, EmailVerificationToken, OutboxMessage
+    from datetime import datetime, timedelta
     
     try:
         with app.app_context():
-            # Check if tables exist
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            if 'login_otp' not in tables:
-                print("⚠️ LoginOTP table not found, skipping cleanup")
-                return
-            
             try:
                 now = datetime.utcnow()
-                expired_otps = LoginOTP.query.filter(LoginOTP.expires_at < now).all()
+                batch_size = int(app.config.get("TOKEN_GC_BATCH_SIZE", 1000))
+                max_batches = int(app.config.get("TOKEN_GC_MAX_BATCHES", 20))
+                used_before = now - timedelta(hours=int(app.config.get("TOKEN_GC_USED_GRACE_HOURS", 24)))
                 
-                if expired_otps:
-                    for otp in expired_otps:
-                        db.session.delete(otp)
-                    db.session.commit()
-                    print(f"🧹 Cleaned up {len(expired_otps)} expired OTPs")
+                expired = used = 0
+                removed = {}
+                for name, model in (
+                    ('login links', LoginOTP),
+                    ('password reset tokens', PasswordResetToken),
+                    ('email verification tokens', EmailVerificationToken),
+                ):
+                    table_expired = _delete_token_batches(
+                        model, model.expires_at < now, batch_size, max_batches
+                    )
+                    table_used = _delete_token_batches(
+                        model, (model.used.is_(True)) & (model.created_at < used_before), batch_size, max_batches
+                    )
+                    expired += table_expired
+                    used += table_used
+                    removed[name] = table_expired + table_used
+                
+                retained_after = now - timedelta(hours=int(app.config.get("OUTBOX_RETENTION_HOURS", 24)))
+                emails = _delete_token_batches(
+                    OutboxMessage,
+                    OutboxMessage.status.in_(('sent', 'failed')) & (OutboxMessage.next_attempt_at < retained_after),
+                    batch_size, max_batches
+                )
+                
+                if expired or used or emails:
+                    summary = ', '.join(f"{count} {name}" for name, count in removed.items() if count)
+                    print(f"🧹 Cleaned up {expired} expired and {used} used tokens ({summary or 'none'}), "
+                          f"{emails} delivered emails")
                 else:
-                    print("🧹 No expired OTPs to clean up")
+                    print("🧹 No expired tokens to clean up")
             except Exception as e:
-                print(f"Error cleaning up expired OTPs: {e}")
+                db.session.rollback()
+                print(f"Error cleaning up expired tokens: {e}")
     except Exception as e:
-        print(f"Error in cleanup_expired_otps: {e}")
+        print(f"Error in cleanup_expired_tokens: {e}")
         import traceback
         traceback.print_exc()
 
 
+def _migration_heads(directory):
+    """Return the head revisions of the migration scripts in ``directory``.
+    
+    Reads the ``revision``/``down_revision`` assignments directly, which is much
+    cheaper at startup than loading Alembic's script directory.
+    """
+    import re
+    from pathlib import Path
+    
+    revisions, parents = set(), set()
+    for script in Path(directory).glob("*.py"):
+        source = script.read_text(encoding="utf-8")
+        revision = re.search(r"^revision = ['\"](\w+)['\"]", source, re.MULTILINE)
+        down_revision = re.search(r"^down_revision = (.+)$", source, re.MULTILINE)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+def _check_schema_version(app):
+    """Log a warning unless the database is at the latest migration."""
+    from pathlib import Path
+    from sqlalchemy import text
+    
+    heads = _migration_heads(Path(app.root_path).parent / "migrations" / "versions")
+    try:
+        with db.engine.connect() as connection:
+            current = set(connection.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    except Exception:
+        current = set()
+    if not heads <= current:
+        app.logger.warning(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+            f"latest migration is {', '.join(sorted(heads))}. Run `flask db upgrade`."
+        )
+        return False
+    return True
+
+
+def _env_int(name):
+    """Return the integer value of environment variable ``name``, or None if unset."""
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else None
+
+
+def _env_bool(name):
+    """Return the boolean value of environment variable ``name``, or None if unset."""
+    value = os.environ.get(name, "").strip().lower()
+    return value == "true" if value else None
+
+
+def _background_services_enabled():
+    """Return True unless running a Flask CLI command other than ``flask run``.
+    
+    ``flask db upgrade`` and friends only need the app object; starting the
+    scheduler and worker threads for them just slows the command down.
+    """
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+        return True
+    import click
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name == "run"
+
+
+def _running_migrations():
+    """Return True when running ``flask db ...``.
+    
+    Alembic owns the schema there, so the app must not create tables itself.
+    """
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+        return False
+    import sys
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg in ("--app", "-A", "--env-file", "-e"):
+            next(args, None)  # the option's value
+        elif not arg.startswith("-"):
+            return arg == "db"
+    return False
+
+
 def create_app():
     app = Flask(__name__)
     
@@ -244,8 +447,23 @@ def create_app():
     
     # Determine the database file path
     db_file_path = None
+    server_database = False
+    
+    if database_url.startswith("postgres://"):
+        # Heroku-style scheme, which SQLAlchemy no longer accepts
+        database_url = "postgresql://" + database_url[len("postgres://"):]
     
-    if database_url and not use_appdata:
+    if database_url and not database_url.startswith("sqlite"):
+        # Server databases (PostgreSQL, MySQL, ...) are used as given
+        try:
+            from sqlalchemy.engine import make_url
+            url = make_url(database_url)
+            app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+            server_database = True
+            app.logger.info(f"Using {url.get_backend_name()} database: {url.render_as_string(hide_password=True)}")
+        except Exception as e:
+            app.logger.warning(f"Invalid DATABASE_URL: {e}, using default location")
+    elif database_url and not use_appdata:
         # Try to use DATABASE_URL if provided and we're not forcing AppData
         try:
             # Validate the URI format
@@ -259,15 +477,15 @@ def create_app():
                 if not db_file_path.is_absolute():
                     db_file_path = base_dir / db_file_path
                 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-                print(f"Using DATABASE_URL from environment: {database_url}")
+                app.logger.info(f"Using DATABASE_URL from environment: {database_url}")
             else:
                 raise ValueError("Invalid SQLite URI format")
         except Exception as e:
-            print(f"Invalid DATABASE_URL: {e}, using default location")
+            app.logger.warning(f"Invalid DATABASE_URL: {e}, using default location")
             database_url = ""  # Fall through to default
             db_file_path = None
     
-    if not db_file_path:
+    if not db_file_path and not server_database:
         # Determine database file path
         if os.name == 'nt':  # Windows
             # Use AppData location (most reliable for Windows, especially with OneDrive)
@@ -275,37 +493,39 @@ def create_app():
             if not app_data or not app_data.exists():
                 # Fallback to temp directory if LOCALAPPDATA not available
                 app_data = Path(tempfile.gettempdir())
-                print(f"LOCALAPPDATA not found, using temp directory: {app_data}")
+                app.logger.info(f"LOCALAPPDATA not found, using temp directory: {app_data}")
             
             db_dir = app_data / 'college_project'
             db_dir.mkdir(parents=True, exist_ok=True)
             db_file_path = db_dir / 'site.db'
             
             # Test that SQLite can actually access this path
-            # This is critical for paths with spaces on Windows
-            test_passed = False
-            try:
-                # Test SQLite can create/open the database file
-                test_conn = sqlite3.connect(str(db_file_path), timeout=10.0)
-                test_conn.execute("SELECT 1")
-                test_conn.close()
-                test_passed = True
-                # Clean up test database if it was just created and is empty
-                if db_file_path.exists() and db_file_path.stat().st_size < 100:
-                    try:
-                        db_file_path.unlink()
-                    except:
-                        pass
-            except Exception as e:
-                print(f"Warning: Cannot access database at {db_file_path}: {e}")
-                test_passed = False
+            # This is critical for paths with spaces on Windows. An existing
+            # database has been opened from here before, so only a new path is probed.
+            test_passed = db_file_path.exists() and db_file_path.stat().st_size >= 100
+            if not test_passed:
+                try:
+                    # Test SQLite can create/open the database file
+                    test_conn = sqlite3.connect(str(db_file_path), timeout=10.0)
+                    test_conn.execute("SELECT 1")
+                    test_conn.close()
+                    test_passed = True
+                    # Clean up test database if it was just created and is empty
+                    if db_file_path.exists() and db_file_path.stat().st_size < 100:
+                        try:
+                            db_file_path.unlink()
+                        except:
+                            pass
+                except Exception as e:
+                    app.logger.warning(f"Cannot access database at {db_file_path}: {e}")
+                    test_passed = False
             
             # If test failed, try temp directory as fallback
             if not test_passed:
                 temp_dir = Path(tempfile.gettempdir()) / 'college_project'
                 temp_dir.mkdir(parents=True, exist_ok=True)
                 db_file_path = temp_dir / 'site.db'
-                print(f"Using fallback location: {db_file_path}")
+                app.logger.warning(f"Using fallback location: {db_file_path}")
                 # Test this location too
                 try:
                     test_conn = sqlite3.connect(str(db_file_path), timeout=10.0)
@@ -317,7 +537,7 @@ def create_app():
                         except:
                             pass
                 except Exception as e2:
-                    print(f"Error: Cannot access fallback location either: {e2}")
+                    app.logger.error(f"Cannot access fallback location either: {e2}")
                     raise RuntimeError(f"Cannot create database file. Tried: {app_data / 'college_project' / 'site.db'} and {db_file_path}")
         else:
             # Unix-like systems
@@ -337,15 +557,27 @@ def create_app():
         
         app.config["SQLALCHEMY_DATABASE_URI"] = db_uri
         
-        print(f"Database file: {db_path_absolute}")
-        print(f"Database URI: {db_uri}")
-        print(f"✅ Database path tested and accessible")
+        app.logger.info(f"Database file: {db_path_absolute}")
+        app.logger.info(f"Database URI: {db_uri}")
     
     # Store the actual file path for later use
     app.config["DATABASE_FILE_PATH"] = str(db_file_path.resolve()) if db_file_path else None
     
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Connection pooling; unset values use the defaults for the database backend
+    app.config.update(
+        DB_POOL_SIZE=_env_int("DB_POOL_SIZE"),
+        DB_MAX_OVERFLOW=_env_int("DB_MAX_OVERFLOW"),
+        DB_POOL_TIMEOUT=_env_int("DB_POOL_TIMEOUT"),
+        DB_POOL_RECYCLE=_env_int("DB_POOL_RECYCLE"),
+        DB_POOL_PRE_PING=_env_bool("DB_POOL_PRE_PING"),
+        DB_CONNECT_TIMEOUT=_env_int("DB_CONNECT_TIMEOUT"),
+        DB_STATEMENT_TIMEOUT_MS=_env_int("DB_STATEMENT_TIMEOUT_MS"),
+    )
+    from app.database import engine_options
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+
     app.config.update(
         MAIL_SERVER=os.environ.get("MAIL_SERVER", "smtp.gmail.com"),
         MAIL_PORT=int(os.environ.get("MAIL_PORT", "587")),
@@ -355,6 +587,138 @@ def create_app():
         MAIL_DEFAULT_SENDER=os.environ.get("MAIL_DEFAULT_SENDER", os.environ.get("MAIL_USERNAME", "noreply@example.com"))
     )
 
+    # Batched SMTP delivery for background jobs
+    app.config.update(
+        MAIL_MAX_PER_CONNECTION=int(os.environ.get("MAIL_MAX_PER_CONNECTION", "100")),
+        MAIL_MAX_RECONNECTS=int(os.environ.get("MAIL_MAX_RECONNECTS", "2")),
+    )
+
+    # Periodic digest batching
+    app.config.update(
+        DIGEST_CHUNK_SIZE=int(os.environ.get("DIGEST_CHUNK_SIZE", "500")),
+        DIGEST_YIELD_PER=int(os.environ.get("DIGEST_YIELD_PER", "1000")),
+        DIGEST_EMAIL_PATTERN=os.environ.get("DIGEST_EMAIL_PATTERN", "%@gmail.com"),
+    )
+
+    # Page sizes for the keyset-paginated task list and history
+    app.config.update(
+        TASKS_PER_PAGE=int(os.environ.get("TASKS_PER_PAGE", "50")),
+        HISTORY_PER_PAGE=int(os.environ.get("HISTORY_PER_PAGE", "100")),
+    )
+
+    # Rows per transaction for set-based bulk deletes
+    app.config["BULK_CHUNK_SIZE"] = int(os.environ.get("BULK_CHUNK_SIZE", "2000"))
+
+    # Full task snapshot every N history entries, deltas in between
+    app.config["HISTORY_SNAPSHOT_INTERVAL"] = int(os.environ.get("HISTORY_SNAPSHOT_INTERVAL", "10"))
+
+    # Cold-storage tier for old history and long-completed tasks
+    app.config.update(
+        ARCHIVE_HISTORY_AFTER_DAYS=int(os.environ.get("ARCHIVE_HISTORY_AFTER_DAYS", "90")),
+        ARCHIVE_TASKS_AFTER_DAYS=int(os.environ.get("ARCHIVE_TASKS_AFTER_DAYS", "30")),
+        ARCHIVE_BATCH_SIZE=int(os.environ.get("ARCHIVE_BATCH_SIZE", "500")),
+        ARCHIVE_MAX_BATCHES=int(os.environ.get("ARCHIVE_MAX_BATCHES", "20")),
+        ARCHIVE_INTERVAL_HOURS=int(os.environ.get("ARCHIVE_INTERVAL_HOURS", "6")),
+    )
+
+    # Expired and used token cleanup
+    app.config.update(
+        TOKEN_GC_BATCH_SIZE=int(os.environ.get("TOKEN_GC_BATCH_SIZE", "1000")),
+        TOKEN_GC_MAX_BATCHES=int(os.environ.get("TOKEN_GC_MAX_BATCHES", "20")),
+        TOKEN_GC_USED_GRACE_HOURS=int(os.environ.get("TOKEN_GC_USED_GRACE_HOURS", "24")),
+    )
+
+    # Scheduler job framework
+    app.config.update(
+        JOB_TIME_BUDGET_SECONDS=float(os.environ.get("JOB_TIME_BUDGET_SECONDS", "60")),
+        JOB_JITTER_SECONDS=int(os.environ.get("JOB_JITTER_SECONDS", "15")),
+    )
+
+    # Scheduler leader election across worker processes
+    app.config.update(
+        LEADER_LEASE_SECONDS=int(os.environ.get("LEADER_LEASE_SECONDS", "30")),
+        LEADER_HEARTBEAT_SECONDS=float(os.environ.get("LEADER_HEARTBEAT_SECONDS", "10")),
+    )
+
+    # SQLite tuning (WAL, busy timeout, ...) and the read-only engine
+    app.config.update(
+        SQLITE_PROFILE=os.environ.get("SQLITE_PROFILE", "production").strip().lower(),
+        SQLITE_BUSY_TIMEOUT_MS=int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        SQLITE_MMAP_SIZE=int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        SQLITE_CACHE_SIZE_KIB=int(os.environ.get("SQLITE_CACHE_SIZE_KIB", "16384")),
+        DB_READ_ENGINE=os.environ.get("DB_READ_ENGINE", "True").lower() == "true",
+    )
+
+    # Startup: "create_all" creates missing tables on boot (development),
+    # "migrations" only checks the database is at the latest Alembic revision
+    app.config["DB_SCHEMA_CHECK"] = os.environ.get("DB_SCHEMA_CHECK", "create_all").strip().lower()
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = os.environ.get(
+        "JINJA_BYTECODE_CACHE_DIR", str(base_dir / "instance" / "jinja_cache")
+    )
+
+    # Password hashing parameters and the bounded hashing pool
+    app.config.update(
+        PASSWORD_HASH_METHOD=os.environ.get("PASSWORD_HASH_METHOD", "scrypt"),
+        PASSWORD_HASH_WORKERS=int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+        PASSWORD_HASH_MAX_PENDING=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32")),
+        PASSWORD_HASH_TIMEOUT=float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10")),
+    )
+
+    # Per-process cache behind Flask-Login's user loader
+    app.config.update(
+        USER_CACHE_SIZE=int(os.environ.get("USER_CACHE_SIZE", "1024")),
+        USER_CACHE_TTL_SECONDS=float(os.environ.get("USER_CACHE_TTL_SECONDS", "60")),
+    )
+
+    # Rate limits for routes that send email ("count/seconds", per account and per IP);
+    # RATE_LIMIT_STORAGE is "memory" (per process) or a SQLite file shared by workers
+    app.config.update(
+        RATE_LIMIT_ENABLED=os.environ.get("RATE_LIMIT_ENABLED", "True").lower() == "true",
+        RATE_LIMIT_STORAGE=os.environ.get("RATE_LIMIT_STORAGE", "memory"),
+        RATE_LIMIT_LOGIN_ACCOUNT=os.environ.get("RATE_LIMIT_LOGIN_ACCOUNT", "10/900"),
+        RATE_LIMIT_LOGIN_IP=os.environ.get("RATE_LIMIT_LOGIN_IP", "30/900"),
+        RATE_LIMIT_EMAIL_ACCOUNT=os.environ.get("RATE_LIMIT_EMAIL_ACCOUNT", "3/900"),
+        RATE_LIMIT_EMAIL_IP=os.environ.get("RATE_LIMIT_EMAIL_IP", "10/900"),
+        SECURITY_ALERT_WINDOW_SECONDS=int(os.environ.get("SECURITY_ALERT_WINDOW_SECONDS", "900")),
+    )
+
+    # SQL instrumentation: per-request/per-job query counts, N+1 warnings, slow query log
+    app.config.update(
+        SQL_STATS_ENABLED=os.environ.get("SQL_STATS_ENABLED", "True").lower() == "true",
+        SQL_STATS_HEADER=os.environ.get("SQL_STATS_HEADER", "False").lower() == "true",
+        SQL_SLOW_QUERY_MS=float(os.environ.get("SQL_SLOW_QUERY_MS", "200")),
+        SQL_SLOW_QUERY_LOG=os.environ.get("SQL_SLOW_QUERY_LOG", str(base_dir / "instance" / "slow_queries.jsonl")),
+        SQL_N_PLUS_ONE_THRESHOLD=int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", "5")),
+    )
+
+    # Prometheus-format /metrics; without a token only local requests are served
+    app.config.update(
+        METRICS_ENABLED=os.environ.get("METRICS_ENABLED", "True").lower() == "true",
+        METRICS_TOKEN=os.environ.get("METRICS_TOKEN", ""),
+    )
+
+    # Background account deletion
+    app.config.update(
+        ACCOUNT_DELETION_CHUNK_SIZE=int(os.environ.get("ACCOUNT_DELETION_CHUNK_SIZE", "1000")),
+        ACCOUNT_DELETION_POLL_INTERVAL=float(os.environ.get("ACCOUNT_DELETION_POLL_INTERVAL", "30")),
+    )
+
+    # In-memory reminder scheduling
+    app.config.update(
+        REMINDER_HORIZON_MINUTES=int(os.environ.get("REMINDER_HORIZON_MINUTES", "60")),
+        REMINDER_RESYNC_MINUTES=int(os.environ.get("REMINDER_RESYNC_MINUTES", "10")),
+    )
+
+    # Background outbox delivery
+    app.config.update(
+        OUTBOX_WORKERS=int(os.environ.get("OUTBOX_WORKERS", "2")),
+        OUTBOX_BATCH_SIZE=int(os.environ.get("OUTBOX_BATCH_SIZE", "20")),
+        OUTBOX_POLL_INTERVAL=float(os.environ.get("OUTBOX_POLL_INTERVAL", "5")),
+        OUTBOX_MAX_ATTEMPTS=int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "5")),
+        OUTBOX_RETRY_BASE_SECONDS=int(os.environ.get("OUTBOX_RETRY_BASE_SECONDS", "30")),
+        OUTBOX_RETENTION_HOURS=int(os.environ.get("OUTBOX_RETENTION_HOURS", "24")),
+    )
+
     if os.environ.get("FLASK_ENV") == "development" or os.environ.get("FLASK_DEBUG") == "1":
         app.config["TEMPLATES_AUTO_RELOAD"] = os.environ.get("TEMPLATES_AUTO_RELOAD", "True").lower() == "true"
         app.config["SEND_FILE_MAX_AGE_DEFAULT"] = int(os.environ.get("SEND_FILE_MAX_AGE_DEFAULT", "0"))
@@ -373,18 +737,35 @@ def create_app():
             return response
 
     db.init_app(app)
+    from app.passwords import passwords
+    passwords.init_app(app)
+    from app.database import read_db
+    read_db.init_app(app)
+    from app.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+    from app.query_stats import query_stats
+    with app.app_context():
+        query_stats.init_app(app, [db.engine, read_db.engine])
+    from app.metrics import metrics
+    metrics.init_app(app)
     mail.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
     
-    # Import all models BEFORE creating tables
-    # This ensures SQLAlchemy knows about all models
-    from app.models import (
-        User, Task, TaskHistory, Reminder, 
-        PasswordResetToken, EmailVerificationToken, LoginOTP
-    )
+    in_cli = os.environ.get("FLASK_RUN_FROM_CLI") == "true"
+    if in_cli:
+        # Command-line only: `flask db ...` (Alembic) and `flask bench ...`
+        from flask_migrate import Migrate
+        Migrate(app, db)
+        from app.bench.cli import bench_cli
+        app.cli.add_command(bench_cli)
+    
+    # Compiled templates survive restarts, so workers skip recompiling them
+    if app.config["JINJA_BYTECODE_CACHE_DIR"]:
+        from jinja2 import FileSystemBytecodeCache
+        cache_dir = Path(app.config["JINJA_BYTECODE_CACHE_DIR"])
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(cache_dir))
     
-    # Initialize database if it doesn't exist
     with app.app_context():
         try:
             # Verify the database URI is set
@@ -396,31 +777,31 @@ def create_app():
             if db_file_path:
                 # Ensure parent directory exists
                 Path(db_file_path).parent.mkdir(parents=True, exist_ok=True)
-                print(f"Initializing database at: {db_file_path}")
-            else:
-                print(f"Initializing database with URI: {db_uri}")
-            
-            # Create all tables (now that all models are imported)
-            db.create_all()
             
-            # Verify tables were created
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            print(f"✅ Database tables initialized successfully: {', '.join(tables)}")
+            if app.config["DB_SCHEMA_CHECK"] == "migrations":
+                # Production: the schema is managed by `flask db upgrade`
+                _check_schema_version(app)
+            elif not _running_migrations():
+                # Import all models BEFORE creating tables
+                # This ensures SQLAlchemy knows about all models
+                from app import models  # noqa: F401
+                app.logger.info(f"Initializing database at: {db_file_path or db.engine.url.render_as_string(hide_password=True)}")
+                db.create_all()
             
         except Exception as e:
-            print(f"❌ Error initializing database: {e}")
-            import traceback
-            traceback.print_exc()
+            app.logger.exception(f"❌ Error initializing database: {e}")
             # Don't raise - allow app to continue, but database operations will fail
             # This helps with debugging
-            print("⚠️ WARNING: Database initialization failed. The application may not work correctly.")
+            app.logger.warning("⚠️ Database initialization failed. The application may not work correctly.")
+
+    from app.user_cache import user_cache
+    user_cache.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
+        # Served from the per-process cache; accounts queued for deletion
+        # load as None and are logged out everywhere
+        return user_cache.get(int(user_id))
 
     from app.routes.auth import auth_bp
     from app.routes.tasks import tasks_bp
@@ -429,25 +810,63 @@ def create_app():
     app.register_blueprint(tasks_bp)
     app.register_blueprint(notify_bp)
 
+    # Reminders are dispatched from an in-memory heap; the scheduler only
+    # re-syncs it from the database to correct any drift
+    from app.reminders import reminder_engine
+    reminder_engine.init_app(app)
+
+    # Every periodic job runs through the job framework (overlap guard,
+    # time budget, jitter, timing)
+    from app.jobs import jobs
+    from app.archive import archive_cold_data
     scheduler.init_app(app)
-    scheduler.add_job(
-        id="check_reminders",
-        func=lambda: check_reminders(app),
+    jobs.init_app(app, scheduler)
+    jobs.add(
+        "sync_reminders",
+        lambda app: reminder_engine.resync(),
+        tables=("reminder",),
         trigger="interval",
-        minutes=1
+        minutes=app.config["REMINDER_RESYNC_MINUTES"]
     )
-    scheduler.add_job(
-        id="send_periodic_notifications",
-        func=lambda: send_periodic_notifications(app),
+    jobs.add(
+        "send_periodic_notifications",
+        send_periodic_notifications,
+        tables=("user", "task"),
         trigger="interval",
         minutes=5
     )
-    scheduler.add_job(
-        id="cleanup_expired_otps",
-        func=lambda: cleanup_expired_otps(app),
+    jobs.add(
+        "cleanup_expired_tokens",
+        cleanup_expired_tokens,
+        tables=("login_otp", "password_reset_token", "email_verification_token", "outbox_message"),
         trigger="interval",
         minutes=5
     )
-    scheduler.start()
+    jobs.add(
+        "archive_cold_data",
+        archive_cold_data,
+        tables=("task", "task_history", "task_archive", "task_history_archive"),
+        trigger="interval",
+        hours=app.config["ARCHIVE_INTERVAL_HOURS"]
+    )
+    from app.leader import leader_election
+    leader_election.init_app(app, scheduler)
+    leader_election.on_change(reminder_engine.set_leader)
+
+    # Deliver queued emails in the background
+    from app.outbox import outbox_workers
+    outbox_workers.init_app(app)
+
+    # Delete accounts in the background
+    from app.account_deletion import account_deleter
+    account_deleter.init_app(app)
+
+    if _background_services_enabled():
+        # Every process starts paused; only the lease holder resumes its scheduler
+        scheduler.start(paused=True)
+        leader_election.start()
+        reminder_engine.start()
+        outbox_workers.start()
+        account_deleter.start()
 
     return app
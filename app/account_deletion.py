@@ -0,0 +1,272 @@
+"""
+Background account deletion.
+
+Deleting an account used to happen inside the request: every task, reminder
+and token was loaded and deleted one ORM object at a time in a single
+transaction, holding the SQLite write lock for as long as that took.
+
+Now the request only records an ``AccountDeletion`` job, logs the user out and
+shows a status page. A worker thread deletes the account's rows table by table
+with set-based ``DELETE ... WHERE user_id = ?`` statements, at most
+``ACCOUNT_DELETION_CHUNK_SIZE`` rows per transaction, and records its progress
+on the job after every chunk. The user row goes last, in the same transaction
+as the confirmation email, which is also when the job forgets the username,
+email and name it kept for that email. A job whose worker died is picked up
+again once its heartbeat is older than ``ACCOUNT_DELETION_CLAIM_TIMEOUT``.
+"""
+
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import (
+    User, Task, TaskHistory, Reminder, PasswordResetToken, EmailVerificationToken,
+    LoginOTP, TaskArchive, TaskHistoryArchive, AccountDeletion
+)
+from app.outbox import queue_email
+
+
+# Children before parents, so the deletes are valid even where the database
+# does not enforce ON DELETE CASCADE (SQLite without PRAGMA foreign_keys)
+DELETION_STEPS = (
+    ('reminders', Reminder),
+    ('task history', TaskHistory),
+    ('archived task history', TaskHistoryArchive),
+    ('archived tasks', TaskArchive),
+    ('tasks', Task),
+    ('password reset tokens', PasswordResetToken),
+    ('email verification tokens', EmailVerificationToken),
+    ('login links', LoginOTP),
+)
+
+
+def request_account_deletion(user):
+    """Queue the deletion of ``user`` as part of the current transaction.
+
+    Outstanding login links are invalidated right away; everything else is
+    left to the worker. The caller commits.
+    """
+    job = AccountDeletion(
+        token=secrets.token_urlsafe(32),
+        user_id=user.id,
+        username=user.username,
+        email=user.email,
+        full_name=f"{user.first_name} {user.last_name}",
+        status='pending',
+        rows_deleted=0,
+        summary={},
+        attempts=0,
+        requested_at=datetime.utcnow()
+    )
+    db.session.add(job)
+    LoginOTP.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    # Wake the worker once this transaction commits
+    db.session.info['account_deletion_wakeup'] = True
+    return job
+
+
+def deletion_pending(user_id):
+    """Return True if the account is queued for (or being) deleted."""
+    return db.session.query(pending_deletion_for(user_id)).scalar()
+
+
+def pending_deletion_for(user_id):
+    """EXISTS clause matching an unfinished deletion of ``user_id``.
+
+    Finished jobs are ignored: SQLite may give the deleted user's id to a new
+    account.
+    """
+    return select(AccountDeletion.id).where(
+        AccountDeletion.user_id == user_id,
+        AccountDeletion.status != 'done'
+    ).exists()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker_after_commit(session):
+    if session.info.pop('account_deletion_wakeup', False):
+        account_deleter.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_wakeup_after_rollback(session):
+    session.info.pop('account_deletion_wakeup', None)
+
+
+def _confirmation_body(job):
+    deleted_items = [
+        f"{count} {name}" for name, count in (job.summary or {}).items() if count
+    ] or ["No tasks, reminders or tokens were stored"]
+    return f'''
+✅ ACCOUNT DELETION CONFIRMED ✅
+
+Hello {job.full_name},
+
+Your account has been successfully deleted from our Task Management System.
+
+📋 DELETION SUMMARY:
+• Username: {job.username}
+• Email: {job.email}
+• Deletion Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+
+🗑️ DATA DELETED:
+{chr(10).join(f"• {item}" for item in deleted_items)}
+
+✅ CONFIRMATION:
+All your personal data, tasks, reminders, and account information have been permanently removed from our systems.
+
+If you did not request this account deletion, please contact our support team immediately as this may indicate unauthorized access to your account.
+
+Thank you for using our Task Management System.
+
+Best regards,
+Your Task Management Team
+Data Protection Department
+            '''
+
+
+class AccountDeletionWorker:
+    """Background thread that works through queued account deletions."""
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        app.config.setdefault("ACCOUNT_DELETION_CHUNK_SIZE", 1000)
+        app.config.setdefault("ACCOUNT_DELETION_POLL_INTERVAL", 30.0)
+        app.config.setdefault("ACCOUNT_DELETION_CLAIM_TIMEOUT", 300)
+        app.config.setdefault("ACCOUNT_DELETION_MAX_ATTEMPTS", 5)
+        self.app = app
+        app.extensions["account_deletion"] = self
+
+    def start(self):
+        """Start the worker thread (idempotent)."""
+        if self._thread or self.app is None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="account-deletion-worker",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self):
+        """Signal the worker that a deletion was requested."""
+        self._wakeup.set()
+
+    def _run(self):
+        poll_interval = float(self.app.config["ACCOUNT_DELETION_POLL_INTERVAL"])
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.run_pending()
+            except Exception as e:
+                self.app.logger.exception(f"Account deletion worker error: {e}")
+                processed = 0
+
+            if processed == 0:
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self):
+        """Atomically mark the oldest due job as ours and return it."""
+        config = self.app.config
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=int(config["ACCOUNT_DELETION_CLAIM_TIMEOUT"]))
+        due = or_(
+            AccountDeletion.status == 'pending',
+            # Jobs whose worker died, or that failed and may be retried
+            and_(
+                AccountDeletion.status.in_(['running', 'failed']),
+                AccountDeletion.heartbeat_at < stale_before,
+                AccountDeletion.attempts < int(config["ACCOUNT_DELETION_MAX_ATTEMPTS"])
+            )
+        )
+
+        job_id = db.session.query(AccountDeletion.id).filter(due).order_by(
+            AccountDeletion.requested_at.asc()
+        ).limit(1).scalar()
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        claimed = AccountDeletion.query.filter(AccountDeletion.id == job_id, due).update({
+            AccountDeletion.status: 'running',
+            AccountDeletion.attempts: AccountDeletion.attempts + 1,
+            AccountDeletion.started_at: now,
+            AccountDeletion.heartbeat_at: now,
+            AccountDeletion.last_error: None
+        }, synchronize_session=False)
+        db.session.commit()
+        return db.session.get(AccountDeletion, job_id) if claimed else None
+
+    def _delete_chunk(self, model, user_id, chunk_size):
+        chunk = select(model.id).where(model.user_id == user_id).limit(chunk_size)
+        return model.query.filter(model.id.in_(chunk)).delete(synchronize_session=False)
+
+    def process(self, job):
+        """Delete everything owned by ``job.user_id``, one chunk per transaction."""
+        chunk_size = int(self.app.config["ACCOUNT_DELETION_CHUNK_SIZE"])
+        try:
+            for name, model in DELETION_STEPS:
+                while True:
+                    deleted = self._delete_chunk(model, job.user_id, chunk_size)
+                    if deleted:
+                        # Reassign so the JSON column is flagged as changed
+                        job.summary = {**(job.summary or {}), name: (job.summary or {}).get(name, 0) + deleted}
+                        job.rows_deleted += deleted
+                    job.current_step = name
+                    job.heartbeat_at = datetime.utcnow()
+                    db.session.commit()
+                    if deleted < chunk_size:
+                        break
+
+            User.query.filter_by(id=job.user_id).delete(synchronize_session=False)
+            queue_email(
+                '✅ Account Successfully Deleted - Confirmation',
+                [job.email],
+                _confirmation_body(job)
+            )
+            # The status page is reachable by token alone; keep no personal data
+            job.username = job.email = job.full_name = None
+            job.status = 'done'
+            job.current_step = None
+            job.finished_at = job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+            self.app.logger.info(f"🗑️ Deleted account of user {job.user_id} ({job.rows_deleted} rows)")
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.last_error = str(e)[:500]
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+            self.app.logger.exception(f"❌ Deleting account of user {job.user_id} failed (attempt {job.attempts}): {e}")
+
+    def run_pending(self):
+        """Process every due job. Returns the number processed."""
+        processed = 0
+        while True:
+            job = self._claim()
+            if job is None:
+                break
+            self.process(job)
+            processed += 1
+        return processed
+
+
+account_deleter = AccountDeletionWorker()
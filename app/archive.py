@@ -0,0 +1,143 @@
+"""
+Cold-storage tier for old task history and long-completed tasks.
+
+History entries older than ``ARCHIVE_HISTORY_AFTER_DAYS`` and tasks that have
+been completed for ``ARCHIVE_TASKS_AFTER_DAYS`` are moved, in batches of
+``ARCHIVE_BATCH_SIZE``, into the compressed ``task_history_archive`` and
+``task_archive`` tables. Each batch is copied and deleted in one transaction,
+so an interrupted run never loses or duplicates rows.
+
+The task list and history pages read both tiers through
+``app.pagination.paginate_tiers``; an archived task is moved back to the hot
+table with ``restore_task`` before it can be changed again.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from app.jobs import add_items, out_of_time
+from app.models import Task, TaskHistory, TaskArchive, TaskHistoryArchive, Reminder
+
+
+def _rebase_dependents(archived_ids):
+    """Keep hot history deltas readable once their snapshot is archived.
+
+    The first dependent of each archived snapshot becomes a full snapshot and
+    the remaining ones are re-encoded against it.
+    """
+    dependents = TaskHistory.query.filter(
+        TaskHistory.base_id.in_(archived_ids),
+        TaskHistory.id.notin_(archived_ids)
+    ).order_by(TaskHistory.id.asc()).all()
+
+    new_bases = {}
+    for entry in dependents:
+        entry.get_task_data()  # decode against the old base while it still exists
+        new_base = new_bases.setdefault(entry.base_id, entry)
+        entry.rebase(None if new_base is entry else new_base)
+
+
+def _archive_history_batch(cutoff, batch_size):
+    entries = TaskHistory.query.filter(
+        TaskHistory.created_at < cutoff
+    ).order_by(TaskHistory.created_at.asc()).limit(batch_size).all()
+    if not entries:
+        return 0
+
+    db.session.execute(insert(TaskHistoryArchive), [
+        {
+            'task_id': archived.task_id,
+            'user_id': archived.user_id,
+            'action': archived.action,
+            'created_at': archived.created_at,
+            'archived_at': datetime.utcnow(),
+            'payload': archived.payload,
+        }
+        for archived in map(TaskHistoryArchive.from_history, entries)
+    ])
+    archived_ids = [entry.id for entry in entries]
+    _rebase_dependents(archived_ids)
+    TaskHistory.query.filter(
+        TaskHistory.id.in_(archived_ids)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return len(entries)
+
+
+def _archive_task_batch(cutoff, batch_size):
+    tasks = Task.query.filter(
+        Task.status == 'Completed',
+        Task.updated_at < cutoff
+    ).order_by(Task.updated_at.asc()).limit(batch_size).all()
+    if not tasks:
+        return 0
+
+    task_ids = [task.id for task in tasks]
+    db.session.execute(insert(TaskArchive), [
+        {
+            'task_id': archived.task_id,
+            'user_id': archived.user_id,
+            'priority_rank': archived.priority_rank,
+            'scheduled_date': archived.scheduled_date,
+            'scheduled_time': archived.scheduled_time,
+            'completed_at': archived.completed_at,
+            'archived_at': datetime.utcnow(),
+            'payload': archived.payload,
+        }
+        for archived in map(TaskArchive.from_task, tasks)
+    ])
+    # SQLite may hand a freed task id to a new task; detach the old history so
+    # it is never mistaken for (or cascade-deleted with) that new task
+    TaskHistory.query.filter(TaskHistory.task_id.in_(task_ids)).update(
+        {TaskHistory.task_id: None}, synchronize_session=False
+    )
+    Reminder.query.filter(Reminder.task_id.in_(task_ids)).delete(synchronize_session=False)
+    Task.query.filter(Task.id.in_(task_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(tasks)
+
+
+def archive_cold_data(app):
+    """Move old history and long-completed tasks into the archive tables."""
+    with app.app_context():
+        try:
+            config = app.config
+            now = datetime.utcnow()
+            batch_size = int(config.get("ARCHIVE_BATCH_SIZE", 500))
+            max_batches = int(config.get("ARCHIVE_MAX_BATCHES", 20))
+
+            moved = {}
+            for name, archive_batch, days in (
+                ('history entries', _archive_history_batch, config.get("ARCHIVE_HISTORY_AFTER_DAYS", 90)),
+                ('completed tasks', _archive_task_batch, config.get("ARCHIVE_TASKS_AFTER_DAYS", 30)),
+            ):
+                cutoff = now - timedelta(days=int(days))
+                moved[name] = 0
+                # Bounded per run; whatever is left is picked up next time
+                for _ in range(max_batches):
+                    count = archive_batch(cutoff, batch_size)
+                    moved[name] += count
+                    add_items(count)
+                    if count < batch_size or out_of_time():
+                        break
+
+            if any(moved.values()):
+                summary = ', '.join(f"{count} {name}" for name, count in moved.items())
+                print(f"🗄️ Archived {summary}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error archiving cold data: {e}")
+
+
+def restore_task(archived):
+    """Move an archived task back into the hot table and return it.
+
+    The restored task gets a new id; the caller commits.
+    """
+    task = archived.to_task()
+    db.session.add(task)
+    db.session.delete(archived)
+    db.session.flush()
+    return task
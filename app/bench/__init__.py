@@ -0,0 +1,7 @@
+"""
+Benchmarks for the task app.
+
+Each module can be run on its own, e.g. ``python -m app.bench.startup``, or
+through the ``flask bench`` command group (see ``app/bench/cli.py``), which
+also seeds synthetic data and runs the HTTP load test.
+"""
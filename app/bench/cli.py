@@ -0,0 +1,133 @@
+"""
+``flask bench`` commands.
+
+    flask bench seed --users 1000           synthetic users, tasks, history, reminders
+    flask bench load --clients 8 --duration 30 --output run.json
+    flask bench compare before.json after.json
+    flask bench jobs --reminders 100000 --users 50000   background jobs against a local SMTP sink
+    flask bench startup / flask bench hashing   the stand-alone benchmarks
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db
+
+
+bench_cli = AppGroup("bench", help="Seed benchmark data and run benchmarks.")
+
+
+@bench_cli.command("seed")
+@click.option("--users", default=100, show_default=True, help="Users to add.")
+@click.option("--tasks-per-user", default=20.0, show_default=True, help="Mean tasks per user (log-normal).")
+@click.option("--seed", "random_seed", default=42, show_default=True, help="Random seed, for repeatable datasets.")
+@click.option("--password", default=None, help="Password of every seeded user (default: benchpass).")
+def seed_command(users, tasks_per_user, random_seed, password):
+    """Fill the database with a synthetic dataset."""
+    from app import models  # noqa: F401
+    from app.bench.dataset import DEFAULT_PASSWORD, seed
+
+    # The CLI skips create_all at startup; a scratch database needs the tables
+    db.create_all()
+    counts = seed(users, tasks_per_user, random_seed, password or DEFAULT_PASSWORD)
+    click.echo(f"✅ Added {', '.join(f'{count} {table} rows' for table, count in counts.items())}")
+
+
+@bench_cli.command("load")
+@click.option("--clients", default=8, show_default=True, help="Concurrent virtual users.")
+@click.option("--duration", default=15.0, show_default=True, help="Seconds to run.")
+@click.option("--server", is_flag=True, help="Go through a local threaded WSGI server instead of the test client.")
+@click.option("--password", default=None, help="Password of the seeded users (default: benchpass).")
+@click.option("--seed", "random_seed", default=42, show_default=True, help="Random seed for the operation mix.")
+@click.option("--label", default=None, help="Free-form label stored with the results.")
+@click.option("--output", type=click.Path(dir_okay=False), default=None,
+              help="Where to save the JSON report (default: instance/bench/load-<timestamp>.json).")
+def load_command(clients, duration, server, password, random_seed, label, output):
+    """Run the HTTP load test against the seeded users."""
+    from app.bench.dataset import DEFAULT_PASSWORD
+    from app.bench.load import format_report, run, save
+
+    try:
+        report = run(current_app._get_current_object(), clients, duration, server,
+                     password or DEFAULT_PASSWORD, random_seed, label)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(format_report(report))
+    if output is None:
+        output = Path(current_app.instance_path) / "bench" / f"load-{datetime.now():%Y%m%d-%H%M%S}.json"
+    click.echo(f"💾 Saved to {save(report, output)}")
+
+
+@bench_cli.command("compare", with_appcontext=False)
+@click.argument("before", type=click.Path(exists=True, dir_okay=False))
+@click.argument("after", type=click.Path(exists=True, dir_okay=False))
+def compare_command(before, after):
+    """Compare two saved load test reports."""
+    from app.bench.load import format_comparison
+
+    before, after = (json.loads(Path(path).read_text()) for path in (before, after))
+    click.echo(f"before: commit {before.get('commit')} {before.get('label') or ''}")
+    click.echo(f"after:  commit {after.get('commit')} {after.get('label') or ''}")
+    click.echo(format_comparison(before, after))
+
+
+@bench_cli.command("jobs")
+@click.option("--job", "selected", type=click.Choice(["reminders", "digest", "cleanup"]), multiple=True,
+              help="Job to run, repeatable (default: all three).")
+@click.option("--reminders", default=10000, show_default=True, help="Due reminders to add.")
+@click.option("--users", type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Users with open tasks (the digest goes to each).")
+@click.option("--tasks-per-user", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Open tasks of each new user.")
+@click.option("--tokens", default=10000, show_default=True, help="Expired and used tokens to add.")
+@click.option("--smtp-latency-ms", default=0.0, show_default=True, help="Delay of the SMTP sink per message.")
+@click.option("--smtp-failure-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True,
+              help="Share of messages the sink rejects with a 451.")
+@click.option("--smtp-disconnect-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True,
+              help="Share of messages on which the sink drops the session.")
+@click.option("--memory/--no-memory", default=True, show_default=True,
+              help="Trace peak Python memory (slows the jobs down).")
+@click.option("--verbose", is_flag=True, help="Show the jobs' own output.")
+@click.option("--seed", "random_seed", default=42, show_default=True, help="Random seed.")
+@click.option("--label", default=None, help="Free-form label stored with the results.")
+@click.option("--output", type=click.Path(dir_okay=False), default=None,
+              help="Where to save the JSON report (default: instance/bench/jobs-<timestamp>.json).")
+def jobs_command(selected, reminders, users, tasks_per_user, tokens, smtp_latency_ms, smtp_failure_rate,
+                 smtp_disconnect_rate, memory, verbose, random_seed, label, output):
+    """Time the reminder, digest and token cleanup jobs against a local SMTP sink."""
+    from app import models  # noqa: F401
+    from app.bench.jobs import JOBS, format_report, run
+    from app.bench.load import save
+
+    db.create_all()
+    report = run(current_app._get_current_object(), selected or JOBS, reminders, users, tokens, tasks_per_user,
+                 smtp_latency_ms / 1000, smtp_failure_rate, smtp_disconnect_rate, memory, verbose,
+                 random_seed, label, progress=click.echo)
+    click.echo(format_report(report))
+    if output is None:
+        output = Path(current_app.instance_path) / "bench" / f"jobs-{datetime.now():%Y%m%d-%H%M%S}.json"
+    click.echo(f"💾 Saved to {save(report, output)}")
+
+
+_PASS_THROUGH = {"ignore_unknown_options": True, "allow_extra_args": True, "help_option_names": []}
+
+
+@bench_cli.command("startup", with_appcontext=False, context_settings=_PASS_THROUGH)
+@click.pass_context
+def startup_command(ctx):
+    """Worker boot and CLI latency (options as in python -m app.bench.startup)."""
+    from app.bench.startup import main
+    main(ctx.args)
+
+
+@bench_cli.command("hashing", with_appcontext=False, context_settings=_PASS_THROUGH)
+@click.pass_context
+def hashing_command(ctx):
+    """Password hashing throughput (options as in python -m app.bench.hashing)."""
+    from app.bench.hashing import main
+    main(ctx.args)
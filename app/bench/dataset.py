@@ -0,0 +1,194 @@
+"""
+Synthetic dataset for benchmarks.
+
+Seeds ``users`` accounts with a skewed number of tasks each (log-normal
+around ``tasks_per_user``: most users have a few, some have hundreds), a
+realistic mix of statuses, priorities and schedules, the history rows those
+tasks would have accumulated (a full snapshot on creation, deltas for each
+status change and edit) and a reminder for every scheduled task.
+
+Every seeded user is called ``bench_<n>`` and has the same password, hashed
+once with the configured ``PASSWORD_HASH_METHOD`` so logins cost what they
+cost in production while seeding stays fast. Rows are bulk-inserted one
+chunk of users per transaction.
+
+    flask bench seed --users 1000 --tasks-per-user 20
+
+Point ``DATABASE_URL`` at a scratch database: missing tables are created.
+"""
+
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, insert
+
+from app import db
+from app.models import PRIORITY_RANKS, Reminder, Task, TaskHistory, User, task_snapshot
+from app.passwords import passwords
+
+
+USERNAME_PREFIX = "bench_"
+DEFAULT_PASSWORD = "benchpass"
+
+STATUSES = (("Pending", 50), ("In Progress", 20), ("Completed", 30))
+PRIORITIES = (("Low", 30), ("Medium", 40), ("High", 20), ("Urgent", 10))
+STATUS_STEPS = ("Pending", "In Progress", "Completed")
+
+_VERBS = ("Write", "Review", "Fix", "Plan", "Call", "Update", "Prepare", "Submit", "Clean", "Read")
+_NOUNS = ("report", "slides", "budget", "lab notes", "assignment", "email backlog", "project plan",
+          "meeting agenda", "thesis draft", "invoice", "grocery list", "bike")
+
+
+class _Snapshot:
+    """Attribute bag ``task_snapshot`` can read."""
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _task_count(rng, mean):
+    # Log-normal with the requested mean: a long tail of heavy users
+    sigma = 0.9
+    mu = math.log(max(mean, 0.1)) - sigma ** 2 / 2
+    return min(int(rng.lognormvariate(mu, sigma)), int(mean * 50) + 1)
+
+
+def _task_row(rng, user_id, now):
+    created_at = now - timedelta(days=rng.uniform(0, 120))
+    scheduled_date = scheduled_time = None
+    if rng.random() < 0.8:
+        scheduled_date = (created_at + timedelta(days=rng.randint(0, 90))).date()
+        if rng.random() < 0.7:
+            scheduled_time = time(rng.randint(7, 21), rng.choice((0, 15, 30, 45)))
+    status = _weighted(rng, STATUSES)
+    priority = _weighted(rng, PRIORITIES)
+    return {
+        "title": f"{rng.choice(_VERBS)} {rng.choice(_NOUNS)}",
+        "status": status,
+        "priority": priority,
+        # Bulk inserts skip the model's validator that keeps this in sync
+        "priority_rank": PRIORITY_RANKS[priority],
+        "scheduled_date": scheduled_date,
+        "scheduled_time": scheduled_time,
+        "estimated_duration": rng.choice((None, 15, 30, 45, 60, 90, 120)),
+        "created_at": created_at,
+        "updated_at": created_at,
+        "user_id": user_id,
+    }
+
+
+def _history_events(rng, task, now):
+    """Return ``(action, details, snapshot)`` for each change, ending in ``task``'s state."""
+    steps = STATUS_STEPS[:STATUS_STEPS.index(task["status"]) + 1]
+    changes = [("status_changed", status) for status in steps[1:]]
+    # A few edits mixed in between the status changes
+    for _ in range(min(int(rng.expovariate(1.5)), 5)):
+        changes.insert(rng.randint(0, len(changes)), ("updated", None))
+
+    state = dict(task, status="Pending")
+    moment = task["created_at"]
+    events = [("created", f'Task "{task["title"]}" created', task_snapshot(_Snapshot(**state)))]
+    for action, status in changes:
+        moment = min(now, moment + timedelta(hours=rng.uniform(1, 72)))
+        state["updated_at"] = moment
+        if action == "status_changed":
+            details = f'Status changed from {state["status"]} to {status}'
+            state["status"] = status
+        else:
+            duration = rng.choice((15, 30, 45, 60, 90, 120))
+            details = f"Updated: estimated duration from '{state['estimated_duration']}' to '{duration}'"
+            state["estimated_duration"] = duration
+        events.append((action, details, task_snapshot(_Snapshot(**state))))
+    task["updated_at"] = state["updated_at"]
+    task["estimated_duration"] = state["estimated_duration"]
+    return events
+
+
+def _reminder_row(task, task_id, now):
+    if task["scheduled_date"] is None:
+        return None
+    if task["scheduled_time"] is not None:
+        remind_at = datetime.combine(task["scheduled_date"], task["scheduled_time"]) - timedelta(minutes=15)
+    else:
+        remind_at = datetime.combine(task["scheduled_date"], time(9, 0))
+    return {
+        "user_id": task["user_id"],
+        "task_id": task_id,
+        "message": f"Task Reminder: {task['title']}",
+        "remind_at": remind_at,
+        "sent": remind_at <= now,
+        "created_at": task["created_at"],
+    }
+
+
+def _insert(model, rows):
+    """Bulk insert ``rows`` and return their ids in order."""
+    if not rows:
+        return []
+    result = db.session.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    )
+    return [row[0] for row in result]
+
+
+def seed(users, tasks_per_user=20.0, random_seed=42, password=DEFAULT_PASSWORD, chunk_size=200, progress=print):
+    """Insert the synthetic dataset; return the number of rows added per table."""
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    password_hash = passwords.hash(password)
+    first = db.session.query(func.count(User.id)).filter(User.username.like(f"{USERNAME_PREFIX}%")).scalar()
+    counts = {"user": 0, "task": 0, "task_history": 0, "reminder": 0}
+
+    for start in range(first, first + users, chunk_size):
+        numbers = range(start, min(start + chunk_size, first + users))
+        user_ids = _insert(User, [{
+            "username": f"{USERNAME_PREFIX}{n}",
+            "first_name": f"Bench{n}",
+            "last_name": "User",
+            "email": f"{USERNAME_PREFIX}{n}@example.com",
+            "phone_no": f"9{n:09d}",
+            "password_hash": password_hash,
+            "email_verified": True,
+        } for n in numbers])
+
+        tasks = [_task_row(rng, user_id, now) for user_id in user_ids
+                 for _ in range(_task_count(rng, tasks_per_user))]
+        events = [_history_events(rng, task, now) for task in tasks]
+        task_ids = _insert(Task, tasks)
+
+        # Creation snapshots first: the later entries are deltas against them
+        snapshot_ids = _insert(TaskHistory, [{
+            "task_id": task_id, "user_id": task["user_id"], "action": action, "details": details,
+            "data": snapshot, "base_id": None, "created_at": task["created_at"],
+        } for task, task_id, ((action, details, snapshot), *_) in zip(tasks, task_ids, events)])
+        deltas = []
+        for task, task_id, base_id, (base, *later) in zip(tasks, task_ids, snapshot_ids, events):
+            for action, details, snapshot in later:
+                deltas.append({
+                    "task_id": task_id, "user_id": task["user_id"], "action": action, "details": details,
+                    "data": {key: value for key, value in snapshot.items() if base[2].get(key) != value},
+                    "base_id": base_id,
+                    "created_at": datetime.fromisoformat(snapshot["updated_at"]),
+                })
+        if deltas:
+            db.session.execute(insert(TaskHistory), deltas)
+
+        reminders = [row for row in (_reminder_row(task, task_id, now) for task, task_id in zip(tasks, task_ids))
+                     if row is not None]
+        if reminders:
+            db.session.execute(insert(Reminder), reminders)
+        db.session.commit()
+
+        counts["user"] += len(user_ids)
+        counts["task"] += len(tasks)
+        counts["task_history"] += len(snapshot_ids) + len(deltas)
+        counts["reminder"] += len(reminders)
+        progress(f"🌱 Seeded {counts['user']}/{users} users, {counts['task']} tasks, "
+                 f"{counts['task_history']} history rows, {counts['reminder']} reminders")
+    return counts
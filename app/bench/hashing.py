@@ -0,0 +1,103 @@
+"""
+Password hashing benchmark.
+
+Simulates a login storm for each hashing method: ``--concurrency`` clients
+verify passwords through a ``PasswordHasher`` with ``--workers`` threads and
+report the logins per second the pool sustains, the latency clients see and
+how many were turned away because the pool was full.
+
+    python -m app.bench.hashing --logins 100 --concurrency 32 --workers 4
+
+Use it to pick ``PASSWORD_HASH_METHOD`` and ``PASSWORD_HASH_WORKERS`` for the
+number of cores available.
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from app.passwords import PasswordHasher, PasswordHashingBusy
+
+
+DEFAULT_METHODS = (
+    "scrypt:32768:8:1",      # Werkzeug's default
+    "scrypt:16384:8:1",
+    "pbkdf2:sha256:1000000",
+    "pbkdf2:sha256:600000",
+)
+
+
+def login_storm(method, logins, concurrency, workers, max_pending):
+    """Verify ``logins`` passwords from ``concurrency`` threads; return the results."""
+    hasher = PasswordHasher()
+    hasher.configure(method=method, workers=workers, max_pending=max_pending, timeout=600)
+    try:
+        started = time.perf_counter()
+        stored = hasher.hash("correct horse battery staple")
+        hash_seconds = time.perf_counter() - started
+
+        remaining = iter(range(logins))
+        lock = threading.Lock()
+        latencies, rejected = [], [0]
+
+        def client():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    assert hasher.verify(stored, "correct horse battery staple")
+                except PasswordHashingBusy:
+                    with lock:
+                        rejected[0] += 1
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        hasher.shutdown()
+
+    latencies.sort()
+    return {
+        "method": method,
+        "hash_ms": hash_seconds * 1000,
+        "logins_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else 0.0,
+        "rejected": rejected[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("methods", nargs="*", default=DEFAULT_METHODS, help="Werkzeug hash methods to compare")
+    parser.add_argument("--logins", type=int, default=40, help="logins per method (default: 40)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (default: 16)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="hashing threads (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="queued checks before rejecting (default: enough for every client)")
+    args = parser.parse_args(argv)
+    max_pending = args.concurrency if args.max_pending is None else args.max_pending
+
+    print(f"🔐 Login storm: {args.logins} logins, {args.concurrency} clients, "
+          f"{args.workers} workers, {max_pending} pending max")
+    print(f"{'method':<24} {'hash ms':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'rejected':>9}")
+    for method in args.methods:
+        result = login_storm(method, args.logins, args.concurrency, args.workers, max_pending)
+        print(f"{result['method']:<24} {result['hash_ms']:>8.1f} {result['logins_per_second']:>9.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['rejected']:>9}")
+
+
+if __name__ == "__main__":
+    main()
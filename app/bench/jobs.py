@@ -0,0 +1,439 @@
+"""
+Background job benchmark.
+
+Seeds work for the jobs that send mail or clean up after users and times each
+of them end to end:
+
+* ``reminders``: ``check_reminders`` with ``--reminders`` due reminders;
+* ``digest``: ``send_periodic_notifications`` to ``--users`` users with open
+  tasks;
+* ``cleanup``: ``cleanup_expired_tokens`` with ``--tokens`` expired and used
+  login links, reset and verification tokens.
+
+Flask-Mail is pointed at ``SMTPSink``, an in-process SMTP server on a loopback
+port that accepts and discards every message. It can wait before answering
+each message (``--smtp-latency-ms``), reject a share of them with a 451
+(``--smtp-failure-rate``) or drop the session mid-message so the reconnect
+path runs (``--smtp-disconnect-rate``). The configured mail server and its
+credentials are not used, and the settings are put back after the run.
+
+Each job reports its wall time, emails accepted by the sink per second,
+failed sends, SMTP connections, SQL queries (from ``query_stats``) and peak
+Python memory (``tracemalloc``, which slows the job down; ``--no-memory``
+turns it off):
+
+    flask bench jobs --reminders 100000 --users 50000 --tokens 50000
+
+Seeded users are called ``jobs_<n>`` and are reused by later runs; reminders
+and tokens are added on every run. Point ``DATABASE_URL`` at a scratch
+database: missing tables are created.
+"""
+
+import contextlib
+import platform
+import random
+import resource
+import secrets
+import socketserver
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app import db, mail
+from app.bench.dataset import DEFAULT_PASSWORD, PRIORITIES, _insert, _weighted
+from app.bench.load import _commit
+from app.models import (
+    PRIORITY_RANKS, EmailVerificationToken, LoginOTP, PasswordResetToken, Reminder, Task, User,
+)
+from app.passwords import passwords
+from app.query_stats import query_stats
+
+
+USERNAME_PREFIX = "jobs_"
+JOBS = ("reminders", "digest", "cleanup")
+TOKEN_MODELS = (LoginOTP, PasswordResetToken, EmailVerificationToken)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for ``smtplib``: no TLS, no AUTH, messages discarded."""
+
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        sink._count("connections")
+        self._reply("220 localhost bench sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self._reply("250-localhost")
+                self._reply("250 8BITMIME")
+            elif command in (b"HELO", b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                self._reply("250 OK")
+            elif command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while line not in (b".\r\n", b".\n", b""):
+                    line = self.rfile.readline()
+                outcome = sink._outcome()
+                if outcome == "disconnected":
+                    return
+                self._reply("451 4.3.0 Injected failure" if outcome == "rejected" else "250 OK queued")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Local SMTP server that counts and discards messages.
+
+    Usage::
+
+        with SMTPSink(latency=0.02, failure_rate=0.01) as sink:
+            ...  # send to 127.0.0.1:sink.port
+        sink.stats()
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, disconnect_rate=0.0, random_seed=42):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.disconnect_rate = disconnect_rate
+        self.host = "127.0.0.1"
+        self.port = None
+        self._rng = random.Random(random_seed)
+        self._lock = threading.Lock()
+        self._counts = {"connections": 0, "accepted": 0, "rejected": 0, "disconnected": 0}
+        self._server = None
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def _outcome(self):
+        """Decide the fate of one message, after the configured latency."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            draw = self._rng.random()
+            if draw < self.disconnect_rate:
+                outcome = "disconnected"
+            elif draw < self.disconnect_rate + self.failure_rate:
+                outcome = "rejected"
+            else:
+                outcome = "accepted"
+            self._counts[outcome] += 1
+        return outcome
+
+    def start(self):
+        self._server = _Server((self.host, 0), _SMTPHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="bench-smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+@contextlib.contextmanager
+def mail_to_sink(app, sink):
+    """Send the app's mail to ``sink`` for the duration of the block."""
+    keys = ("MAIL_SERVER", "MAIL_PORT", "MAIL_USE_TLS", "MAIL_USE_SSL", "MAIL_USERNAME",
+            "MAIL_PASSWORD", "MAIL_DEFAULT_SENDER", "MAIL_DEBUG", "MAIL_SUPPRESS_SEND")
+    previous_config = {key: app.config[key] for key in keys if key in app.config}
+    previous_state = app.extensions.get("mail")
+    app.config.update(
+        MAIL_SERVER=sink.host, MAIL_PORT=sink.port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_DEFAULT_SENDER="bench@example.com",
+        MAIL_DEBUG=False, MAIL_SUPPRESS_SEND=False,
+    )
+    try:
+        state = mail.init_app(app)
+        # Never let a benchmark reach the real mail server
+        if (state.server, state.port, state.username) != (sink.host, sink.port, None):
+            raise RuntimeError("Mail is not pointed at the benchmark sink")
+        yield
+    finally:
+        for key in keys:
+            app.config.pop(key, None)
+        app.config.update(previous_config)
+        if previous_state is not None:
+            app.extensions["mail"] = previous_state
+
+
+def seed_users(count, tasks_per_user=3, random_seed=42, chunk_size=1000):
+    """Make sure ``count`` ``jobs_<n>`` users with open tasks exist; return the number added."""
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    first = db.session.query(func.count(User.id)).filter(User.username.like(f"{USERNAME_PREFIX}%")).scalar()
+    if first >= count:
+        return 0
+    password_hash = passwords.hash(DEFAULT_PASSWORD)
+    for start in range(first, count, chunk_size):
+        user_ids = _insert(User, [{
+            "username": f"{USERNAME_PREFIX}{n}",
+            "first_name": f"Jobs{n}",
+            "last_name": "User",
+            "email": f"{USERNAME_PREFIX}{n}@example.com",
+            "phone_no": f"8{n:09d}",
+            "password_hash": password_hash,
+            "email_verified": True,
+        } for n in range(start, min(start + chunk_size, count))])
+        tasks = []
+        for user_id in user_ids:
+            for index in range(tasks_per_user):
+                priority = _weighted(rng, PRIORITIES)
+                tasks.append({
+                    "title": f"Open task {index + 1}",
+                    "status": rng.choice(("Pending", "In Progress")),
+                    "priority": priority,
+                    "priority_rank": PRIORITY_RANKS[priority],
+                    "scheduled_date": (now + timedelta(days=rng.randint(0, 14))).date(),
+                    "estimated_duration": rng.choice((None, 30, 60)),
+                    "created_at": now,
+                    "updated_at": now,
+                    "user_id": user_id,
+                })
+        if tasks:
+            db.session.execute(insert(Task), tasks)
+        db.session.commit()
+    return count - first
+
+
+def _jobs_tasks(users):
+    """``(task id, user id)`` of the open tasks of the first ``users`` seeded users."""
+    first_users = select(User.id).where(
+        User.username.like(f"{USERNAME_PREFIX}%")
+    ).order_by(User.id).limit(users).subquery()
+    return db.session.execute(
+        select(Task.id, Task.user_id).where(Task.user_id.in_(select(first_users.c.id))).order_by(Task.id)
+    ).all()
+
+
+def seed_reminders(count, users, random_seed=42, chunk_size=5000):
+    """Add ``count`` due, unsent reminders spread over the tasks of the first ``users`` users."""
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    tasks = _jobs_tasks(users)
+    for start in range(0, count, chunk_size):
+        rows = []
+        for n in range(start, min(start + chunk_size, count)):
+            task_id, user_id = tasks[n % len(tasks)]
+            remind_at = now - timedelta(seconds=rng.uniform(0, 3600))
+            rows.append({
+                "user_id": user_id, "task_id": task_id, "message": f"Task Reminder: Open task {n}",
+                "remind_at": remind_at, "sent": False, "created_at": remind_at - timedelta(days=1),
+            })
+        db.session.execute(insert(Reminder), rows)
+        db.session.commit()
+    return count
+
+
+def seed_tokens(count, users, grace_hours=24, chunk_size=5000):
+    """Add ``count`` tokens for cleanup: half expired, half used past the grace period."""
+    now = datetime.utcnow()
+    user_ids = [user_id for _, user_id in _jobs_tasks(users)]
+    for start in range(0, count, chunk_size):
+        rows = {model: [] for model in TOKEN_MODELS}
+        for n in range(start, min(start + chunk_size, count)):
+            model = TOKEN_MODELS[n % len(TOKEN_MODELS)]
+            if n % 2:
+                created_at, expires_at, used = now - timedelta(hours=2), now - timedelta(hours=1), False
+            else:
+                created_at, expires_at, used = now - timedelta(hours=grace_hours + 1), now + timedelta(days=1), True
+            row = {"user_id": user_ids[n % len(user_ids)], "expires_at": expires_at,
+                   "used": used, "created_at": created_at}
+            row["otp_code" if model is LoginOTP else "token"] = secrets.token_urlsafe(24)
+            rows[model].append(row)
+        for model, model_rows in rows.items():
+            if model_rows:
+                db.session.execute(insert(model), model_rows)
+        db.session.commit()
+    return count
+
+
+class _JobOutput:
+    """Swallows a job's output, counting the lines that report an error."""
+
+    def __init__(self):
+        self.errors = 0
+        self.last_error = None
+
+    def write(self, text):
+        for line in text.splitlines():
+            if "Error" in line or line.startswith("❌"):
+                self.errors += 1
+                self.last_error = line.strip()
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _count_tokens():
+    return sum(db.session.query(func.count(model.id)).scalar() for model in TOKEN_MODELS)
+
+
+def _max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name, function, sink, trace_memory=True, verbose=False):
+    """Run ``function()`` once; return its wall time, mail, query and memory figures."""
+    before = sink.stats()
+    output = None if verbose else _JobOutput()
+    if trace_memory:
+        tracemalloc.start()
+    query_stats.begin(f"bench:{name}")
+    started = time.perf_counter()
+    try:
+        if output is None:
+            function()
+        else:
+            # The jobs print a line per email; keep that out of the report
+            with contextlib.redirect_stdout(output):
+                function()
+    finally:
+        seconds = time.perf_counter() - started
+        unit = query_stats.end()
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    after = sink.stats()
+    sent = {key: after[key] - before[key] for key in after}
+    return {
+        "seconds": seconds,
+        "emails": sent["accepted"],
+        "emails_per_s": sent["accepted"] / seconds if seconds else 0.0,
+        "rejected": sent["rejected"],
+        "dropped": sent["disconnected"],
+        "connections": sent["connections"],
+        "queries": unit.queries if query_stats.enabled else None,
+        "db_seconds": unit.seconds if query_stats.enabled else None,
+        "peak_memory_mb": peak / 2 ** 20 if peak is not None else None,
+        "errors": output.errors if output is not None else None,
+        "last_error": output.last_error if output is not None else None,
+    }
+
+
+def run(app, jobs=JOBS, reminders=10000, users=1000, tokens=10000, tasks_per_user=3,
+        smtp_latency=0.0, smtp_failure_rate=0.0, smtp_disconnect_rate=0.0,
+        trace_memory=True, verbose=False, random_seed=42, label=None, progress=print):
+    """Seed and time each of ``jobs``; return the report."""
+    from app import check_reminders, cleanup_expired_tokens, send_periodic_notifications
+    from app.jobs import save_state
+
+    results = {}
+    with SMTPSink(smtp_latency, smtp_failure_rate, smtp_disconnect_rate, random_seed) as sink:
+        with app.app_context(), mail_to_sink(app, sink):
+            added = seed_users(users, tasks_per_user, random_seed)
+            progress(f"🌱 {users} {USERNAME_PREFIX}<n> users with open tasks ({added} added)")
+
+            if "reminders" in jobs:
+                seed_reminders(reminders, users, random_seed)
+                # Includes reminders left over from earlier runs whose sends failed
+                due = db.session.query(func.count(Reminder.id)).filter(
+                    Reminder.sent.is_(False), Reminder.remind_at <= datetime.utcnow()).scalar()
+                db.session.remove()
+                progress(f"🌱 Added {reminders} reminders, {due} due")
+                results["reminders"] = dict(
+                    measure("reminders", lambda: check_reminders(app), sink, trace_memory, verbose),
+                    items=due)
+                progress(f"⏱️ check_reminders took {results['reminders']['seconds']:.1f}s")
+
+            if "digest" in jobs:
+                previous_pattern = app.config.get("DIGEST_EMAIL_PATTERN")
+                app.config["DIGEST_EMAIL_PATTERN"] = f"{USERNAME_PREFIX}%@example.com"
+                # Start from the first user and skip the recently-sent throttle
+                save_state("periodic_notifications", {})
+                db.session.commit()
+                try:
+                    results["digest"] = dict(
+                        measure("digest", lambda: send_periodic_notifications(app), sink, trace_memory, verbose),
+                        items=users)
+                finally:
+                    app.config["DIGEST_EMAIL_PATTERN"] = previous_pattern
+                progress(f"⏱️ send_periodic_notifications took {results['digest']['seconds']:.1f}s")
+
+            if "cleanup" in jobs:
+                seed_tokens(tokens, users, int(app.config.get("TOKEN_GC_USED_GRACE_HOURS", 24)))
+                progress(f"🌱 Added {tokens} expired and used tokens")
+                before = _count_tokens()
+                results["cleanup"] = dict(
+                    measure("cleanup", lambda: cleanup_expired_tokens(app), sink, trace_memory, verbose),
+                    items=tokens)
+                db.session.remove()
+                results["cleanup"]["removed"] = before - _count_tokens()
+                progress(f"⏱️ cleanup_expired_tokens took {results['cleanup']['seconds']:.1f}s")
+
+            dialect = db.engine.dialect.name
+    return {
+        "label": label,
+        "commit": _commit(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": dialect,
+        "smtp": {
+            "latency_ms": smtp_latency * 1000,
+            "failure_rate": smtp_failure_rate,
+            "disconnect_rate": smtp_disconnect_rate,
+        },
+        "memory_traced": trace_memory,
+        "max_rss_mb": _max_rss_mb(),
+        "jobs": results,
+    }
+
+
+def _value(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def format_report(report):
+    smtp = report["smtp"]
+    lines = [
+        f"📬 SMTP sink {smtp['latency_ms']:.0f} ms/message, {smtp['failure_rate']:.0%} rejected, "
+        f"{smtp['disconnect_rate']:.0%} dropped; {report['database']}, commit {report['commit'] or 'unknown'}",
+        f"{'job':<10} {'items':>8} {'seconds':>8} {'emails':>8} {'emails/s':>9} {'rejected':>8} "
+        f"{'dropped':>7} {'conns':>6} {'queries':>8} {'peak MB':>8}",
+    ]
+    for name, job in report["jobs"].items():
+        lines.append(
+            f"{name:<10} {job['items']:>8} {job['seconds']:>8.2f} {job['emails']:>8} "
+            f"{job['emails_per_s']:>9.1f} {job['rejected']:>8} {job['dropped']:>7} {job['connections']:>6} "
+            f"{_value(job['queries'], 'd'):>8} {_value(job['peak_memory_mb'], '.1f'):>8}"
+        )
+    for name, job in report["jobs"].items():
+        if job["last_error"]:
+            lines.append(f"⚠️ {name}: {job['errors']} errors, last: {job['last_error'][:200]}")
+    if "cleanup" in report["jobs"]:
+        lines.append(f"🧹 cleanup removed {report['jobs']['cleanup']['removed']} tokens")
+    lines.append(f"💾 max RSS {report['max_rss_mb']:.0f} MB")
+    return "\n".join(lines)
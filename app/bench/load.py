@@ -0,0 +1,339 @@
+"""
+HTTP load test.
+
+``clients`` concurrent virtual users, each logged in as one of the seeded
+``bench_<n>`` accounts, run a weighted mix of the task pages for
+``duration`` seconds:
+
+    view_task 45%, task_history 15%, toggle_task 15%, edit_task 10%,
+    add_task 10%, login 5%
+
+``login`` is the full flow: log out, post the password, then follow the
+emailed authentication link. Requests go through the Flask test client by
+default, or through a local threaded WSGI server with ``--server`` so the
+HTTP stack is measured too.
+
+Each run reports per operation p50/p95/p99 latency, throughput, errors and
+SQL queries per operation (from ``query_stats``), and is saved as JSON
+together with the commit it ran on, so runs can be compared across versions:
+
+    flask bench seed --users 200
+    flask bench load --clients 8 --duration 30 --output before.json
+    flask bench compare before.json after.json
+
+Rate limiting and CSRF checks are switched off for the run. Emails are
+queued in the outbox but not sent, as the CLI does not start the workers.
+"""
+
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import db
+from app.bench.dataset import DEFAULT_PASSWORD, USERNAME_PREFIX
+from app.models import LoginOTP, Task, User
+from app.query_stats import query_stats
+from app.ratelimit import rate_limiter
+
+
+OPERATIONS = {
+    "view_task": 45,
+    "task_history": 15,
+    "toggle_task": 15,
+    "edit_task": 10,
+    "add_task": 10,
+    "login": 5,
+}
+
+# Endpoints whose queries count towards each operation
+ENDPOINTS = {
+    "view_task": ("tasks.view_task",),
+    "task_history": ("tasks.task_history",),
+    "toggle_task": ("tasks.toggle_task",),
+    "edit_task": ("tasks.edit_task",),
+    "add_task": ("tasks.add_task",),
+    "login": ("auth.logout", "auth.login", "auth.authenticate_email"),
+}
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+class TestClientTransport:
+    """Requests through ``app.test_client()``, in-process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        status = response.status_code
+        response.close()
+        return status, response.headers.get("Location", "")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """Requests over HTTP to a running server, with a cookie jar per client."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get("Location", "")
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get("Location", "")
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass  # one access log line per request would swamp the report
+
+
+class VirtualUser:
+    """One client session driving the operation mix."""
+
+    def __init__(self, app, transport, user_id, username, password, rng):
+        self.app = app
+        self.transport = transport
+        self.user_id = user_id
+        self.username = username
+        self.password = password
+        self.rng = rng
+        with app.app_context():
+            self.task_ids = [row[0] for row in db.session.query(Task.id).filter_by(user_id=user_id).limit(200)]
+
+    def _ok(self, status):
+        return status < 400
+
+    def login(self):
+        self.transport.request("GET", "/logout")
+        status, location = self.transport.request(
+            "POST", "/login", {"username": self.username, "password": self.password})
+        if status != 302 or "auth-pending" not in location:
+            return False
+        # The link the login email would carry
+        with self.app.app_context():
+            token = db.session.query(LoginOTP.otp_code).filter_by(user_id=self.user_id).scalar()
+        status, location = self.transport.request("GET", f"/authenticate-email/{token}")
+        return status == 302 and "/login" not in location
+
+    def view_task(self):
+        return self._ok(self.transport.request("GET", "/")[0])
+
+    def task_history(self):
+        return self._ok(self.transport.request("GET", "/history")[0])
+
+    def toggle_task(self):
+        if not self.task_ids:
+            return self.add_task()
+        return self._ok(self.transport.request(
+            "POST", "/toggle", {"task_id": self.rng.choice(self.task_ids)})[0])
+
+    def _task_form(self):
+        scheduled = date.today() + timedelta(days=self.rng.randint(0, 30))
+        return {
+            "title": f"Load test task {self.rng.randint(1, 10 ** 6)}",
+            "scheduled_date": scheduled.isoformat(),
+            "scheduled_time": f"{self.rng.randint(7, 21):02d}:{self.rng.choice((0, 30)):02d}",
+            "estimated_duration": str(self.rng.choice((15, 30, 60))),
+            "priority": self.rng.choice(("Low", "Medium", "High", "Urgent")),
+        }
+
+    def edit_task(self):
+        if not self.task_ids:
+            return self.add_task()
+        form = dict(self._task_form(), task_id=self.rng.choice(self.task_ids))
+        return self._ok(self.transport.request("POST", "/edit", form)[0])
+
+    def add_task(self):
+        return self._ok(self.transport.request("POST", "/add", self._task_form())[0])
+
+
+def _bench_users(app, count):
+    with app.app_context():
+        return db.session.query(User.id, User.username).filter(
+            User.username.like(f"{USERNAME_PREFIX}%")
+        ).order_by(User.id).limit(count).all()
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(app, clients=8, duration=15.0, server=False, password=DEFAULT_PASSWORD, random_seed=42, label=None):
+    """Drive the operation mix and return the report."""
+    users = _bench_users(app, clients)
+    if not users:
+        raise RuntimeError("No benchmark users found, run `flask bench seed` first")
+
+    previous = (app.config.get("WTF_CSRF_ENABLED", True), rate_limiter.enabled)
+    app.config["WTF_CSRF_ENABLED"] = False
+    rate_limiter.enabled = False
+    httpd = None
+    if server:
+        httpd = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+        threading.Thread(target=httpd.serve_forever, name="bench-server", daemon=True).start()
+        base_url = f"http://127.0.0.1:{httpd.server_port}"
+
+    names, weights = zip(*OPERATIONS.items())
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    queries_before = query_stats.stats()
+
+    def client(index):
+        user_id, username = users[index % len(users)]
+        transport = HttpTransport(base_url) if server else TestClientTransport(app)
+        vu = VirtualUser(app, transport, user_id, username, password, random.Random(random_seed + index))
+        if not vu.login():
+            with lock:
+                errors["login"] += 1
+            return
+        while time.perf_counter() < deadline:
+            name = vu.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(vu, name)()
+            except Exception as e:
+                print(f"⚠️ {name} failed: {e}")
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[name].append(elapsed)
+                errors[name] += not ok
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    deadline = started + duration
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        elapsed = time.perf_counter() - started
+        app.config["WTF_CSRF_ENABLED"], rate_limiter.enabled = previous
+        if httpd is not None:
+            httpd.shutdown()
+    queries_after = query_stats.stats()
+
+    def queries_for(endpoints):
+        return sum(queries_after.get(endpoint, {}).get("queries", 0)
+                   - queries_before.get(endpoint, {}).get("queries", 0) for endpoint in endpoints)
+
+    operations = {}
+    for name in names:
+        values = sorted(latencies[name])
+        operations[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "throughput": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 50) * 1000 if values else None,
+            "p95_ms": percentile(values, 95) * 1000 if values else None,
+            "p99_ms": percentile(values, 99) * 1000 if values else None,
+            "queries_per_op": queries_for(ENDPOINTS[name]) / len(values) if values else None,
+        }
+    total = sum(op["count"] for op in operations.values())
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    return {
+        "label": label,
+        "commit": _commit(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": dialect,
+        "transport": "wsgi-server" if server else "test-client",
+        "clients": clients,
+        "duration_s": elapsed,
+        "password_hash_method": app.config.get("PASSWORD_HASH_METHOD"),
+        "total": {
+            "count": total,
+            "errors": sum(op["errors"] for op in operations.values()),
+            "throughput": total / elapsed if elapsed else 0.0,
+        },
+        "operations": operations,
+    }
+
+
+def _ms(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def format_report(report):
+    lines = [
+        f"🏋️ {report['clients']} clients, {report['duration_s']:.1f}s, {report['transport']}, "
+        f"{report['database']}, commit {report['commit'] or 'unknown'}",
+        f"{'operation':<14} {'count':>7} {'errors':>7} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'queries':>8}",
+    ]
+    for name, op in report["operations"].items():
+        queries = f"{op['queries_per_op']:.1f}" if op["queries_per_op"] is not None else "-"
+        lines.append(
+            f"{name:<14} {op['count']:>7} {op['errors']:>7} {op['throughput']:>8.1f} {_ms(op['p50_ms']):>8} "
+            f"{_ms(op['p95_ms']):>8} {_ms(op['p99_ms']):>8} {queries:>8}"
+        )
+    total = report["total"]
+    lines.append(f"{'total':<14} {total['count']:>7} {total['errors']:>7} {total['throughput']:>8.1f}")
+    return "\n".join(lines)
+
+
+def format_comparison(before, after):
+    """Side-by-side p95 latency and throughput of two saved runs."""
+    lines = [
+        f"{'operation':<14} {'p95 before':>11} {'p95 after':>10} {'change':>8} "
+        f"{'ops/s before':>13} {'ops/s after':>12}",
+    ]
+    for name in after["operations"]:
+        old, new = before["operations"].get(name), after["operations"][name]
+        if old is None:
+            continue
+        change = "-"
+        if old["p95_ms"] and new["p95_ms"] is not None:
+            change = f"{(new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:+.0f}%"
+        lines.append(
+            f"{name:<14} {_ms(old['p95_ms']):>11} {_ms(new['p95_ms']):>10} {change:>8} "
+            f"{old['throughput']:>13.1f} {new['throughput']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def save(report, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    return path
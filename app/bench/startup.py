@@ -0,0 +1,110 @@
+"""
+Startup-time benchmark.
+
+Measures, each in a fresh interpreter so nothing is cached in-process:
+
+* worker boot: ``import app`` plus ``create_app()``, with both
+  ``DB_SCHEMA_CHECK`` modes;
+* CLI latency: wall time of ``flask routes``, which loads the app without
+  starting the scheduler or worker threads.
+
+Runs against a throwaway SQLite database unless ``--database-url`` is given.
+
+    python -m app.bench.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+
+# Runs in the child interpreter; os._exit skips waiting for worker threads
+_BOOT_SNIPPET = """
+import json, os, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported}), flush=True)
+os._exit(0)
+"""
+
+
+def _child_env(database_url, **overrides):
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=database_url,
+        FLASK_DEBUG="0",
+        FLASK_ENV="production",
+        PYTHONPATH=str(PROJECT_DIR),
+    )
+    env.update(overrides)
+    return env
+
+
+def measure_boot(database_url, runs, schema_check):
+    """Return per-phase timings (seconds) of ``runs`` worker boots."""
+    env = _child_env(database_url, DB_SCHEMA_CHECK=schema_check)
+    timings = {"import": [], "create_app": [], "total": []}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _BOOT_SNIPPET],
+            cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+        )
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        timings["import"].append(phases["import"])
+        timings["create_app"].append(phases["create_app"])
+        timings["total"].append(phases["import"] + phases["create_app"])
+    return timings
+
+
+def measure_cli(database_url, runs, command=("routes",)):
+    """Return wall times (seconds) of ``runs`` invocations of a flask CLI command."""
+    env = _child_env(database_url)
+    wall = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "app:create_app", *command],
+            cwd=PROJECT_DIR, env=env, capture_output=True, check=True
+        )
+        wall.append(time.perf_counter() - started)
+    return wall
+
+
+def _row(name, samples):
+    ms = [sample * 1000 for sample in samples]
+    return f"{name:<40} {min(ms):>8.1f} {statistics.median(ms):>8.1f} {max(ms):>8.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="runs per scenario (default: 5)")
+    parser.add_argument("--database-url", help="database to boot against (default: a temporary SQLite file)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/bench.db"
+        # Create the schema once so every measured boot sees the same database
+        measure_boot(database_url, 1, "create_all")
+
+        print(f"⏱️ Startup benchmark, {args.runs} runs per scenario (ms)")
+        print(f"{'scenario':<40} {'min':>8} {'median':>8} {'max':>8}")
+        for schema_check in ("create_all", "migrations"):
+            timings = measure_boot(database_url, args.runs, schema_check)
+            for phase in ("import", "create_app", "total"):
+                print(_row(f"boot [{schema_check}] {phase}", timings[phase]))
+        print(_row("cli: flask routes", measure_cli(database_url, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Set-based bulk operations.
+
+Used where a route would otherwise load, log and delete rows one ORM object
+at a time. History for hot tasks is written with one ``INSERT ... SELECT``
+per chunk that builds the JSON snapshot in SQL, and the deletes select the
+same chunk with a subquery, so no row or id ever round-trips through Python.
+Each chunk of ``BULK_CHUNK_SIZE`` tasks is committed on its own so a large
+delete never holds the SQLite write lock for long. Deleting a single task goes
+through the same statements, so both keep the task's earlier history.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, func, insert, literal, null, select
+
+from app import db
+from app.models import Task, TaskArchive, TaskHistory, Reminder, task_snapshot
+
+
+TASK_DELETE_DETAILS = ('Task "', '" deleted')
+BULK_DELETE_DETAILS = ('Task "', '" deleted (bulk delete)')
+
+
+def _snapshot_expression(dialect_name):
+    """SQL equivalent of ``task_snapshot`` for the current backend."""
+    if dialect_name == 'sqlite':
+        # Match the isoformat() strings task_snapshot produces. Datetimes are
+        # stored as 'YYYY-MM-DD HH:MM:SS.ffffff', so only the separator changes
+        # and the microseconds are kept.
+        scheduled_time = func.strftime('%H:%M:%S', Task.scheduled_time)
+        created_at = func.replace(Task.created_at, ' ', 'T')
+        updated_at = func.replace(Task.updated_at, ' ', 'T')
+    else:
+        scheduled_time, created_at, updated_at = Task.scheduled_time, Task.created_at, Task.updated_at
+    build = func.json_build_object if dialect_name == 'postgresql' else func.json_object
+    return build(
+        'title', Task.title,
+        'status', Task.status,
+        'priority', Task.priority,
+        'scheduled_date', Task.scheduled_date,
+        'scheduled_time', scheduled_time,
+        'estimated_duration', Task.estimated_duration,
+        'created_at', created_at,
+        'updated_at', updated_at,
+    )
+
+
+def _log_task_deletions(chunk, details):
+    """Write one 'deleted' history entry per task matching ``chunk``.
+
+    A single INSERT ... SELECT; returns the number of entries written.
+    """
+    prefix, suffix = details
+    snapshot = _snapshot_expression(db.session.get_bind().dialect.name)
+    columns = ['task_id', 'user_id', 'action', 'details', 'created_at', 'data', 'base_id']
+    result = db.session.execute(insert(TaskHistory.__table__).from_select(columns, select(
+        # The task row is going away; a full snapshot keeps the entry readable
+        null(),
+        Task.user_id,
+        literal('deleted', TaskHistory.action.type),
+        literal(prefix) + Task.title + literal(suffix),
+        literal(datetime.utcnow()),
+        snapshot,
+        null(),
+    ).where(chunk)))
+    return result.rowcount
+
+
+def _log_archived_deletions(user_id, archived):
+    """Write one 'deleted' history entry per archived task in a single INSERT."""
+    prefix, suffix = BULK_DELETE_DETAILS
+    now = datetime.utcnow()
+    db.session.execute(insert(TaskHistory), [
+        {
+            'task_id': None,
+            'user_id': user_id,
+            'action': 'deleted',
+            'details': f'{prefix}{task.title}{suffix}',
+            'created_at': now,
+            'data': task_snapshot(task),
+            'base_id': None,
+        }
+        for task in archived
+    ])
+
+
+def _delete_tasks(chunk, details=BULK_DELETE_DETAILS):
+    """Log and delete the tasks matching ``chunk``, with their reminders.
+
+    Earlier history is kept but detached, since SQLite may reuse the task
+    ids. Does not commit; returns the number of tasks deleted.
+    """
+    chunk_ids = select(Task.id).where(chunk)
+    count = _log_task_deletions(chunk, details)
+    TaskHistory.query.filter(TaskHistory.task_id.in_(chunk_ids)).update(
+        {TaskHistory.task_id: None}, synchronize_session=False
+    )
+    Reminder.query.filter(Reminder.task_id.in_(chunk_ids)).delete(synchronize_session=False)
+    Task.query.filter(chunk).delete(synchronize_session=False)
+    return count
+
+
+def delete_task(task_id):
+    """Delete one task the way ``clear_tasks`` deletes each of its tasks."""
+    _delete_tasks(Task.id == task_id, TASK_DELETE_DETAILS)
+    db.session.commit()
+
+
+def clear_tasks(user_id):
+    """Delete every task of a user, hot and archived, logging each deletion.
+
+    Returns the number of tasks removed.
+    """
+    chunk_size = int(current_app.config.get("BULK_CHUNK_SIZE", 2000))
+    cleared = 0
+
+    while True:
+        # Chunk = the user's tasks up to the chunk_size-th id (or all that remain)
+        bound = db.session.execute(
+            select(Task.id).where(Task.user_id == user_id)
+            .order_by(Task.id).offset(chunk_size - 1).limit(1)
+        ).scalar()
+        chunk = Task.user_id == user_id if bound is None else and_(Task.user_id == user_id, Task.id <= bound)
+
+        cleared += _delete_tasks(chunk)
+        db.session.commit()
+        if bound is None:
+            break
+
+    while True:
+        archived = TaskArchive.query.filter_by(user_id=user_id).order_by(TaskArchive.id).limit(chunk_size).all()
+        if not archived:
+            break
+
+        _log_archived_deletions(user_id, archived)
+        TaskArchive.query.filter(
+            TaskArchive.id.in_([task.id for task in archived])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        cleared += len(archived)
+
+    return cleared
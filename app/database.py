@@ -0,0 +1,274 @@
+"""
+Engine configuration, SQLite tuning profile and the read-only engine.
+
+``engine_options`` builds ``SQLALCHEMY_ENGINE_OPTIONS`` for whichever backend
+``DATABASE_URL`` points at: per-dialect pool defaults (a local SQLite file
+never goes stale; PostgreSQL and MySQL connections are pre-pinged and
+recycled before the server drops them), overridden by the ``DB_POOL_*``
+settings. ``pool_stats()`` reports how busy each engine's pool is.
+
+With SQLite's defaults (rollback journal, full sync) a writer locks the whole
+file, so request threads and the scheduler threads queue behind each other
+and now and then fail with "database is locked". With
+``SQLITE_PROFILE=production`` every connection is opened with:
+
+* ``journal_mode=WAL``: readers keep seeing the last committed data while a
+  write is in progress instead of waiting for it;
+* ``busy_timeout``: a writer waits up to ``SQLITE_BUSY_TIMEOUT_MS`` for the
+  write lock rather than failing straight away;
+* ``synchronous=NORMAL``: in WAL mode this only syncs at checkpoints. The
+  database cannot be corrupted, but a power cut may lose the last commits;
+* ``mmap_size``, ``cache_size`` and ``temp_store=MEMORY`` to keep hot pages
+  and sort buffers in memory.
+
+Whatever the profile, writing connections turn on ``foreign_keys`` so that
+``ON DELETE CASCADE`` and the other constraints in the models are enforced.
+
+Code that only reads (the task list, the history page, the digest job) uses
+``read_db.session``. It is bound to a second engine that opens the file with
+``mode=ro`` and ``query_only``, so those readers have their own connection
+pool and never wait for a connection that is busy writing. On other backends,
+or with ``DB_READ_ENGINE`` off, ``read_db`` uses the main engine.
+"""
+
+import threading
+from urllib.parse import quote
+
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import db
+
+
+# Pool settings per backend; DB_POOL_* settings take precedence
+POOL_DEFAULTS = {
+    # A local file: connections are cheap to open and never go stale
+    "sqlite": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30},
+    # Idle connections are dropped by server timeouts, proxies and failovers.
+    # LIFO reuses the warmest connections and lets the rest age out.
+    "postgresql": {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30,
+        "pool_recycle": 1800, "pool_pre_ping": True, "pool_use_lifo": True,
+    },
+    # Recycle well inside wait_timeout, which hosted MySQL often sets low
+    "mysql": {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30,
+        "pool_recycle": 280, "pool_pre_ping": True,
+    },
+}
+
+_POOL_SETTINGS = {
+    "DB_POOL_SIZE": "pool_size",
+    "DB_MAX_OVERFLOW": "max_overflow",
+    "DB_POOL_TIMEOUT": "pool_timeout",
+    "DB_POOL_RECYCLE": "pool_recycle",
+    "DB_POOL_PRE_PING": "pool_pre_ping",
+}
+
+
+def engine_options(database_uri, config):
+    """Return ``SQLALCHEMY_ENGINE_OPTIONS`` for ``database_uri``.
+
+    Settings left as None in ``config`` fall back to the dialect's defaults.
+    """
+    url = make_url(database_uri)
+    dialect = url.get_backend_name()
+    if dialect == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory databases share one connection (StaticPool), nothing to size
+        return {}
+
+    options = dict(POOL_DEFAULTS.get(dialect, POOL_DEFAULTS["postgresql"]))
+    for setting, option in _POOL_SETTINGS.items():
+        if config.get(setting) is not None:
+            options[option] = config[setting]
+
+    connect_timeout = config.get("DB_CONNECT_TIMEOUT")
+    statement_timeout = config.get("DB_STATEMENT_TIMEOUT_MS")
+    connect_args = {}
+    if dialect == "postgresql":
+        connect_args["application_name"] = config.get("DB_APPLICATION_NAME") or "college-project"
+        if connect_timeout:
+            connect_args["connect_timeout"] = int(connect_timeout)
+        if statement_timeout:
+            connect_args["options"] = f"-c statement_timeout={int(statement_timeout)}"
+    elif dialect == "mysql":
+        if connect_timeout:
+            connect_args["connect_timeout"] = int(connect_timeout)
+        if statement_timeout:
+            # Applies to SELECTs, which is what runs away in practice
+            connect_args["init_command"] = f"SET SESSION max_execution_time={int(statement_timeout)}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+class PoolMonitor:
+    """Counts connections and checkouts of one engine's pool."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                "dialect": self.engine.dialect.name,
+                "pool": type(pool).__name__,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+            }
+        # Only queue-based pools have a size
+        if hasattr(pool, "size"):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+_pool_monitors = {}
+
+
+def pool_stats():
+    """Return a snapshot of connection pool usage per engine."""
+    return {name: monitor.stats() for name, monitor in _pool_monitors.items()}
+
+
+def sqlite_pragmas(config, read_only=False):
+    """Return the ``(pragma, value)`` pairs applied to each new connection."""
+    pragmas = []
+    if not read_only:
+        # SQLite ignores ON DELETE CASCADE and every other foreign key
+        # constraint unless each connection turns enforcement on
+        pragmas.append(("foreign_keys", "ON"))
+    if config["SQLITE_PROFILE"] == "production":
+        pragmas.append(("busy_timeout", int(config["SQLITE_BUSY_TIMEOUT_MS"])))
+        if not read_only:
+            # Both are properties of the writer; WAL is stored in the file itself
+            pragmas.append(("journal_mode", "WAL"))
+            pragmas.append(("synchronous", "NORMAL"))
+        pragmas.append(("mmap_size", int(config["SQLITE_MMAP_SIZE"])))
+        # Negative values are KiB rather than pages
+        pragmas.append(("cache_size", -int(config["SQLITE_CACHE_SIZE_KIB"])))
+        pragmas.append(("temp_store", "MEMORY"))
+    if read_only:
+        pragmas.append(("query_only", "ON"))
+    return pragmas
+
+
+def _pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def read_only_url(url):
+    """Return a URL opening the same SQLite file read-only, or None."""
+    url = make_url(url)
+    path = url.database
+    if not path or path == ":memory:" or path.startswith("file:"):
+        return None
+    path = path.replace("\\", "/")
+    # file:///C:/... on Windows, file:///home/... elsewhere
+    uri = "file://" + ("" if path.startswith("/") else "/") + quote(path)
+    return url.set(database=uri, query={**url.query, "mode": "ro", "uri": "true"})
+
+
+def _app_ctx_id():
+    return id(app_ctx._get_current_object())
+
+
+class ReadDatabase:
+    """Read-only engine and session for code that never writes."""
+
+    def __init__(self):
+        self.app = None
+        self.engine = None
+        # One session per app context, like db.session
+        self.session = scoped_session(sessionmaker(), scopefunc=_app_ctx_id)
+
+    def init_app(self, app):
+        """Apply the SQLite profile to ``db`` and set up the read engine.
+
+        Must run after ``db.init_app(app)`` and before the first connection.
+        """
+        app.config.setdefault("SQLITE_PROFILE", "production")
+        app.config.setdefault("SQLITE_BUSY_TIMEOUT_MS", 5000)
+        app.config.setdefault("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+        app.config.setdefault("SQLITE_CACHE_SIZE_KIB", 16384)
+        app.config.setdefault("DB_READ_ENGINE", True)
+        self.app = app
+
+        with app.app_context():
+            primary = db.engine
+
+        url = None
+        if primary.dialect.name == "sqlite":
+            event.listen(primary, "connect", _pragma_listener(sqlite_pragmas(app.config)))
+            if app.config["DB_READ_ENGINE"]:
+                url = read_only_url(primary.url)
+
+        if url is not None:
+            self.engine = create_engine(url, **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+            event.listen(self.engine, "connect", _pragma_listener(sqlite_pragmas(app.config, read_only=True)))
+        else:
+            self.engine = primary
+        self.session.session_factory.configure(bind=self.engine)
+
+        _pool_monitors.clear()
+        _pool_monitors["primary"] = PoolMonitor(primary)
+        if self.engine is not primary:
+            _pool_monitors["read"] = PoolMonitor(self.engine)
+
+        app.teardown_appcontext(self._remove_session)
+        app.extensions["read_db"] = self
+
+    def _remove_session(self, exc):
+        self.session.remove()
+
+    def query(self, model):
+        """Return ``model.query`` running on the read-only session."""
+        return model.query.with_session(self.session())
+
+
+read_db = ReadDatabase()
@@ -0,0 +1,266 @@
+"""
+Scheduler job framework.
+
+Periodic jobs are registered with ``jobs.add`` instead of calling
+``scheduler.add_job`` directly. Around every run the framework:
+
+* checks that the tables the job needs exist, reading the table list once
+  instead of introspecting the schema on every run;
+* refuses to start a run while the previous one is still going (APScheduler's
+  ``max_instances=1`` and ``coalesce`` for scheduled runs, a lock for runs
+  started by hand with ``jobs.run``);
+* gives the run a time budget (``JOB_TIME_BUDGET_SECONDS``). Batch loops poll
+  ``out_of_time()`` and stop at a chunk boundary, leaving the rest for the
+  next run;
+* delays each run by up to ``JOB_JITTER_SECONDS`` so jobs sharing an interval
+  do not all hit the database at the same moment;
+* records duration, items processed (reported with ``add_items``), SQL
+  queries and database time, and lag behind the scheduled time in
+  ``jobs.stats()``, and logs runs that go over their budget.
+
+State a job carries between runs (throttles, resume cursors) is kept with
+``load_state``/``save_state`` in the ``job_state`` table.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_SUBMITTED
+from sqlalchemy import inspect
+
+from app import db
+from app.metrics import metrics
+from app.query_stats import query_stats
+
+
+_local = threading.local()
+
+
+class JobRun:
+    """State of the job run executing on the current thread."""
+
+    def __init__(self, job_id, budget):
+        self.job_id = job_id
+        self.budget = budget
+        self.started = time.monotonic()
+        self.started_at = datetime.utcnow()
+        self.items = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def out_of_time(self):
+        return self.budget is not None and self.elapsed >= self.budget
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def out_of_time():
+    """Return True once the running job has used up its time budget.
+
+    Always False outside a job run, so a job function called directly runs
+    to completion.
+    """
+    run = current_run()
+    return run is not None and run.out_of_time()
+
+
+def add_items(count):
+    """Add ``count`` to the items processed by the running job."""
+    run = current_run()
+    if run is not None:
+        run.items += count
+
+
+def load_state(key, default=None):
+    """Return the value a job saved under ``key``, or ``default``.
+
+    Job state lives in the database rather than ``app.config`` so that it
+    survives restarts and is seen by whichever process runs the job next.
+    """
+    from app.models import JobState
+
+    state = db.session.get(JobState, key)
+    return default if state is None or state.value is None else state.value
+
+
+def save_state(key, value):
+    """Store ``value`` (JSON-serialisable) under ``key``. The caller commits."""
+    from app.models import JobState
+
+    state = db.session.get(JobState, key)
+    if state is None:
+        db.session.add(JobState(key=key, value=value))
+    else:
+        state.value = value
+
+
+class _Job:
+    def __init__(self, job_id, func, tables, budget):
+        self.id = job_id
+        self.func = func
+        self.tables = frozenset(tables)
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.stats = {
+            "runs": 0,
+            "failures": 0,
+            "skipped": 0,
+            "over_budget": 0,
+            "items": 0,
+            "last_items": 0,
+            "queries": 0,
+            "last_queries": 0,
+            "last_db_time": None,
+            "last_duration": None,
+            "max_duration": 0.0,
+            "total_duration": 0.0,
+            "last_lag": None,
+            "max_lag": 0.0,
+            "last_started_at": None,
+            "last_error": None,
+        }
+
+
+class JobRegistry:
+    """Registers scheduler jobs and wraps every run with guards and timing."""
+
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self._jobs = {}
+        self._tables = None
+        self._schema_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def init_app(self, app, scheduler):
+        app.config.setdefault("JOB_TIME_BUDGET_SECONDS", 60)
+        app.config.setdefault("JOB_JITTER_SECONDS", 15)
+        self.app = app
+        self.scheduler = scheduler
+        app.extensions["jobs"] = self
+        scheduler.add_listener(self._on_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES)
+
+    def add(self, job_id, func, tables=(), budget=None, jitter=None, **trigger):
+        """Schedule ``func(app)`` under the framework.
+
+        ``tables`` are the tables the job reads or writes; ``budget`` and
+        ``jitter`` override the configured defaults (seconds). The remaining
+        keyword arguments describe the APScheduler trigger.
+        """
+        config = self.app.config
+        if budget is None:
+            budget = float(config["JOB_TIME_BUDGET_SECONDS"])
+        if jitter is None:
+            jitter = int(config["JOB_JITTER_SECONDS"])
+        self._jobs[job_id] = _Job(job_id, func, tables, budget)
+        self.scheduler.add_job(
+            id=job_id,
+            func=self.run,
+            args=(job_id,),
+            max_instances=1,
+            coalesce=True,
+            jitter=jitter or None,
+            **trigger
+        )
+
+    def schema_ready(self, tables):
+        """Return True if every table in ``tables`` exists.
+
+        The table list is read on first use and only read again while a
+        table is missing, e.g. until pending migrations have been applied.
+        """
+        with self._schema_lock:
+            if self._tables is None or not tables <= self._tables:
+                with self.app.app_context():
+                    self._tables = set(inspect(db.engine).get_table_names())
+            return tables <= self._tables
+
+    def run(self, job_id):
+        """Run a job now unless its previous run is still going.
+
+        Returns True if the job ran without raising.
+        """
+        job = self._jobs[job_id]
+        if not job.lock.acquire(blocking=False):
+            self._skipped(job)
+            return False
+        try:
+            if not self.schema_ready(job.tables):
+                print(f"⚠️ Tables for {job_id} not found, skipping")
+                return False
+
+            run = _local.run = JobRun(job_id, job.budget)
+            query_stats.begin(f"job:{job_id}")
+            error = None
+            try:
+                job.func(self.app)
+            except Exception as e:
+                error = e
+                print(f"Error in job {job_id}: {e}")
+            finally:
+                _local.run = None
+                queries = query_stats.end()
+            self._record(job, run, error, queries)
+            return error is None
+        finally:
+            job.lock.release()
+
+    def _skipped(self, job):
+        with self._stats_lock:
+            job.stats["skipped"] += 1
+        print(f"⏭️ Skipping {job.id}: previous run still in progress")
+
+    def _record(self, job, run, error, queries=None):
+        duration = run.elapsed
+        over_budget = job.budget is not None and duration > job.budget
+        with self._stats_lock:
+            stats = job.stats
+            stats["runs"] += 1
+            stats["items"] += run.items
+            stats["last_items"] = run.items
+            stats["last_duration"] = duration
+            stats["max_duration"] = max(stats["max_duration"], duration)
+            stats["total_duration"] += duration
+            stats["last_started_at"] = run.started_at
+            if queries is not None:
+                stats["queries"] += queries.queries
+                stats["last_queries"] = queries.queries
+                stats["last_db_time"] = queries.seconds
+            if error is not None:
+                stats["failures"] += 1
+                stats["last_error"] = str(error)[:500]
+            if over_budget:
+                stats["over_budget"] += 1
+        metrics.job_duration.observe(duration, job.id)
+        if over_budget:
+            print(f"🐢 Job {job.id} took {duration:.1f}s, over its {job.budget:.0f}s budget ({run.items} items)")
+
+    def _on_event(self, event):
+        job = self._jobs.get(event.job_id)
+        if job is None:
+            return
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            self._skipped(job)
+            return
+        # Measured when the scheduler hands the run to its executor
+        scheduled = event.scheduled_run_times[-1]
+        lag = max(0.0, (datetime.now(scheduled.tzinfo) - scheduled).total_seconds())
+        with self._stats_lock:
+            job.stats["last_lag"] = lag
+            job.stats["max_lag"] = max(job.stats["max_lag"], lag)
+
+    def stats(self):
+        """Return a snapshot of the statistics of every registered job."""
+        with self._stats_lock:
+            return {
+                job_id: dict(job.stats, budget=job.budget)
+                for job_id, job in self._jobs.items()
+            }
+
+
+jobs = JobRegistry()
@@ -0,0 +1,158 @@
+"""
+Scheduler leader election.
+
+Under a WSGI server with several worker processes every process calls
+``create_app()``, and each used to start its own scheduler, so every job ran
+once per worker. Now each process starts the scheduler paused and competes
+for a lease row in ``scheduler_lease``. The holder resumes its scheduler and
+renews the lease every ``LEADER_HEARTBEAT_SECONDS``. If it stops renewing
+(the process died or hung) the lease expires after ``LEADER_LEASE_SECONDS``
+and another process takes over on its next heartbeat. A process that finds
+it has lost the lease pauses its scheduler again. Other services that should
+only run in one process register a callback with ``on_change``.
+
+Taking or renewing the lease is a single conditional UPDATE, so at most one
+process can hold it at a time. Lease times come from each process's own
+clock; processes sharing a database are expected to have synchronised clocks.
+"""
+
+import atexit
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import SchedulerLease
+
+
+class LeaderElection:
+    """Keeps the scheduler running in exactly one process."""
+
+    lease_name = "scheduler"
+
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._callbacks = []
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app, scheduler):
+        app.config.setdefault("LEADER_LEASE_SECONDS", 30)
+        app.config.setdefault("LEADER_HEARTBEAT_SECONDS", 10)
+        self.app = app
+        self.scheduler = scheduler
+        self._callbacks = []
+        app.extensions["leader"] = self
+
+    def on_change(self, callback):
+        """Call ``callback(is_leader)`` whenever this process gains or loses the lease."""
+        self._callbacks.append(callback)
+
+    def start(self):
+        """Take part in the election (idempotent)."""
+        if self._thread or self.app is None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+        # Hand the lease over straight away on a clean shutdown
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        if self.is_leader:
+            self._release()
+
+    def _run(self):
+        heartbeat = float(self.app.config["LEADER_HEARTBEAT_SECONDS"])
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    leader = self._try_acquire()
+            except Exception as e:
+                print(f"Leader election error: {e}")
+                leader = False
+            self._set_leader(leader)
+            self._stopping.wait(heartbeat)
+
+    def _try_acquire(self):
+        """Take the lease if it is free or expired, or renew it if it is ours."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=int(self.app.config["LEADER_LEASE_SECONDS"]))
+        values = {
+            SchedulerLease.holder: self.holder_id,
+            SchedulerLease.heartbeat_at: now,
+            SchedulerLease.expires_at: expires_at,
+        }
+        if not self.is_leader:
+            values[SchedulerLease.acquired_at] = now
+
+        updated = SchedulerLease.query.filter(
+            SchedulerLease.name == self.lease_name,
+            or_(SchedulerLease.holder == self.holder_id, SchedulerLease.expires_at < now)
+        ).update(values, synchronize_session=False)
+        if updated:
+            db.session.commit()
+            return True
+
+        if db.session.get(SchedulerLease, self.lease_name) is not None:
+            db.session.rollback()
+            return False
+
+        # First process ever to start against this database
+        db.session.add(SchedulerLease(
+            name=self.lease_name,
+            holder=self.holder_id,
+            acquired_at=now,
+            heartbeat_at=now,
+            expires_at=expires_at
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        return True
+
+    def _release(self):
+        try:
+            with self.app.app_context():
+                SchedulerLease.query.filter_by(
+                    name=self.lease_name, holder=self.holder_id
+                ).update({SchedulerLease.expires_at: datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            print(f"Error releasing scheduler lease: {e}")
+        self._set_leader(False)
+
+    def _set_leader(self, leader):
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        for callback in self._callbacks:
+            try:
+                callback(leader)
+            except Exception as e:
+                print(f"Error handling scheduler leader change: {e}")
+        if not self.scheduler.running:
+            return
+        if leader:
+            self.scheduler.resume()
+            print(f"👑 {self.holder_id} is now the scheduler leader")
+        else:
+            self.scheduler.pause()
+            print(f"💤 {self.holder_id} is no longer the scheduler leader")
+
+
+leader_election = LeaderElection()
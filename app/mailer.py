@@ -0,0 +1,103 @@
+"""
+Batched SMTP delivery.
+
+``mail.send`` opens and closes a full SMTP (+TLS +AUTH) session for every
+message. Jobs that send many emails in one run use ``BatchMailer`` instead,
+which keeps one authenticated connection open across messages, reconnects
+transparently when the server drops the session and rotates the connection
+after ``MAIL_MAX_PER_CONNECTION`` messages.
+"""
+
+import smtplib
+import time
+
+from flask import current_app
+
+from app import mail
+from app.metrics import metrics
+
+
+# Errors that mean the session itself is gone rather than the message being bad
+_CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def _is_connection_error(error):
+    if isinstance(error, _CONNECTION_ERRORS):
+        return True
+    # 421: service not available, the server is closing the channel
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+
+class BatchMailer:
+    """Send many messages over as few SMTP connections as possible.
+
+    Usage::
+
+        with BatchMailer() as mailer:
+            for msg in messages:
+                mailer.send(msg)
+    """
+
+    def __init__(self, max_per_connection=None, max_reconnects=None):
+        config = current_app.config
+        self.max_per_connection = int(max_per_connection or config.get("MAIL_MAX_PER_CONNECTION", 100))
+        self.max_reconnects = int(
+            max_reconnects if max_reconnects is not None else config.get("MAIL_MAX_RECONNECTS", 2)
+        )
+        self._connection = None
+        self._sent_on_connection = 0
+        self.sent = 0
+        self.connections_opened = 0
+        self.reconnects = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()
+        self._connection = connection
+        self._sent_on_connection = 0
+        self.connections_opened += 1
+
+    def close(self):
+        """Close the current connection, ignoring errors from a dead session."""
+        if self._connection is None:
+            return
+        try:
+            self._connection.__exit__(None, None, None)
+        except Exception:
+            pass
+        self._connection = None
+
+    def send(self, message):
+        """Send one message, reconnecting and retrying if the session dropped."""
+        started = time.perf_counter()
+        for attempt in range(self.max_reconnects + 1):
+            try:
+                if self._connection is None:
+                    self._open()
+                self._connection.send(message)
+            except Exception as e:
+                if not _is_connection_error(e) or attempt == self.max_reconnects:
+                    metrics.mail_failures.inc()
+                    raise
+                # Session was dropped by the server; resume on a fresh one
+                self.close()
+                self.reconnects += 1
+                continue
+
+            metrics.mail_latency.observe(time.perf_counter() - started)
+            self.sent += 1
+            self._sent_on_connection += 1
+            if self._sent_on_connection >= self.max_per_connection:
+                self.close()
+            return
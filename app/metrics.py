@@ -0,0 +1,264 @@
+"""
+In-process metrics in the Prometheus text format.
+
+``GET /metrics`` reports:
+
+* request latency histograms and error counts per endpoint (``auth.*``,
+  ``tasks.*``, ``notify.*``);
+* connection pool usage per engine and SQL query counts per request
+  endpoint and per job;
+* SMTP send latency and failures;
+* scheduler job durations, runs, failures and lag, and how late reminders
+  go out (send time minus ``remind_at``);
+* the user cache, password hashing pool and rate limiter counters.
+
+Histograms and counters are plain Python numbers behind one small lock per
+metric, held only for the increment; the other figures are read from the
+``stats()`` of each component when the endpoint is scraped. Nothing is
+exported or pushed anywhere: point a Prometheus server (or ``curl``) at the
+endpoint.
+
+With ``METRICS_TOKEN`` set the endpoint requires ``Authorization: Bearer
+<token>``; without it only requests from the local host are served.
+"""
+
+import bisect
+import hmac
+import threading
+import time
+
+from flask import Response, abort, g, request
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Bucketed observations, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(float(bound))
+                yield self.name + "_bucket" + _labels(self.labelnames, labels, [("le", le)]), cumulative
+            yield self.name + "_sum" + _labels(self.labelnames, labels), total
+            yield self.name + "_count" + _labels(self.labelnames, labels), cumulative
+
+
+class Metrics:
+    """Metrics recorded in-process and served at ``/metrics``."""
+
+    def __init__(self):
+        self.app = None
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Request latency by endpoint", ("endpoint", "method"))
+        self.request_errors = Counter(
+            "http_request_errors_total", "Responses with a 5xx status or an unhandled exception",
+            ("endpoint", "status"))
+        self.mail_latency = Histogram(
+            "mail_send_duration_seconds", "Time to hand one message to the SMTP server")
+        self.mail_failures = Counter(
+            "mail_send_failures_total", "Messages the SMTP server did not accept")
+        self.job_duration = Histogram(
+            "job_duration_seconds", "Scheduler job run time", ("job",), JOB_BUCKETS)
+        self.reminder_lag = Histogram(
+            "reminder_dispatch_lag_seconds", "Reminder send time minus its remind_at", buckets=LAG_BUCKETS)
+        self._recorded = (
+            self.request_latency, self.request_errors, self.mail_latency,
+            self.mail_failures, self.job_duration, self.reminder_lag,
+        )
+
+    def init_app(self, app):
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.config.setdefault("METRICS_TOKEN", "")
+        self.app = app
+        self.reset()
+        if app.config["METRICS_ENABLED"]:
+            app.before_request(self._start_request)
+            app.after_request(self._record_status)
+            app.teardown_request(self._finish_request)
+            app.add_url_rule("/metrics", "metrics", self.view)
+        app.extensions["metrics"] = self
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        for metric in self._recorded:
+            metric.reset()
+
+    def _start_request(self):
+        g._metrics_started = time.perf_counter()
+
+    def _record_status(self, response):
+        g._metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, exc):
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return
+        status = 500 if exc is not None else g.pop("_metrics_status", 500)
+        # Unmatched URLs share one label so scanners cannot blow up the series count
+        endpoint = request.endpoint or "unmatched"
+        self.request_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        if status >= 500:
+            self.request_errors.inc(endpoint, str(status))
+
+    def _allowed(self):
+        token = self.app.config["METRICS_TOKEN"]
+        if token:
+            return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+        return request.remote_addr in ("127.0.0.1", "::1")
+
+    def view(self):
+        if not self._allowed():
+            abort(404)
+        return Response(self.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    def _component_metrics(self):
+        """Yield ``(name, kind, help, [(labels, value), ...])`` read from each component."""
+        from app.database import pool_stats
+        from app.jobs import jobs
+        from app.passwords import passwords
+        from app.query_stats import query_stats
+        from app.ratelimit import rate_limiter
+        from app.user_cache import user_cache
+
+        pools = pool_stats()
+        for key, kind, help in (
+            ("checked_out", "gauge", "Connections currently checked out"),
+            ("peak_checked_out", "gauge", "Most connections checked out at once"),
+            ("size", "gauge", "Configured pool size"),
+            ("overflow", "gauge", "Connections open beyond the pool size"),
+            ("checkouts", "counter", "Connection checkouts"),
+            ("connects", "counter", "New database connections"),
+            ("invalidations", "counter", "Connections discarded after an error"),
+        ):
+            name = f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+            yield name, kind, help, [({"engine": engine}, stats[key])
+                                     for engine, stats in pools.items() if key in stats]
+
+        queries = query_stats.stats()
+        yield "db_queries_total", "counter", "SQL statements by endpoint or job", [
+            ({"context": context}, totals["queries"]) for context, totals in queries.items()]
+        yield "db_query_seconds_total", "counter", "Database time by endpoint or job", [
+            ({"context": context}, totals["seconds"]) for context, totals in queries.items()]
+        yield "db_n_plus_one_total", "counter", "Requests or job runs that repeated a statement", [
+            ({"context": context}, totals["n_plus_one"]) for context, totals in queries.items()]
+
+        job_stats = jobs.stats()
+        for key, name, help in (
+            ("runs", "job_runs_total", "Completed job runs"),
+            ("failures", "job_failures_total", "Job runs that raised"),
+            ("skipped", "job_skipped_total", "Runs skipped because the previous one was still going"),
+            ("over_budget", "job_over_budget_total", "Runs that went over their time budget"),
+            ("items", "job_items_total", "Items processed by job runs"),
+        ):
+            yield name, "counter", help, [({"job": job}, stats[key]) for job, stats in job_stats.items()]
+        yield "job_lag_seconds", "gauge", "Delay of the last run behind its scheduled time", [
+            ({"job": job}, stats["last_lag"]) for job, stats in job_stats.items()
+            if stats["last_lag"] is not None]
+
+        cache = user_cache.stats()
+        yield "user_cache_hits_total", "counter", "User loader cache hits", [({}, cache["hits"])]
+        yield "user_cache_misses_total", "counter", "User loader cache misses", [({}, cache["misses"])]
+        yield "user_cache_size", "gauge", "Users in the cache", [({}, cache["size"])]
+
+        hashing = passwords.stats()
+        yield "password_hash_total", "counter", "Password hashes and checks", [
+            ({"operation": "hash"}, hashing["hashed"]), ({"operation": "verify"}, hashing["verified"])]
+        yield "password_hash_rejected_total", "counter", "Password checks turned away by a full pool", [
+            ({}, hashing["rejected"])]
+
+        yield "rate_limited_total", "counter", "Requests turned away by the rate limiter", [
+            ({}, rate_limiter.stats()["limited"])]
+
+    def render(self):
+        lines = []
+        for metric in self._recorded:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_number(value)}" for sample, value in metric.samples())
+        for name, kind, help, samples in self._component_metrics():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}"
+                         for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -2,9 +2,15 @@ from datetime import datetime
 # avoid "from app import db" — import the extension relatively
 from . import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import passwords
 from sqlalchemy import Enum
+from sqlalchemy.orm import object_session, validates
 import json
+import zlib
+
+
+# Sort rank for each priority; lower ranks are listed first
+PRIORITY_RANKS = {"Urgent": 0, "High": 1, "Medium": 2, "Low": 3}
 
 
 class User(db.Model, UserMixin):
@@ -20,10 +26,10 @@ class User(db.Model, UserMixin):
     reminders = db.relationship('Reminder', back_populates='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(self.password_hash, password)
     
     def __repr__(self):
         return f"<User {self.username}>"
@@ -47,27 +53,61 @@ class Task(db.Model):
         default="Medium",
         nullable=False,
     )
+    # Integer mirror of priority so the task list can be ordered by index
+    priority_rank = db.Column(db.Integer, default=PRIORITY_RANKS["Medium"], server_default="2", nullable=False)
 
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
 
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=True)
     owner = db.relationship("User", back_populates="tasks")
     history = db.relationship('TaskHistory', back_populates='task', lazy=True, cascade='all, delete-orphan')
+    reminders = db.relationship('Reminder', back_populates='task', lazy=True, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # Task list: filter by owner, order by priority rank then schedule
+        db.Index("ix_task_user_priority_rank_schedule", "user_id", "priority_rank", "scheduled_date", "scheduled_time"),
+        # Digest job: owners with open tasks, walked in user id order
+        db.Index("ix_task_user_status", "user_id", "status"),
+        # Archive job: tasks completed before the cutoff
+        db.Index("ix_task_status_updated", "status", "updated_at"),
+    )
+
+    # Tasks in the hot table; see TaskArchive
+    archived = False
+
+    @validates("priority")
+    def _sync_priority_rank(self, key, value):
+        self.priority_rank = PRIORITY_RANKS.get(value, PRIORITY_RANKS["Medium"])
+        return value
 
     def __repr__(self):
         return f"<Task {self.title} [{self.status}]>"
 
 
+def task_snapshot(task_obj):
+    """The task fields recorded in history"""
+    return {
+        'title': task_obj.title,
+        'status': task_obj.status,
+        'priority': task_obj.priority,
+        'scheduled_date': task_obj.scheduled_date.isoformat() if task_obj.scheduled_date else None,
+        'scheduled_time': task_obj.scheduled_time.isoformat() if task_obj.scheduled_time else None,
+        'estimated_duration': task_obj.estimated_duration,
+        'created_at': task_obj.created_at.isoformat() if task_obj.created_at else None,
+        'updated_at': task_obj.updated_at.isoformat() if task_obj.updated_at else None
+    }
+
+
 class TaskHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     
     # Task reference (nullable for deleted tasks)
-    task_id = db.Column(db.Integer, db.ForeignKey("task.id"), nullable=True)
+    task_id = db.Column(db.Integer, db.ForeignKey("task.id"), nullable=True, index=True)
     task = db.relationship("Task", back_populates="history")
     
     # User who performed the action
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     user = db.relationship("User")
     
     # Action type: 'created', 'updated', 'deleted', 'status_changed'
@@ -76,8 +116,10 @@ class TaskHistory(db.Model):
         nullable=False
     )
     
-    # Task data at the time of action (JSON format)
-    task_data = db.Column(db.Text, nullable=True)  # JSON string of task data
+    # Task data at the time of action: a full snapshot when base_id is NULL,
+    # otherwise only the fields that differ from the snapshot row base_id
+    data = db.Column(db.JSON, nullable=True)
+    base_id = db.Column(db.Integer, nullable=True, index=True)  # no FK: a task's rows are deleted together
     
     # Additional details for the action
     details = db.Column(db.String(500), nullable=True)  # e.g., "Status changed from Pending to In Progress"
@@ -85,92 +127,435 @@ class TaskHistory(db.Model):
     # Timestamp
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
-    def set_task_data(self, task_obj):
-        """Store task data as JSON"""
-        if task_obj:
-            data = {
-                'title': task_obj.title,
-                'status': task_obj.status,
-                'priority': task_obj.priority,
-                'scheduled_date': task_obj.scheduled_date.isoformat() if task_obj.scheduled_date else None,
-                'scheduled_time': task_obj.scheduled_time.isoformat() if task_obj.scheduled_time else None,
-                'estimated_duration': task_obj.estimated_duration,
-                'created_at': task_obj.created_at.isoformat() if task_obj.created_at else None,
-                'updated_at': task_obj.updated_at.isoformat() if task_obj.updated_at else None
+    __table_args__ = (
+        # History page: newest entries for one user
+        db.Index("ix_task_history_user_created", "user_id", "created_at"),
+        # Archive job: entries older than the cutoff
+        db.Index("ix_task_history_created", "created_at"),
+    )
+
+    # Entries in the hot table; see TaskHistoryArchive
+    archived = False
+    
+    def set_task_data(self, task_obj, snapshot_interval=10):
+        """Store task data as a delta against the task's latest snapshot.
+
+        A full snapshot is written for the first entry of a task, for
+        'deleted' entries and once ``snapshot_interval`` entries share a base.
+        """
+        if not task_obj:
+            return
+        current = task_snapshot(task_obj)
+        self.__dict__['_task_data'] = current
+
+        base = None
+        if task_obj.id is not None and self.action != 'deleted':
+            base = TaskHistory._current_snapshot(task_obj.id, snapshot_interval)
+        self.rebase(base)
+
+    @classmethod
+    def _current_snapshot(cls, task_id, snapshot_interval):
+        """Snapshot row the next entry of a task can be a delta of, if any."""
+        latest = db.session.query(cls.id, cls.base_id).filter(
+            cls.task_id == task_id
+        ).order_by(cls.id.desc()).first()
+        if latest is None:
+            return None
+        base_id = latest.base_id or latest.id
+        deltas = db.session.query(cls.id).filter(cls.base_id == base_id).count()
+        if deltas + 1 >= snapshot_interval:
+            return None
+        return db.session.get(cls, base_id)
+
+    def rebase(self, base=None):
+        """Re-encode against another snapshot row, or as a full snapshot if None."""
+        current = self.get_task_data()
+        if base is None or current is None:
+            self.data, self.base_id = current, None
+        else:
+            base_data = base.get_task_data() or {}
+            self.data = {
+                key: value for key, value in current.items()
+                if key not in base_data or base_data[key] != value
             }
-            self.task_data = json.dumps(data)
+            self.base_id = base.id
+    
+    def get_task_data(self):
+        """Reconstruct the task data (decoded once per instance)"""
+        if '_task_data' not in self.__dict__:
+            data = self.data
+            if data is not None and self.base_id is not None:
+                # Same session as this entry, which may be the read-only one
+                base = (object_session(self) or db.session).get(TaskHistory, self.base_id)
+                data = {**((base.get_task_data() if base else None) or {}), **data}
+            self.__dict__['_task_data'] = data
+        return self.__dict__['_task_data']
     
+    def __repr__(self):
+        return f"<TaskHistory {self.action} by user {self.user_id} at {self.created_at}>"
+
+
+def _compress(data):
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+class TaskArchive(db.Model):
+    """A task completed long ago, moved out of the hot ``task`` table.
+
+    Only the columns the task list filters and sorts on are stored as plain
+    columns; everything else lives in a compressed JSON payload.
+    """
+    __tablename__ = "task_archive"
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)  # id the task had in the hot table
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=True)
+    priority_rank = db.Column(db.Integer, nullable=False)
+    scheduled_date = db.Column(db.Date, nullable=True)
+    scheduled_time = db.Column(db.Time, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON
+
+    __table_args__ = (
+        # Same order as ix_task_user_priority_rank_schedule so tiers merge cheaply
+        db.Index("ix_task_archive_user_priority_rank_schedule", "user_id", "priority_rank", "scheduled_date", "scheduled_time"),
+    )
+
+    archived = True
+
+    @classmethod
+    def from_task(cls, task):
+        return cls(
+            task_id=task.id,
+            user_id=task.user_id,
+            priority_rank=task.priority_rank,
+            scheduled_date=task.scheduled_date,
+            scheduled_time=task.scheduled_time,
+            completed_at=task.updated_at,
+            payload=_compress({
+                'title': task.title,
+                'status': task.status,
+                'priority': task.priority,
+                'estimated_duration': task.estimated_duration,
+                'created_at': task.created_at.isoformat() if task.created_at else None,
+                'updated_at': task.updated_at.isoformat() if task.updated_at else None
+            })
+        )
+
+    def get_data(self):
+        """Decompressed payload (cached per instance)"""
+        if '_data' not in self.__dict__:
+            self.__dict__['_data'] = _decompress(self.payload)
+        return self.__dict__['_data']
+
+    @property
+    def title(self):
+        return self.get_data()['title']
+
+    @property
+    def status(self):
+        return self.get_data()['status']
+
+    @property
+    def priority(self):
+        return self.get_data()['priority']
+
+    @property
+    def estimated_duration(self):
+        return self.get_data()['estimated_duration']
+
+    @property
+    def created_at(self):
+        value = self.get_data()['created_at']
+        return datetime.fromisoformat(value) if value else None
+
+    @property
+    def updated_at(self):
+        value = self.get_data()['updated_at']
+        return datetime.fromisoformat(value) if value else None
+
+    def to_task(self):
+        """Build a new hot ``Task`` from this archive row."""
+        return Task(
+            title=self.title,
+            status=self.status,
+            priority=self.priority,
+            scheduled_date=self.scheduled_date,
+            scheduled_time=self.scheduled_time,
+            estimated_duration=self.estimated_duration,
+            created_at=self.created_at,
+            user_id=self.user_id
+        )
+
+    def __repr__(self):
+        return f"<TaskArchive {self.task_id} archived at {self.archived_at}>"
+
+
+class TaskHistoryArchive(db.Model):
+    """A history entry older than the archive cutoff, stored compressed."""
+    __tablename__ = "task_history_archive"
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=True)  # plain id, the task may be gone or archived
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON
+
+    __table_args__ = (
+        db.Index("ix_task_history_archive_user_created", "user_id", "created_at"),
+    )
+
+    archived = True
+
+    @classmethod
+    def from_history(cls, history):
+        snapshot = history.get_task_data()
+        return cls(
+            task_id=history.task_id,
+            user_id=history.user_id,
+            action=history.action,
+            created_at=history.created_at,
+            payload=_compress({'details': history.details, 'task_data': json.dumps(snapshot) if snapshot else None})
+        )
+
+    def get_data(self):
+        """Decompressed payload (cached per instance)"""
+        if '_data' not in self.__dict__:
+            self.__dict__['_data'] = _decompress(self.payload)
+        return self.__dict__['_data']
+
+    @property
+    def details(self):
+        return self.get_data()['details']
+
+    @property
+    def task_data(self):
+        return self.get_data()['task_data']
+
     def get_task_data(self):
         """Retrieve task data from JSON"""
         if self.task_data:
             return json.loads(self.task_data)
         return None
-    
+
     def __repr__(self):
-        return f"<TaskHistory {self.action} by {self.user.username} at {self.created_at}>"
+        return f"<TaskHistoryArchive {self.action} at {self.created_at}>"
 
 
 class Reminder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
     user = db.relationship("User", back_populates="reminders")
 
+    # Task this reminder belongs to (null for free-form reminders)
+    task_id = db.Column(
+        db.Integer,
+        db.ForeignKey("task.id", name="fk_reminder_task_id_task", ondelete="CASCADE"),
+        nullable=True,
+        index=True
+    )
+    task = db.relationship("Task", back_populates="reminders")
+
     message = db.Column(db.String(255))
     remind_at = db.Column(db.DateTime, nullable=False, index=True)
     sent = db.Column(db.Boolean, default=False, index=True)
+    claimed_by = db.Column(db.String(64), nullable=True)  # claim token of the dispatch run that sent it
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Dispatcher and resync: unsent reminders by due time
+        db.Index("ix_reminder_sent_remind_at", "sent", "remind_at"),
+        db.Index("ix_reminder_claimed_by", "claimed_by"),
+    )
+
     def __repr__(self):
-        return f"<Reminder for {self.user.username} at {self.remind_at}>"
+        return f"<Reminder for user {self.user_id} at {self.remind_at}>"
 
 
 class PasswordResetToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
     user = db.relationship("User")
     token = db.Column(db.String(100), unique=True, nullable=False, index=True)
     expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Lets the token cleanup find used tokens past their grace period
+        db.Index("ix_password_reset_token_used_created", "used", "created_at"),
+    )
+
     def is_valid(self):
         """Check if the token is valid (not expired and not used)"""
         return not self.used and datetime.utcnow() < self.expires_at
 
     def __repr__(self):
-        return f"<PasswordResetToken for {self.user.username} expires at {self.expires_at}>"
+        return f"<PasswordResetToken for user {self.user_id} expires at {self.expires_at}>"
 
 
 class EmailVerificationToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
     user = db.relationship("User")
     token = db.Column(db.String(100), unique=True, nullable=False, index=True)
     expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_email_verification_token_used_created", "used", "created_at"),
+    )
+
     def is_valid(self):
         """Check if the token is valid (not expired and not used)"""
         return not self.used and datetime.utcnow() < self.expires_at
 
     def __repr__(self):
-        return f"<EmailVerificationToken for {self.user.username} expires at {self.expires_at}>"
+        return f"<EmailVerificationToken for user {self.user_id} expires at {self.expires_at}>"
 
 
 class LoginOTP(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
     user = db.relationship("User")
-    otp_code = db.Column(db.String(6), nullable=False, index=True)
+    otp_code = db.Column(db.String(64), nullable=False, index=True)  # 6-digit code or URL-safe login token
     expires_at = db.Column(db.DateTime, nullable=False, index=True)
     used = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_login_otp_used_created", "used", "created_at"),
+    )
+
     def is_valid(self):
         """Check if the OTP is valid (not expired and not used)"""
         return not self.used and datetime.utcnow() < self.expires_at
 
     def __repr__(self):
-        return f"<LoginOTP for {self.user.username} expires at {self.expires_at}>"
+        return f"<LoginOTP for user {self.user_id} expires at {self.expires_at}>"
+
+
+class OutboxMessage(db.Model):
+    """Outgoing email waiting to be delivered by the background mail workers."""
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON list of addresses
+    body = db.Column(db.Text, nullable=False)
+
+    # Delivery state: 'pending' -> 'sending' -> 'sent', or 'failed' after the last retry
+    status = db.Column(
+        Enum("pending", "sending", "sent", "failed", name="outbox_status"),
+        default="pending",
+        nullable=False
+    )
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_by = db.Column(db.String(64), nullable=True)  # claim token of the worker batch
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+
+    # Pending messages with the same key are merged into one (see queue_coalesced_email)
+    coalesce_key = db.Column(db.String(100), nullable=True)
+    coalesced_count = db.Column(db.Integer, default=1, nullable=False)
+    coalesce_until = db.Column(db.DateTime, nullable=True)  # end of the window the message belongs to
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_outbox_message_status_next_attempt", "status", "next_attempt_at"),
+        db.Index("ix_outbox_message_claimed_by", "claimed_by"),
+        db.Index("ix_outbox_message_coalesce_key_status", "coalesce_key", "status"),
+        db.Index(
+            "ix_outbox_message_pending_coalesce_key", "coalesce_key", unique=True,
+            sqlite_where=db.text("status = 'pending'"), postgresql_where=db.text("status = 'pending'")
+        ),
+    )
+
+    def set_recipients(self, recipients):
+        """Store recipient list as JSON"""
+        self.recipients = json.dumps(list(recipients))
+
+    def get_recipients(self):
+        """Retrieve recipient list from JSON"""
+        return json.loads(self.recipients) if self.recipients else []
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} [{self.status}] {self.subject}>"
+
+
+class AccountDeletion(db.Model):
+    """A queued account deletion, processed in the background (see app/account_deletion.py)."""
+    __tablename__ = "account_deletion"
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)  # status page link
+
+    # No FK: the job outlives the user row it deletes
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    # Needed for the confirmation email, then cleared when the job is done
+    username = db.Column(db.String(150), nullable=True)
+    email = db.Column(db.String(150), nullable=True)
+    full_name = db.Column(db.String(300), nullable=True)
+
+    status = db.Column(
+        Enum("pending", "running", "done", "failed", name="account_deletion_status"),
+        default="pending",
+        nullable=False
+    )
+    current_step = db.Column(db.String(50), nullable=True)
+    rows_deleted = db.Column(db.Integer, default=0, nullable=False)
+    summary = db.Column(db.JSON, nullable=True)  # rows deleted per step
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(500), nullable=True)
+
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_account_deletion_status_requested", "status", "requested_at"),
+    )
+
+    @property
+    def finished(self):
+        return self.status == 'done'
+
+    def __repr__(self):
+        return f"<AccountDeletion {self.username} [{self.status}]>"
+
+
+class SchedulerLease(db.Model):
+    """Lease deciding which process runs the scheduled jobs (see app/leader.py)."""
+    __tablename__ = "scheduler_lease"
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(150), nullable=False)
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} held by {self.holder} until {self.expires_at}>"
+
+
+class JobState(db.Model):
+    """Small piece of state a scheduled job keeps between runs, shared by all processes."""
+    __tablename__ = "job_state"
+
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.JSON, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<JobState {self.key}>"
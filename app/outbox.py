@@ -0,0 +1,260 @@
+"""
+Durable outbox for outgoing email.
+
+Routes never talk to the SMTP server directly. They call ``queue_email`` which
+adds an ``OutboxMessage`` row to the current database session, so the message
+is committed (or rolled back) together with the rest of the request's work.
+A small pool of background threads drains the outbox, retrying failed
+deliveries with exponential backoff. Sent and failed messages still hold
+login links and reset codes, so ``cleanup_expired_tokens`` deletes them
+``OUTBOX_RETENTION_HOURS`` after their last attempt.
+"""
+
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask_mail import Message
+from sqlalchemy import event, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.mailer import BatchMailer
+from app.models import OutboxMessage
+
+
+def queue_email(subject, recipients, body, send_at=None):
+    """Add an email to the outbox as part of the current transaction.
+
+    The message is only delivered once the caller commits the session, and
+    not before ``send_at`` if given.
+    """
+    message = OutboxMessage(
+        subject=subject,
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=send_at or datetime.utcnow()
+    )
+    message.set_recipients(recipients)
+    db.session.add(message)
+    # Wake the workers once this transaction commits
+    db.session.info['outbox_wakeup'] = True
+    return message
+
+
+def queue_coalesced_email(key, recipients, window, render):
+    """Queue the first email per ``key`` now and summarise the rest.
+
+    The first event is sent right away and opens a window of ``window``
+    seconds; later events in the window are merged into one summary held
+    until the window closes. An event that finds a message for ``key``
+    still pending (the first one, if no worker has claimed it yet) is
+    counted in that message instead. ``render(count, first_at)`` returns
+    ``(subject, body)`` for ``count`` events since ``first_at``. Part of
+    the current transaction, like ``queue_email``.
+    """
+    for attempt in range(3):
+        pending = OutboxMessage.query.filter_by(coalesce_key=key, status='pending').first()
+        if pending is not None:
+            count = pending.coalesced_count + 1
+            subject, body = render(count, pending.created_at)
+            # Conditional, so a message a worker has just claimed or another
+            # request has just updated is left alone
+            updated = OutboxMessage.query.filter_by(
+                id=pending.id, status='pending', coalesced_count=pending.coalesced_count
+            ).update({
+                OutboxMessage.subject: subject,
+                OutboxMessage.body: body,
+                OutboxMessage.coalesced_count: count
+            }, synchronize_session=False)
+            if updated:
+                db.session.expire(pending)
+                return pending
+
+        now = datetime.utcnow()
+        opened = (
+            OutboxMessage.query
+            .filter(OutboxMessage.coalesce_key == key, OutboxMessage.coalesce_until > now)
+            .order_by(OutboxMessage.id.desc())
+            .first()
+        )
+        if opened is None:
+            send_at, window_end = now, now + timedelta(seconds=window)
+        else:
+            send_at = window_end = opened.coalesce_until
+        subject, body = render(1, now)
+        try:
+            # At most one message per key is pending (unique index), so
+            # two requests racing to open it cannot both succeed
+            with db.session.begin_nested():
+                message = queue_email(subject, recipients, body, send_at=send_at)
+                message.coalesce_key = key
+                message.coalesced_count = 1
+                message.coalesce_until = window_end
+            return message
+        except IntegrityError:
+            if attempt == 2:
+                raise
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers_after_commit(session):
+    if session.info.pop('outbox_wakeup', False):
+        outbox_workers.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_wakeup_after_rollback(session):
+    session.info.pop('outbox_wakeup', None)
+
+
+class OutboxWorkerPool:
+    """Pool of background threads that deliver queued emails."""
+
+    def __init__(self):
+        self.app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        app.config.setdefault("OUTBOX_WORKERS", 2)
+        app.config.setdefault("OUTBOX_BATCH_SIZE", 20)
+        app.config.setdefault("OUTBOX_POLL_INTERVAL", 5.0)
+        app.config.setdefault("OUTBOX_MAX_ATTEMPTS", 5)
+        app.config.setdefault("OUTBOX_RETRY_BASE_SECONDS", 30)
+        app.config.setdefault("OUTBOX_RETRY_MAX_SECONDS", 3600)
+        app.config.setdefault("OUTBOX_CLAIM_TIMEOUT", 300)
+        app.config.setdefault("OUTBOX_RETENTION_HOURS", 24)
+        self.app = app
+        app.extensions["outbox"] = self
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self._threads or self.app is None:
+            return
+        self._stopping.clear()
+        for index in range(max(1, int(self.app.config["OUTBOX_WORKERS"]))):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"outbox-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Signal the workers that new messages are waiting."""
+        self._wakeup.set()
+
+    def _run(self):
+        poll_interval = float(self.app.config["OUTBOX_POLL_INTERVAL"])
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    delivered = self.drain_once()
+            except Exception as e:
+                print(f"Outbox worker error: {e}")
+                delivered = 0
+
+            if delivered == 0:
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+
+    def _claim_batch(self):
+        """Atomically mark a batch of due messages as ours and return them."""
+        config = self.app.config
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=int(config["OUTBOX_CLAIM_TIMEOUT"]))
+        due = or_(
+            and_(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now),
+            # Messages claimed by a worker that died mid-batch
+            and_(OutboxMessage.status == 'sending', OutboxMessage.claimed_at < stale_before)
+        )
+
+        candidate_ids = [
+            row[0] for row in db.session.query(OutboxMessage.id)
+            .filter(due)
+            .order_by(OutboxMessage.next_attempt_at.asc())
+            .limit(int(config["OUTBOX_BATCH_SIZE"]))
+            .all()
+        ]
+        if not candidate_ids:
+            db.session.rollback()
+            return []
+
+        claim_token = uuid.uuid4().hex
+        OutboxMessage.query.filter(
+            OutboxMessage.id.in_(candidate_ids),
+            due
+        ).update({
+            OutboxMessage.status: 'sending',
+            OutboxMessage.claimed_by: claim_token,
+            OutboxMessage.claimed_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return OutboxMessage.query.filter_by(claimed_by=claim_token, status='sending').all()
+
+    def _retry_delay(self, attempts):
+        config = self.app.config
+        delay = float(config["OUTBOX_RETRY_BASE_SECONDS"]) * (2 ** max(0, attempts - 1))
+        delay = min(delay, float(config["OUTBOX_RETRY_MAX_SECONDS"]))
+        # Jitter so a burst of failures does not retry in lockstep
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def deliver(self, message, mailer):
+        """Send one claimed message and record the outcome."""
+        try:
+            mailer.send(Message(
+                message.subject,
+                recipients=message.get_recipients(),
+                body=message.body
+            ))
+        except Exception as e:
+            self.record_failure(message, e)
+        else:
+            self.record_success(message)
+        db.session.commit()
+
+    def record_success(self, message):
+        message.status = 'sent'
+        message.sent_at = datetime.utcnow()
+        message.attempts += 1
+        message.claimed_by = None
+        message.last_error = None
+
+    def record_failure(self, message, error):
+        message.attempts += 1
+        message.last_error = str(error)[:500]
+        message.claimed_by = None
+        if message.attempts >= int(self.app.config["OUTBOX_MAX_ATTEMPTS"]):
+            message.status = 'failed'
+            print(f"❌ Giving up on outbox message {message.id} after {message.attempts} attempts: {error}")
+        else:
+            message.status = 'pending'
+            message.next_attempt_at = datetime.utcnow() + self._retry_delay(message.attempts)
+            print(f"⚠️ Outbox message {message.id} failed (attempt {message.attempts}), will retry: {error}")
+
+    def drain_once(self):
+        """Deliver one batch of due messages. Returns the number processed."""
+        batch = self._claim_batch()
+        if batch:
+            # One SMTP session for the whole batch
+            with BatchMailer() as mailer:
+                for message in batch:
+                    self.deliver(message, mailer)
+        return len(batch)
+
+
+outbox_workers = OutboxWorkerPool()
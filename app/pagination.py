@@ -0,0 +1,190 @@
+"""
+Keyset (cursor) pagination.
+
+Offset pagination gets slower the deeper the user scrolls because the database
+still has to walk every skipped row. Keyset pagination instead remembers the
+sort key of the last row on the page and asks for rows that sort after it, so
+every page is a short range scan on the same index as the first one.
+
+The cursor handed to the browser is an opaque, URL-safe token holding those
+sort key values plus the position of the page (used for numbering only).
+
+``paginate_tiers`` does the same over several tables that share one sort order,
+such as the hot and archive tiers, merging them as if they were one table.
+"""
+
+import base64
+import binascii
+import heapq
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import and_, or_, false
+
+
+class Page:
+    """One page of results plus the cursor for the next one."""
+
+    def __init__(self, items, next_cursor=None, offset=0):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.offset = offset
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is time:
+        return time.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(columns, row, offset, tier=0):
+    """Build the token for the page that starts after ``row``."""
+    payload = {
+        "k": [_dump_value(getattr(row, column.key)) for column in columns],
+        "n": offset,
+    }
+    if tier:
+        payload["t"] = tier
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(columns, token):
+    """Return ``(key_values, offset, tier)`` for a token, or ``None`` if it is invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+        offset = int(payload.get("n", 0))
+        tier = int(payload.get("t", 0))
+        if len(values) != len(columns):
+            return None
+        return [_load_value(c, v) for c, v in zip(columns, values)], max(0, offset), tier
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _order(column, descending, dialect):
+    order = column.desc() if descending else column.asc()
+    # MySQL has no NULLS FIRST/LAST, but sorts NULLs this way already
+    if not column.nullable or dialect == "mysql":
+        return order
+    # Spelled out because PostgreSQL puts NULLs last in ascending order
+    return order.nulls_last() if descending else order.nulls_first()
+
+
+def _after(column, value, descending):
+    # NULLs sort first in ascending order and last in descending, see _order
+    if descending:
+        return false() if value is None else or_(column < value, column.is_(None))
+    return column.isnot(None) if value is None else column > value
+
+
+def keyset_filter(columns, values, descending=False, inclusive=False):
+    """Filter selecting rows that sort strictly after ``values``.
+
+    Expands ``(a, b, c) > (x, y, z)`` into
+    ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`` so that
+    nullable sort keys are handled correctly. With ``inclusive`` a row equal
+    to ``values`` matches too.
+    """
+    clauses = []
+    for index, column in enumerate(columns):
+        prefix = [_equal(c, v) for c, v in zip(columns[:index], values[:index])]
+        clauses.append(and_(*prefix, _after(column, values[index], descending)))
+    if inclusive:
+        clauses.append(and_(*[_equal(c, v) for c, v in zip(columns, values)]))
+    keyset = or_(*clauses)
+
+    # The OR form hides the range from the planner, which then walks the index
+    # from the start of the user's rows. A redundant bound on the leading key
+    # lets it seek straight to the cursor instead.
+    leading, value = columns[0], values[0]
+    if value is None:
+        return keyset
+    if not descending:
+        return and_(leading >= value, keyset)
+    if not leading.nullable:
+        return and_(leading <= value, keyset)
+    return keyset
+
+
+def _sort_key(values, tier, descending):
+    # Python equivalent of the SQL order: NULLs first ascending, last descending,
+    # ties between tiers broken by tier position in both directions
+    key = tuple((value is not None, value) for value in values)
+    return key + ((-tier,) if descending else (tier,))
+
+
+def paginate_tiers(sources, cursor=None, per_page=50, descending=False):
+    """Return one ``Page`` merged from several ``(query, columns)`` sources.
+
+    Every source must be ordered by equivalent columns (same types, same
+    order), each ending in its primary key. Rows are merged as if they came
+    from a single table; rows with identical keys are ordered by source.
+    """
+    offset = 0
+    decoded = decode_cursor(sources[0][1], cursor)
+
+    candidates = []
+    for tier, (query, columns) in enumerate(sources):
+        if decoded is not None:
+            values, offset, cursor_tier = decoded
+            # Later tiers still owe the rows that tie with the cursor row
+            query = query.filter(keyset_filter(columns, values, descending, inclusive=tier > cursor_tier))
+
+        dialect = query.session.get_bind().dialect.name
+        order = [_order(c, descending, dialect) for c in columns]
+        # Fetch one extra row to know whether there is a next page
+        rows = query.order_by(*order).limit(per_page + 1).all()
+        candidates.append([
+            (_sort_key([getattr(row, c.key) for c in columns], tier, descending), tier, row)
+            for row in rows
+        ])
+
+    merged = list(heapq.merge(*candidates, key=lambda item: item[0], reverse=descending))
+    page = merged[:per_page]
+
+    next_cursor = None
+    if len(merged) > per_page:
+        _, tier, row = page[-1]
+        next_cursor = encode_cursor(sources[tier][1], row, offset + per_page, tier)
+    return Page([row for _, _, row in page], next_cursor=next_cursor, offset=offset)
+
+
+def paginate(query, columns, cursor=None, per_page=50, descending=False):
+    """Return a ``Page`` of ``query`` ordered by ``columns``.
+
+    ``columns`` must end in a unique column (normally the primary key) so the
+    order is total, and should match an index so each page is a range scan.
+    """
+    return paginate_tiers([(query, columns)], cursor=cursor, per_page=per_page, descending=descending)
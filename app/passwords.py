@@ -0,0 +1,136 @@
+"""
+Concurrency limit for password hashing.
+
+A scrypt hash with Werkzeug's defaults costs over 100 ms of CPU and 32 MiB
+of memory. When every request thread hashed inline, a burst of logins could
+run as many hashes at once as there were threads, starving every other
+request of CPU and memory.
+
+Hashes now run on at most ``PASSWORD_HASH_WORKERS`` threads, with up to
+``PASSWORD_HASH_MAX_PENDING`` more waiting. Beyond that a login or
+registration fails fast with ``PasswordHashingBusy`` instead of queueing.
+This is a limit on concurrent hashes, not a way to free the request thread:
+the request still blocks until its own hash is done, for at most
+``PASSWORD_HASH_TIMEOUT`` seconds, after which it also gets
+``PasswordHashingBusy``.
+
+``PASSWORD_HASH_METHOD`` takes any Werkzeug method string (``scrypt``,
+``scrypt:16384:8:1``, ``pbkdf2:sha256:600000``, ...). Existing hashes keep
+working; ``needs_rehash`` tells the login route to re-hash the password with
+the current method once it has been verified.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated."""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords, at most ``workers`` at a time."""
+
+    def __init__(self):
+        self.method = "scrypt"
+        self.workers = 2
+        self.max_pending = 32
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._prefixes = {}  # method -> "scrypt:32768:8:1"-style hash prefix
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_METHOD", "scrypt")
+        app.config.setdefault("PASSWORD_HASH_WORKERS", 2)
+        app.config.setdefault("PASSWORD_HASH_MAX_PENDING", 32)
+        app.config.setdefault("PASSWORD_HASH_TIMEOUT", 10.0)
+        self.configure(
+            method=app.config["PASSWORD_HASH_METHOD"],
+            workers=int(app.config["PASSWORD_HASH_WORKERS"]),
+            max_pending=int(app.config["PASSWORD_HASH_MAX_PENDING"]),
+            timeout=float(app.config["PASSWORD_HASH_TIMEOUT"]),
+        )
+        app.extensions["passwords"] = self
+
+    def configure(self, method, workers, max_pending, timeout):
+        self.shutdown()
+        self.method = method
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _run_limited(self, func, *args):
+        """Run ``func`` on the pool and wait for its result.
+
+        Raises ``PasswordHashingBusy`` straight away if every slot is taken,
+        or once ``timeout`` seconds pass without a result.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingBusy("Too many password checks in progress")
+        with self._lock:
+            if self._executor is None:
+                # Started on first use so CLI commands never spawn it
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+            executor, slots = self._executor, self._slots
+        future = executor.submit(func, *args)
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingBusy("Password check timed out") from None
+
+    def hash(self, password):
+        """Return a hash of ``password`` using the configured method."""
+        result = self._run_limited(generate_password_hash, password, self.method)
+        with self._lock:
+            self.hashed += 1
+        return result
+
+    def verify(self, password_hash, password):
+        result = self._run_limited(check_password_hash, password_hash, password)
+        with self._lock:
+            self.verified += 1
+        return result
+
+    def _prefix(self, method):
+        # Werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"),
+        # so the canonical prefix is taken from a real hash
+        if method not in self._prefixes:
+            self._prefixes[method] = generate_password_hash("", method).split("$", 1)[0]
+        return self._prefixes[method]
+
+    def needs_rehash(self, password_hash):
+        """Return True if ``password_hash`` was made with other parameters."""
+        return password_hash.split("$", 1)[0] != self._prefix(self.method)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "hashed": self.hashed,
+                "verified": self.verified,
+                "rejected": self.rejected,
+            }
+
+
+passwords = PasswordHasher()
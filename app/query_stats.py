@@ -0,0 +1,185 @@
+"""
+Per-request and per-job SQL instrumentation.
+
+Every statement run on the primary or the read-only engine is timed with
+``before_cursor_execute``/``after_cursor_execute``. While a request or a
+scheduler job is running, its statements are counted against it:
+
+* query count and total database time, kept per endpoint and per job in
+  ``query_stats.stats()``;
+* statements run ``SQL_N_PLUS_ONE_THRESHOLD`` or more times with the same
+  SQL are reported as N+1 suspects: a loop issuing one query per row where
+  a join or an ``IN`` would do;
+* with ``SQL_STATS_HEADER`` on, responses carry the request's figures in a
+  ``Server-Timing`` header, which browser dev tools show next to the request.
+
+Statements slower than ``SQL_SLOW_QUERY_MS`` are appended to the JSON-lines
+file ``SQL_SLOW_QUERY_LOG`` with the shape of their parameters (types only,
+never values, so no passwords or tokens end up in the log).
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import event
+
+
+_local = threading.local()
+
+
+class QueryUnit:
+    """Statements run by one request or job run."""
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent  # unit interrupted by this one, e.g. a job run from a request
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        """Return ``(statement, count)`` for statements run ``threshold`` times or more."""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+
+def parameter_shape(parameters):
+    """Describe bound parameters by type, e.g. ``{"id_1": "int"}``."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one row's shape is enough
+            return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryStats:
+    """Times SQL statements and attributes them to requests and jobs."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.threshold = 5
+        self.slow_seconds = 0.2
+        self.slow_log = None
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._totals = {}  # request endpoint or job name -> aggregated figures
+        self._engines = []
+
+    def init_app(self, app, engines):
+        """Instrument ``engines``; must run after the engines are created."""
+        app.config.setdefault("SQL_STATS_ENABLED", True)
+        app.config.setdefault("SQL_STATS_HEADER", False)
+        app.config.setdefault("SQL_SLOW_QUERY_MS", 200)
+        app.config.setdefault("SQL_SLOW_QUERY_LOG", None)
+        app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", 5)
+        self.app = app
+        self.enabled = bool(app.config["SQL_STATS_ENABLED"])
+        self.threshold = int(app.config["SQL_N_PLUS_ONE_THRESHOLD"])
+        self.slow_seconds = float(app.config["SQL_SLOW_QUERY_MS"]) / 1000
+        self.slow_log = app.config["SQL_SLOW_QUERY_LOG"] or None
+        with self._lock:
+            self._totals.clear()
+
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        self._engines = []
+        if self.enabled:
+            for engine in dict.fromkeys(engines):
+                event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+                self._engines.append(engine)
+            app.before_request(self._start_request)
+            app.after_request(self._finish_request)
+            app.teardown_request(self._teardown_request)
+        app.extensions["query_stats"] = self
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start_time")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        unit = getattr(_local, "unit", None)
+        if unit is not None:
+            unit.queries += 1
+            unit.seconds += seconds
+            unit.statements[statement] += 1
+        if seconds >= self.slow_seconds and self.slow_log:
+            self._log_slow(statement, parameters, seconds, unit)
+
+    def _log_slow(self, statement, parameters, seconds, unit):
+        entry = {
+            "at": datetime.utcnow().isoformat(timespec="milliseconds"),
+            "context": unit.name if unit is not None else None,
+            "duration_ms": round(seconds * 1000, 3),
+            "statement": " ".join(statement.split()),
+            "parameters": parameter_shape(parameters),
+        }
+        try:
+            with self._log_lock, open(self.slow_log, "a", encoding="utf-8") as log:
+                log.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+    def begin(self, name):
+        """Start counting the current thread's statements under ``name``."""
+        unit = _local.unit = QueryUnit(name, getattr(_local, "unit", None))
+        return unit
+
+    def end(self):
+        """Stop counting, fold the figures into the totals and return the unit."""
+        unit = getattr(_local, "unit", None)
+        if unit is None:
+            return None
+        _local.unit = unit.parent
+        repeated = unit.repeated(self.threshold)
+        with self._lock:
+            totals = self._totals.setdefault(unit.name, {
+                "runs": 0, "queries": 0, "seconds": 0.0, "max_queries": 0, "n_plus_one": 0,
+            })
+            totals["runs"] += 1
+            totals["queries"] += unit.queries
+            totals["seconds"] += unit.seconds
+            totals["max_queries"] = max(totals["max_queries"], unit.queries)
+            totals["n_plus_one"] += bool(repeated)
+        for statement, count in repeated:
+            print(f"🔁 Possible N+1 in {unit.name}: {count}x {' '.join(statement.split())[:200]}")
+        return unit
+
+    def _start_request(self):
+        self.begin(request.endpoint or "unknown")
+
+    def _finish_request(self, response):
+        unit = self.end()
+        if unit is not None and self.app.config["SQL_STATS_HEADER"]:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={unit.seconds * 1000:.1f};desc="{unit.queries} queries, '
+                f'{len(unit.repeated(self.threshold))} repeated"'
+            )
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request is skipped when a view raises
+        unit = getattr(_local, "unit", None)
+        if unit is not None and unit.parent is None:
+            self.end()
+
+    def stats(self):
+        """Return query figures per endpoint and per job since startup."""
+        with self._lock:
+            return {name: dict(totals) for name, totals in self._totals.items()}
+
+
+query_stats = QueryStats()
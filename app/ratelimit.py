@@ -0,0 +1,211 @@
+"""
+Sliding-window rate limiting for routes that send email.
+
+A wrong password, a password reset request, a verification resend or an OTP
+resend each queue an email. Without a limit a scripted client can turn the
+web tier into an SMTP flood. ``rate_limiter.check(action, account)`` counts
+the request against two sliding windows, one for the account (username or
+email) and one for the client IP, and returns how many seconds the caller
+must wait, or 0 if the request may go ahead.
+
+Limits are ``"count/seconds"`` strings, one pair (account, IP) per rule:
+``RATE_LIMIT_LOGIN_*`` for login attempts and ``RATE_LIMIT_EMAIL_*`` for the
+routes that send mail on request.
+
+Hits are kept in memory by default, which limits each worker process on its
+own. With ``RATE_LIMIT_STORAGE`` set to a file path they are kept in a small
+SQLite database of their own instead, shared by every worker on the host and
+separate from the application database so it never competes for its write
+lock. The limiter fails open: if the store errors, the request is allowed.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from flask import current_app, request
+
+
+class MemoryStore:
+    """Per-process hit log."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._hits = {}  # key -> (window, deque of timestamps)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key, limit, window, now):
+        """Record a hit unless ``key`` already has ``limit`` hits in ``window``.
+
+        Returns ``(allowed, count, retry_after)``; ``limit=None`` never blocks.
+        """
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+            _, hits = self._hits.setdefault(key, (window, deque()))
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if limit is not None and len(hits) >= limit:
+                return False, len(hits), hits[0] + window - now
+            hits.append(now)
+            return True, len(hits), 0.0
+
+    def _sweep(self, now):
+        for key, (window, hits) in list(self._hits.items()):
+            if not hits or hits[-1] <= now - window:
+                del self._hits[key]
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+
+
+class SQLiteStore:
+    """Hit log in a SQLite file shared by every worker on the host.
+
+    Every ``SWEEP_INTERVAL`` seconds a hit also deletes all hits older than
+    ``max_window``, the longest window of the configured limits.
+    """
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, path, max_window=0.0):
+        self.path = path
+        self.max_window = max_window
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS rate_limit_hit (key TEXT NOT NULL, ts REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS ix_rate_limit_hit_key_ts ON rate_limit_hit (key, ts);
+        """)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit; transactions are opened explicitly below
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, limit, window, now):
+        connection = self._connection()
+        with self._lock:
+            sweep = now - self._last_sweep >= self.SWEEP_INTERVAL
+            if sweep:
+                self._last_sweep = now
+        # IMMEDIATE takes the write lock up front so the count and the insert
+        # are atomic across processes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if sweep:
+                cutoff = now - max(self.max_window, window)
+                connection.execute("DELETE FROM rate_limit_hit WHERE ts <= ?", (cutoff,))
+            connection.execute("DELETE FROM rate_limit_hit WHERE key = ? AND ts <= ?", (key, now - window))
+            count, oldest = connection.execute(
+                "SELECT COUNT(*), MIN(ts) FROM rate_limit_hit WHERE key = ?", (key,)
+            ).fetchone()
+            if limit is not None and count >= limit:
+                connection.execute("COMMIT")
+                return False, count, oldest + window - now
+            connection.execute("INSERT INTO rate_limit_hit (key, ts) VALUES (?, ?)", (key, now))
+            connection.execute("COMMIT")
+            return True, count + 1, 0.0
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM rate_limit_hit")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def parse_limit(value):
+    """Parse ``"count/seconds"`` into ``(count, seconds)``."""
+    count, seconds = str(value).split("/", 1)
+    return int(count), float(seconds)
+
+
+class RateLimiter:
+    """Per-account and per-IP sliding-window limits."""
+
+    # action -> rule whose RATE_LIMIT_<RULE>_ACCOUNT / _IP limits apply
+    ACTIONS = {
+        "login": "LOGIN",
+        "forgot_password": "EMAIL",
+        "resend_verification": "EMAIL",
+        "resend_otp": "EMAIL",
+    }
+
+    def __init__(self):
+        self.app = None
+        self.store = MemoryStore()
+        self.enabled = True
+        self.limited = 0  # requests turned away since startup
+
+    def init_app(self, app):
+        app.config.setdefault("RATE_LIMIT_ENABLED", True)
+        app.config.setdefault("RATE_LIMIT_STORAGE", "memory")
+        app.config.setdefault("RATE_LIMIT_LOGIN_ACCOUNT", "10/900")
+        app.config.setdefault("RATE_LIMIT_LOGIN_IP", "30/900")
+        app.config.setdefault("RATE_LIMIT_EMAIL_ACCOUNT", "3/900")
+        app.config.setdefault("RATE_LIMIT_EMAIL_IP", "10/900")
+        self.app = app
+        self.enabled = bool(app.config["RATE_LIMIT_ENABLED"])
+        storage = app.config["RATE_LIMIT_STORAGE"]
+        if storage in ("", "memory"):
+            self.store = MemoryStore()
+        else:
+            max_window = max(
+                parse_limit(app.config[f"RATE_LIMIT_{rule}_{scope}"])[1]
+                for rule in set(self.ACTIONS.values()) for scope in ("ACCOUNT", "IP")
+            )
+            self.store = SQLiteStore(storage, max_window)
+        self.limited = 0
+        app.extensions["rate_limiter"] = self
+
+    def check(self, action, account=None):
+        """Count a request to ``action``; return seconds to wait, or 0 if allowed."""
+        if not self.enabled:
+            return 0.0
+        rule = self.ACTIONS[action]
+        checks = [("ip", request.remote_addr or "unknown", self.app.config[f"RATE_LIMIT_{rule}_IP"])]
+        if account:
+            checks.append(("account", str(account).strip().lower(), self.app.config[f"RATE_LIMIT_{rule}_ACCOUNT"]))
+
+        now = time.time()
+        for scope, value, limit in checks:
+            count, window = parse_limit(limit)
+            try:
+                allowed, _, retry_after = self.store.hit(f"{action}:{scope}:{value}", count, window, now)
+            except Exception as e:
+                current_app.logger.warning(f"Rate limiter error, allowing request: {e}")
+                continue
+            if not allowed:
+                self.limited += 1
+                return max(retry_after, 1.0)
+        return 0.0
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "storage": type(self.store).__name__,
+            "limited": self.limited,
+        }
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,178 @@
+"""
+In-memory reminder scheduler.
+
+Instead of polling the reminder table every minute, upcoming reminders are
+kept in a min-heap ordered by ``remind_at`` and a single thread sleeps until
+the earliest deadline. Only reminders due within ``REMINDER_HORIZON_MINUTES``
+are held in memory.
+
+The heap is loaded from the indexed ``remind_at`` column only in the
+scheduler leader: when the process becomes leader and by the periodic drift
+check every ``REMINDER_RESYNC_MINUTES``. A process that loses the lease drops
+its heap, so the workers do not all race for the same due reminders.
+New reminders are pushed incrementally, in whichever process creates them,
+once the transaction creating them commits; the horizon for these is counted
+from the current time, so they are sent on time even by a process that never
+loads from the database. Reminders further out are left to a later resync.
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.jobs import add_items
+from app.query_stats import query_stats
+
+
+def schedule_after_commit(reminder):
+    """Hand a newly created reminder to the engine once it is committed.
+
+    The reminder must already be flushed so that it has an id.
+    """
+    pending = db.session.info.setdefault('reminders_to_schedule', [])
+    pending.append((reminder.remind_at, reminder.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _schedule_committed_reminders(session):
+    for remind_at, reminder_id in session.info.pop('reminders_to_schedule', []):
+        reminder_engine.schedule(reminder_id, remind_at)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_uncommitted_reminders(session):
+    session.info.pop('reminders_to_schedule', None)
+
+
+class ReminderEngine:
+    """Dispatches reminders at their due time from an in-memory heap."""
+
+    def __init__(self):
+        self.app = None
+        self._heap = []
+        self._queued = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def init_app(self, app):
+        app.config.setdefault("REMINDER_HORIZON_MINUTES", 60)
+        app.config.setdefault("REMINDER_RESYNC_MINUTES", 10)
+        self.app = app
+        app.extensions["reminder_engine"] = self
+
+    def start(self):
+        """Start the dispatcher thread (idempotent).
+
+        The heap is filled from the database once this process becomes the
+        scheduler leader; see ``set_leader``.
+        """
+        if self._thread is not None or self.app is None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reminder-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def set_leader(self, leader):
+        """Load the heap when this process becomes leader, drop it when it stops."""
+        if leader:
+            self.resync()
+            return
+        with self._condition:
+            self._heap = []
+            self._queued = set()
+
+    def _horizon_end(self):
+        return datetime.utcnow() + timedelta(minutes=int(self.app.config["REMINDER_HORIZON_MINUTES"]))
+
+    def schedule(self, reminder_id, remind_at):
+        """Add one reminder to the heap if it falls inside the horizon."""
+        with self._condition:
+            if remind_at > self._horizon_end():
+                return  # picked up by a later resync
+            if reminder_id in self._queued:
+                return
+            heapq.heappush(self._heap, (remind_at, reminder_id))
+            self._queued.add(reminder_id)
+            self._condition.notify()
+
+    def resync(self):
+        """Rebuild the heap from the database (startup and drift check)."""
+        from app.models import Reminder
+
+        horizon_end = self._horizon_end()
+        try:
+            with self.app.app_context():
+                rows = db.session.query(Reminder.remind_at, Reminder.id).filter(
+                    Reminder.sent.is_(False),
+                    Reminder.remind_at <= horizon_end
+                ).all()
+                db.session.rollback()
+        except Exception as e:
+            print(f"Error resyncing reminders: {e}")
+            return
+        add_items(len(rows))
+
+        with self._condition:
+            # Keep entries pushed while the query was running
+            entries = {reminder_id: remind_at for remind_at, reminder_id in self._heap}
+            entries.update((reminder_id, remind_at) for remind_at, reminder_id in rows)
+            heap = [(remind_at, reminder_id) for reminder_id, remind_at in entries.items()]
+            heapq.heapify(heap)
+            self._heap = heap
+            self._queued = set(entries)
+            self._condition.notify()
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _next_due_batch(self):
+        """Block until at least one reminder is due, then pop every due one."""
+        with self._condition:
+            while not self._stopping:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                wait_seconds = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                if wait_seconds > 0:
+                    self._condition.wait(wait_seconds)
+                    continue
+
+                now = datetime.utcnow()
+                due_ids = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, reminder_id = heapq.heappop(self._heap)
+                    self._queued.discard(reminder_id)
+                    due_ids.append(reminder_id)
+                return due_ids
+            return []
+
+    def _run(self):
+        from app import check_reminders
+
+        while True:
+            due_ids = self._next_due_batch()
+            if self._stopping:
+                return
+            if due_ids:
+                query_stats.begin("job:reminders")
+                try:
+                    check_reminders(self.app, reminder_ids=due_ids)
+                finally:
+                    query_stats.end()
+
+
+reminder_engine = ReminderEngine()
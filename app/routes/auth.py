@@ -1,57 +1,48 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, session, make_response
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db, mail
-from app.models import User, PasswordResetToken, EmailVerificationToken, LoginOTP
+from app import db
+from sqlalchemy import or_
+from app.models import User, PasswordResetToken, EmailVerificationToken, LoginOTP, AccountDeletion
 from app.forms import ForgotPasswordForm, ResetPasswordForm, OTPVerificationForm
+from app.outbox import queue_email, queue_coalesced_email
+from app.account_deletion import request_account_deletion, deletion_pending
+from app.user_cache import user_cache
+from app.passwords import passwords, PasswordHashingBusy
+from app.ratelimit import rate_limiter
 from datetime import datetime, timedelta
+import math
 import secrets
 import os
 import random
 
 auth_bp = Blueprint("auth", __name__)
 
-def send_authentication_notification(user, notification_type="registration"):
-    """Send authentication notification to user's email"""
-    try:
-        from flask_mail import Message
-        
-        if notification_type == "registration":
-            subject = "🔐 New Account Registration - Authentication Required"
-            body = f'''
-🔐 AUTHENTICATION NOTIFICATION 🔐
 
-Hello {user.first_name} {user.last_name},
-
-A new account has been registered with your email address on our Task Management System.
-
-📋 ACCOUNT DETAILS:
-• Username: {user.username}
-• Email: {user.email}
-• Phone: {user.phone_no}
-• Registration Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+@auth_bp.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """Shed load when the password hashing pool is saturated"""
+    db.session.rollback()
+    flash('The server is busy right now. Please try again in a moment.', 'warning')
+    return redirect(request.url)
 
-🔒 SECURITY STEPS REQUIRED:
-1. Verify your email address by clicking the verification link
-2. Complete the authentication process
-3. Set up your account security preferences
 
-⚠️  IMPORTANT SECURITY NOTES:
-• If you did not create this account, please contact our support immediately
-• Never share your login credentials with anyone
-• Always log out from shared devices
-• Enable two-factor authentication when available
+def rate_limited(retry_after, template, **context):
+    """Re-render ``template`` with a 429 when a rate limit has been hit"""
+    minutes = max(1, math.ceil(retry_after / 60))
+    flash(f'Too many attempts. Please try again in {minutes} minute{"s" if minutes != 1 else ""}.', 'danger')
+    response = make_response(render_template(template, **context), 429)
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
 
-For security reasons, please verify your email address within the next 24 hours to activate your account.
 
-If you have any questions or concerns, please contact our support team.
+def queue_failed_login_alert(user):
+    """Queue the security alert for a failed login; later ones in the window are summarised"""
+    window = int(current_app.config["SECURITY_ALERT_WINDOW_SECONDS"])
+    ip_address = request.remote_addr or 'Unknown'
 
-Best regards,
-Your Task Management Team
-Security Department
-            '''
-        elif notification_type == "suspicious_activity":
-            subject = "⚠️ Suspicious Activity Detected - Security Alert"
-            body = f'''
+    def render(attempts, first_at):
+        subject = "⚠️ Suspicious Activity Detected - Security Alert"
+        body = f'''
 ⚠️ SECURITY ALERT ⚠️
 
 Hello {user.first_name},
@@ -61,7 +52,10 @@ We have detected suspicious activity on your account.
 📋 ACCOUNT DETAILS:
 • Username: {user.username}
 • Email: {user.email}
-• Activity Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+• Failed Login Attempts: {attempts}
+• First Attempt: {first_at.strftime('%Y-%m-%d %H:%M:%S')} UTC
+• Last Attempt: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+• Last IP Address: {ip_address}
 
 🔒 IMMEDIATE ACTION REQUIRED:
 1. Change your password immediately
@@ -74,107 +68,62 @@ Best regards,
 Your Task Management Team
 Security Department
             '''
-        
-        msg = Message(subject, recipients=[user.email], body=body)
-        mail.send(msg)
-        return True
+        return subject, body
+
+    try:
+        queue_coalesced_email(f"failed-login:{user.id}", [user.email], window, render)
+        db.session.commit()
     except Exception as e:
-        print(f"Authentication notification sending error: {e}")
-        return False
+        db.session.rollback()
+        print(f"Security alert queueing error: {e}")
 
 
-def delete_user_data(user_id):
-    """Delete all data related to a user"""
+def send_authentication_notification(user, notification_type="registration"):
+    """Send authentication notification to user's email"""
     try:
-        from app.models import Task, TaskHistory, Reminder, PasswordResetToken, EmailVerificationToken, LoginOTP
-        
-        # Get user
-        user = User.query.get(user_id)
-        if not user:
-            return False, "User not found"
-        
-        # Store user info for notification
-        user_email = user.email
-        user_name = f"{user.first_name} {user.last_name}"
-        
-        # Delete all user-related data
-        deleted_items = []
-        
-        # Delete tasks and task history
-        tasks = Task.query.filter_by(user_id=user_id).all()
-        task_count = len(tasks)
-        for task in tasks:
-            # Delete task history first (due to foreign key constraint)
-            TaskHistory.query.filter_by(task_id=task.id).delete()
-            db.session.delete(task)
-        deleted_items.append(f"{task_count} tasks and their history")
-        
-        # Delete reminders
-        reminders = Reminder.query.filter_by(user_id=user_id).all()
-        reminder_count = len(reminders)
-        for reminder in reminders:
-            db.session.delete(reminder)
-        deleted_items.append(f"{reminder_count} reminders")
-        
-        # Delete authentication tokens
-        password_tokens = PasswordResetToken.query.filter_by(user_id=user_id).all()
-        email_tokens = EmailVerificationToken.query.filter_by(user_id=user_id).all()
-        otp_tokens = LoginOTP.query.filter_by(user_id=user_id).all()
-        
-        for token in password_tokens + email_tokens + otp_tokens:
-            db.session.delete(token)
-        
-        token_count = len(password_tokens) + len(email_tokens) + len(otp_tokens)
-        deleted_items.append(f"{token_count} authentication tokens")
-        
-        # Delete user
-        db.session.delete(user)
-        
-        # Commit all deletions
-        db.session.commit()
-        
-        # Send account deletion notification
-        try:
-            from flask_mail import Message
-            deletion_msg = Message(
-                '✅ Account Successfully Deleted - Confirmation',
-                recipients=[user_email],
-                body=f'''
-✅ ACCOUNT DELETION CONFIRMED ✅
+        if notification_type == "registration":
+            subject = "🔐 New Account Registration - Authentication Required"
+            body = f'''
+🔐 AUTHENTICATION NOTIFICATION 🔐
 
-Hello {user_name},
+Hello {user.first_name} {user.last_name},
 
-Your account has been successfully deleted from our Task Management System.
+A new account has been registered with your email address on our Task Management System.
 
-📋 DELETION SUMMARY:
+📋 ACCOUNT DETAILS:
 • Username: {user.username}
-• Email: {user_email}
-• Deletion Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
+• Email: {user.email}
+• Phone: {user.phone_no}
+• Registration Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC
 
-🗑️ DATA DELETED:
-{chr(10).join(f"• {item}" for item in deleted_items)}
+🔒 SECURITY STEPS REQUIRED:
+1. Verify your email address by clicking the verification link
+2. Complete the authentication process
+3. Set up your account security preferences
 
-✅ CONFIRMATION:
-All your personal data, tasks, reminders, and account information have been permanently removed from our systems.
+⚠️  IMPORTANT SECURITY NOTES:
+• If you did not create this account, please contact our support immediately
+• Never share your login credentials with anyone
+• Always log out from shared devices
+• Enable two-factor authentication when available
 
-If you did not request this account deletion, please contact our support team immediately as this may indicate unauthorized access to your account.
+For security reasons, please verify your email address within the next 24 hours to activate your account.
 
-Thank you for using our Task Management System.
+If you have any questions or concerns, please contact our support team.
 
 Best regards,
 Your Task Management Team
-Data Protection Department
-                '''
-            )
-            mail.send(deletion_msg)
-        except Exception as e:
-            print(f"Account deletion notification error: {e}")
-        
-        return True, f"Successfully deleted user and {', '.join(deleted_items)}"
+Security Department
+            '''
         
+        queue_email(subject, [user.email], body)
+        db.session.commit()
+        return True
     except Exception as e:
         db.session.rollback()
-        return False, f"Error deleting user data: {str(e)}"
+        print(f"Authentication notification sending error: {e}")
+        return False
+
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -183,8 +132,24 @@ def login():
     if request.method == "POST":
         username = request.form.get('username')
         password = request.form.get('password')
+        # Checked before the password so throttled attempts cost no hashing
+        retry_after = rate_limiter.check("login", username)
+        if retry_after:
+            return rate_limited(retry_after, 'login.html')
         user = User.query.filter_by(username=username).first()
         if user and user.check_password(password):
+            if deletion_pending(user.id):
+                flash('This account is being deleted and can no longer be used.', 'danger')
+                return redirect(url_for('auth.login'))
+            
+            # Move the stored hash to the current PASSWORD_HASH_METHOD;
+            # committed together with the login link below
+            if passwords.needs_rehash(user.password_hash):
+                try:
+                    user.set_password(password)
+                except PasswordHashingBusy:
+                    pass  # tried again on the next login
+            
             # Generate email authentication token
             auth_token = secrets.token_urlsafe(32)
             expires_at = datetime.utcnow() + timedelta(minutes=15)  # 15 minutes expiry
@@ -199,21 +164,19 @@ def login():
                 expires_at=expires_at
             )
             db.session.add(login_auth)
-            db.session.commit()
             
-            # Send email authentication notification
+            # Queue email authentication notification with the new token
             try:
-                from flask_mail import Message
                 auth_url = url_for('auth.authenticate_email', token=auth_token, _external=True)
                 
                 email_subject = '🔐 Login Authentication Required - Task Management System'
                 if not user.email_verified:
                     email_subject = '🔐 Email Verification & Login Authentication - Task Management System'
                 
-                msg = Message(
+                queue_email(
                     email_subject,
-                    recipients=[user.email],
-                    body=f'''
+                    [user.email],
+                    f'''
 🔐 LOGIN AUTHENTICATION REQUIRED 🔐
 
 Hello {user.first_name},
@@ -244,21 +207,22 @@ Your Task Management Team
 Security Department
                     '''
                 )
-                mail.send(msg)
+                db.session.commit()
                 
                 # Store user ID in session for authentication
                 session['auth_user_id'] = user.id
                 flash('Authentication email sent! Please check your inbox and click the link to complete login.', 'success')
                 return redirect(url_for('auth.auth_pending'))
             except Exception as e:
+                db.session.rollback()
                 flash(f'Failed to send authentication email. Please try again later.', 'danger')
                 print(f"Authentication email sending error: {e}")
         else:
             # Check if user exists but wrong password (potential security issue)
             user = User.query.filter_by(username=username).first()
             if user:
-                # Send security alert for failed login attempt
-                send_authentication_notification(user, "suspicious_activity")
+                # Security alert for failed login attempts, one summary per window
+                queue_failed_login_alert(user)
                 flash('Invalid username or password', 'danger')
             else:
                 flash('Invalid username or password', 'danger')
@@ -276,19 +240,23 @@ def register():
         email = request.form.get('email')
         phone_no = request.form.get('phone_no')
 
-        # Check if user already exists
-        user_by_username = User.query.filter_by(username=username).first()
-        if user_by_username:
+        # Check if user already exists, all three unique columns in one query
+        taken = db.session.execute(
+            db.select(User.username, User.email, User.phone_no).where(or_(
+                User.username == username,
+                User.email == email,
+                User.phone_no == phone_no
+            ))
+        ).all()
+        if any(row.username == username for row in taken):
             flash('Username already exists', 'danger')
             return redirect(url_for('auth.register'))
 
-        user_by_email = User.query.filter_by(email=email).first()
-        if user_by_email:
+        if any(row.email == email for row in taken):
             flash('Email already registered', 'danger')
             return redirect(url_for('auth.register'))
 
-        user_by_phone = User.query.filter_by(phone_no=phone_no).first()
-        if user_by_phone:
+        if any(row.phone_no == phone_no for row in taken):
             flash('Phone number already registered', 'danger')
             return redirect(url_for('auth.register'))
 
@@ -329,16 +297,14 @@ def register():
                 expires_at=auth_expires_at
             )
             db.session.add(login_auth)
-            db.session.commit()
             
-            # Send authentication email
+            # Queue authentication email with the token
             auth_url = url_for('auth.authenticate_email', token=auth_token, _external=True)
-            from flask_mail import Message
             
-            auth_msg = Message(
+            queue_email(
                 '🔐 Account Created - Authentication Required',
-                recipients=[new_user.email],
-                body=f'''
+                [new_user.email],
+                f'''
 🔐 ACCOUNT CREATED - AUTHENTICATION REQUIRED 🔐
 
 Hello {new_user.first_name} {new_user.last_name},
@@ -373,7 +339,7 @@ Your Task Management Team
 Account Activation Department
                 '''
             )
-            mail.send(auth_msg)
+            db.session.commit()
             
             # Store user ID in session for authentication pending
             session['auth_user_id'] = new_user.id
@@ -381,6 +347,7 @@ Account Activation Department
             flash('Account created successfully! Please check your email and click the authentication link to activate your account and log in.', 'success')
             return redirect(url_for('auth.auth_pending'))
         except Exception as e:
+            db.session.rollback()
             flash(f'Account created, but email sending failed. Please contact support for account activation.', 'warning')
             print(f"Email sending error: {e}")
         
@@ -405,6 +372,10 @@ def forgot_password():
     form = ForgotPasswordForm()
     if form.validate_on_submit():
         email = form.email.data
+        # Counted whether or not the account exists, so it reveals nothing
+        retry_after = rate_limiter.check("forgot_password", email)
+        if retry_after:
+            return rate_limited(retry_after, 'forgot_password.html', form=form)
         user = User.query.filter_by(email=email).first()
         
         if user:
@@ -420,16 +391,14 @@ def forgot_password():
                 expires_at=expires_at
             )
             db.session.add(reset_token)
-            db.session.commit()
             
-            # Send reset email
+            # Queue reset email with the token
             try:
                 reset_url = url_for('auth.reset_password', token=token, _external=True)
-                from flask_mail import Message
-                msg = Message(
+                queue_email(
                     'Password Reset Request',
-                    recipients=[user.email],
-                    body=f'''
+                    [user.email],
+                    f'''
 Hello {user.first_name},
 
 You requested a password reset for your account.
@@ -445,11 +414,11 @@ Best regards,
 Your Task Management Team
                     '''
                 )
-                mail.send(msg)
+                db.session.commit()
                 flash('Password reset link has been sent to your email.', 'success')
             except Exception as e:
-                # If email fails, show the reset link directly (for development)
-                flash(f'Email sending failed. Please use this link to reset your password: {reset_url}', 'warning')
+                db.session.rollback()
+                flash('Failed to send password reset email. Please try again later.', 'danger')
                 print(f"Email sending error: {e}")
         else:
             # Don't reveal if email exists or not for security
@@ -482,6 +451,7 @@ def reset_password(token):
         reset_token.used = True
         
         db.session.commit()
+        user_cache.invalidate(user.id)
         
         flash('Your password has been reset successfully. You can now log in.', 'success')
         return redirect(url_for('auth.login'))
@@ -508,15 +478,11 @@ def verify_email(token):
     # Mark token as used
     verification_token.used = True
     
-    db.session.commit()
-    
-    # Send email verification success notification
-    try:
-        from flask_mail import Message
-        success_msg = Message(
-            '✅ Email Verification Successful - Account Activated',
-            recipients=[user.email],
-            body=f'''
+    # Queue email verification success notification with the update
+    queue_email(
+        '✅ Email Verification Successful - Account Activated',
+        [user.email],
+        f'''
 ✅ EMAIL VERIFICATION SUCCESSFUL ✅
 
 Hello {user.first_name},
@@ -546,11 +512,11 @@ Thank you for joining us!
 
 Best regards,
 Your Task Management Team
-            '''
-        )
-        mail.send(success_msg)
-    except Exception as e:
-        print(f"Email verification success notification error: {e}")
+        '''
+    )
+    
+    db.session.commit()
+    user_cache.invalidate(user.id)
     
     flash('Your email has been verified successfully! You can now log in.', 'success')
     return redirect(url_for('auth.login'))
@@ -563,6 +529,9 @@ def resend_verification():
     
     if request.method == 'POST':
         email = request.form.get('email')
+        retry_after = rate_limiter.check("resend_verification", email)
+        if retry_after:
+            return rate_limited(retry_after, 'resend_verification.html')
         user = User.query.filter_by(email=email).first()
         
         if user and not user.email_verified:
@@ -579,16 +548,14 @@ def resend_verification():
                 expires_at=expires_at
             )
             db.session.add(verification_token)
-            db.session.commit()
             
-            # Send verification email
+            # Queue verification email with the token
             try:
                 verification_url = url_for('auth.verify_email', token=token, _external=True)
-                from flask_mail import Message
-                msg = Message(
+                queue_email(
                     'Verify Your Email - Task Management System',
-                    recipients=[user.email],
-                    body=f'''
+                    [user.email],
+                    f'''
 Hello {user.first_name},
 
 You requested a new verification link for your account.
@@ -604,9 +571,10 @@ Best regards,
 Your Task Management Team
                     '''
                 )
-                mail.send(msg)
+                db.session.commit()
                 flash('Verification email has been sent. Please check your email.', 'success')
             except Exception as e:
+                db.session.rollback()
                 flash('Failed to send verification email. Please try again later.', 'danger')
                 print(f"Email sending error: {e}")
         else:
@@ -658,6 +626,7 @@ def verify_otp():
                     flash('Login successful!', 'success')
                 
                 db.session.commit()
+                user_cache.invalidate(user.id)
                 
                 # Clear session
                 session.pop('otp_user_id', None)
@@ -669,6 +638,10 @@ def verify_otp():
                 flash('Invalid or expired OTP code. Please try again.', 'danger')
         
         elif form.resend_otp.data:  # Resend OTP button clicked
+            retry_after = rate_limiter.check("resend_otp", user.email)
+            if retry_after:
+                return rate_limited(retry_after, 'verify_otp.html', form=form, user_email=user.email)
+            
             # Generate new OTP
             otp_code = str(random.randint(100000, 999999))
             expires_at = datetime.utcnow() + timedelta(minutes=1)
@@ -683,19 +656,17 @@ def verify_otp():
                 expires_at=expires_at
             )
             db.session.add(login_otp)
-            db.session.commit()
             
-            # Send new OTP email
+            # Queue new OTP email with the code
             try:
-                from flask_mail import Message
                 email_subject = 'New Login OTP - Task Management System'
                 if not user.email_verified:
                     email_subject = 'New Email Verification & Login OTP - Task Management System'
                 
-                msg = Message(
+                queue_email(
                     email_subject,
-                    recipients=[user.email],
-                    body=f'''
+                    [user.email],
+                    f'''
 Hello {user.first_name},
 
 Your new login OTP code is: {otp_code}
@@ -710,9 +681,10 @@ Best regards,
 Your Task Management Team
                     '''
                 )
-                mail.send(msg)
+                db.session.commit()
                 flash('New OTP sent to your email.', 'success')
             except Exception as e:
+                db.session.rollback()
                 flash('Failed to resend OTP. Please try again later.', 'danger')
                 print(f"OTP resend error: {e}")
     
@@ -736,22 +708,24 @@ def delete_account():
             flash('Please confirm that you understand this action is permanent.', 'danger')
             return render_template('delete_account.html')
         
-        # Proceed with account deletion
-        user_id = current_user.id
-        success, message = delete_user_data(user_id)
-        
-        if success:
-            # Logout user before redirecting
-            logout_user()
-            flash('Your account has been successfully deleted. All your data has been permanently removed.', 'success')
-            return redirect(url_for('auth.login'))
-        else:
-            flash(f'Error deleting account: {message}', 'danger')
-            return render_template('delete_account.html')
+        # The data is removed in the background; the user only waits for the job row
+        job = request_account_deletion(current_user)
+        db.session.commit()
+        user_cache.invalidate(job.user_id)
+        logout_user()
+        flash('Your account deletion has started. All your data is being permanently removed.', 'success')
+        return redirect(url_for('auth.account_deletion_status', token=job.token))
     
     return render_template('delete_account.html')
 
 
+@auth_bp.route('/account-deletion/<token>')
+def account_deletion_status(token):
+    """Show the progress of a queued account deletion"""
+    job = AccountDeletion.query.filter_by(token=token).first_or_404()
+    return render_template('account_deletion_status.html', job=job)
+
+
 @auth_bp.route('/authenticate-email/<token>')
 def authenticate_email(token):
     """Handle email authentication and direct login"""
@@ -781,21 +755,11 @@ def authenticate_email(token):
     else:
         flash('Login successful!', 'success')
     
-    db.session.commit()
-    
-    # Clear any pending authentication session
-    session.pop('auth_user_id', None)
-    
-    # Login user
-    login_user(user)
-    
-    # Send login success notification
-    try:
-        from flask_mail import Message
-        success_msg = Message(
-            '✅ Login Successful - Security Notification',
-            recipients=[user.email],
-            body=f'''
+    # Queue login success notification with the update
+    queue_email(
+        '✅ Login Successful - Security Notification',
+        [user.email],
+        f'''
 ✅ LOGIN SUCCESSFUL ✅
 
 Hello {user.first_name},
@@ -816,11 +780,17 @@ If you did not perform this login, please contact our security team immediately.
 Best regards,
 Your Task Management Team
 Security Department
-            '''
-        )
-        mail.send(success_msg)
-    except Exception as e:
-        print(f"Login success notification error: {e}")
+        '''
+    )
+    
+    db.session.commit()
+    user_cache.invalidate(user.id)
+    
+    # Clear any pending authentication session
+    session.pop('auth_user_id', None)
+    
+    # Login user
+    login_user(user)
     
     return redirect(url_for('tasks.view_task'))
 
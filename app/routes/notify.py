@@ -1,22 +1,23 @@
 from flask import Blueprint, flash, redirect, url_for
 from flask_login import login_required, current_user
-from flask_mail import Message
-from app import mail
+from app import db
+from app.outbox import queue_email
 
 notify_bp = Blueprint("notify", __name__)
 
 @notify_bp.route("/notify-me")
 @login_required
 def notify_me():
-    """Send an email to the currently logged-in user."""
+    """Queue an email to the currently logged-in user."""
     try:
-        msg = Message(
-            subject="Hello from Task Manager",
-            recipients=[current_user.email],
-            body=f"Hi {current_user.first_name},\n\nThis is your personal notification."
+        queue_email(
+            "Hello from Task Manager",
+            [current_user.email],
+            f"Hi {current_user.first_name},\n\nThis is your personal notification."
         )
-        mail.send(msg)
-        flash("Email sent successfully!", "success")
+        db.session.commit()
+        flash("Email queued successfully!", "success")
     except Exception as e:
+        db.session.rollback()
         flash(f"Error sending email: {e}", "error")
     return redirect(url_for("tasks.dashboard"))  # change to any page you like
@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, flash, url_for, redirect, session
+from flask import Blueprint, render_template, request, flash, url_for, redirect, session, current_app
 from flask_login import login_required, current_user
 from app import db
-from app.models import Task, TaskHistory, Reminder
+from app.models import Task, TaskHistory, Reminder, TaskArchive, TaskHistoryArchive
 from app.forms import TaskForm
+from app.reminders import schedule_after_commit
+from app.pagination import paginate_tiers
+from app.database import read_db
+from app.archive import restore_task
+from app.bulk import clear_tasks, delete_task
 from datetime import datetime, date, time, timedelta
 
 
@@ -17,7 +22,7 @@ def log_task_history(task, action, details=None):
         details=details
     )
     if task:
-        history.set_task_data(task)
+        history.set_task_data(task, current_app.config['HISTORY_SNAPSHOT_INTERVAL'])
     db.session.add(history)
 
 def create_task_reminder(task):
@@ -39,8 +44,7 @@ def create_task_reminder(task):
     if remind_at > datetime.utcnow():
         # Check if reminder already exists for this task
         existing_reminder = Reminder.query.filter_by(
-            user_id=task.user_id,
-            message=f"Task Reminder: {task.title}"
+            task_id=task.id
         ).filter(
             Reminder.remind_at.between(remind_at - timedelta(minutes=1), remind_at + timedelta(minutes=1))
         ).first()
@@ -48,19 +52,19 @@ def create_task_reminder(task):
         if not existing_reminder:
             reminder = Reminder(
                 user_id=task.user_id,
+                task_id=task.id,
                 message=f"Task Reminder: {task.title}",
                 remind_at=remind_at
             )
             db.session.add(reminder)
+            db.session.flush()  # Get the reminder ID for the scheduler
+            schedule_after_commit(reminder)
             print(f"Created reminder for task '{task.title}' at {remind_at}")
 
 def update_task_reminder(task):
     """Update or create reminder for a task when it's edited"""
     # Delete existing reminders for this task
-    Reminder.query.filter_by(
-        user_id=task.user_id,
-        message=f"Task Reminder: {task.title}"
-    ).delete()
+    Reminder.query.filter_by(task_id=task.id).delete()
     
     # Create new reminder if task has scheduled date
     create_task_reminder(task)
@@ -68,8 +72,18 @@ def update_task_reminder(task):
 @tasks_bp.route('/')
 @login_required
 def view_task():
-    
-    tasks = Task.query.filter_by(user_id=current_user.id).order_by(Task.priority.desc(), Task.scheduled_date.asc(), Task.scheduled_time.asc()).all()
+    # Keyset pagination on the (user_id, priority_rank, scheduled_date, scheduled_time)
+    # index of both the hot and the archive tier
+    tasks = paginate_tiers(
+        [
+            (read_db.query(Task).filter_by(user_id=current_user.id),
+             [Task.priority_rank, Task.scheduled_date, Task.scheduled_time, Task.id]),
+            (read_db.query(TaskArchive).filter_by(user_id=current_user.id),
+             [TaskArchive.priority_rank, TaskArchive.scheduled_date, TaskArchive.scheduled_time, TaskArchive.id]),
+        ],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['TASKS_PER_PAGE']
+    )
     form = TaskForm()
     return render_template('tasks.html', tasks=tasks, form=form)
 
@@ -147,17 +161,8 @@ def clear_task(task_id):
         flash('You can only delete your own tasks', 'danger')
         return redirect(url_for('tasks.view_task'))
     
-    # Log task deletion before deleting
-    log_task_history(task, 'deleted', f'Task "{task.title}" deleted')
-    
-    # Delete associated reminders
-    Reminder.query.filter_by(
-        user_id=task.user_id,
-        message=f"Task Reminder: {task.title}"
-    ).delete()
-    
-    db.session.delete(task)
-    db.session.commit()
+    # Same history policy as clear_all: log the deletion, keep earlier entries
+    delete_task(task.id)
     flash('Task cleared successfully', 'success')
     return redirect(url_for('tasks.view_task'))
 
@@ -237,18 +242,26 @@ def edit_task():
     flash('Task updated successfully', 'success')
     return redirect(url_for('tasks.view_task'))
 
-@tasks_bp.route('/clear_all', methods=['POST'])
+@tasks_bp.route('/restore/<int:archive_id>', methods=['POST'])
 @login_required
-def clear_all_tasks():
-    # Get all tasks before deleting to log them
-    tasks_to_delete = Task.query.filter_by(user_id=current_user.id).all()
+def restore_archived_task(archive_id):
+    archived = TaskArchive.query.get_or_404(archive_id)
+    if archived.user_id != current_user.id:
+        flash('You can only restore your own tasks', 'danger')
+        return redirect(url_for('tasks.view_task'))
     
-    # Log deletion for each task
-    for task in tasks_to_delete:
-        log_task_history(task, 'deleted', f'Task "{task.title}" deleted (bulk delete)')
+    task = restore_task(archived)
+    log_task_history(task, 'updated', f'Task "{task.title}" restored from archive')
     
-    Task.query.filter_by(user_id=current_user.id).delete()
     db.session.commit()
+    flash('Task restored from archive', 'success')
+    return redirect(url_for('tasks.view_task'))
+
+@tasks_bp.route('/clear_all', methods=['POST'])
+@login_required
+def clear_all_tasks():
+    # Set-based and chunked: history, reminders and tasks in a few statements per chunk
+    clear_tasks(current_user.id)
     flash('All tasks cleared successfully', 'success')
     return redirect(url_for('tasks.view_task'))
 
@@ -256,8 +269,16 @@ def clear_all_tasks():
 @login_required
 def task_history():
     """View task history for the current user"""
-    history = TaskHistory.query.filter_by(user_id=current_user.id)\
-        .order_by(TaskHistory.created_at.desc())\
-        .limit(100).all()  # Limit to last 100 entries
+    history = paginate_tiers(
+        [
+            (read_db.query(TaskHistory).filter_by(user_id=current_user.id),
+             [TaskHistory.created_at, TaskHistory.id]),
+            (read_db.query(TaskHistoryArchive).filter_by(user_id=current_user.id),
+             [TaskHistoryArchive.created_at, TaskHistoryArchive.id]),
+        ],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['HISTORY_PER_PAGE'],
+        descending=True
+    )
     
     return render_template('task_history.html', history=history)
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Per-process cache for Flask-Login's user loader.
+
+Every authenticated request used to load the full ``User`` row before the
+view ran. The loader now returns a ``CachedUser``: a detached, read-only copy
+of the columns views and templates use, kept in an LRU of at most
+``USER_CACHE_SIZE`` entries for ``USER_CACHE_TTL_SECONDS``.
+
+The auth routes call ``user_cache.invalidate`` after committing a password
+reset, an email verification or an account deletion request. The cache is
+per process, so other workers pick such changes up when their entry expires;
+the TTL bounds how long that takes. Setting it to 0 disables the cache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from app import db
+
+
+class CachedUser(UserMixin):
+    """Detached snapshot of the ``User`` columns used as ``current_user``."""
+
+    FIELDS = ("id", "username", "first_name", "last_name", "email", "phone_no", "email_verified")
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    def __repr__(self):
+        return f"<CachedUser {self.username}>"
+
+
+def load_user_record(user_id):
+    """Return a ``CachedUser`` for ``user_id``, or None.
+
+    Accounts queued for deletion are treated as gone, which logs them out
+    everywhere.
+    """
+    from app.models import User
+    from app.account_deletion import pending_deletion_for
+
+    row = db.session.execute(
+        select(*[getattr(User, field) for field in CachedUser.FIELDS]).where(
+            User.id == user_id,
+            ~pending_deletion_for(User.id)
+        )
+    ).first()
+    return CachedUser(**row._mapping) if row is not None else None
+
+
+class UserCache:
+    """Thread-safe LRU cache with a time-to-live."""
+
+    def __init__(self):
+        self.max_size = 1024
+        self.ttl = 60.0
+        self._entries = OrderedDict()  # user id -> (expires at, CachedUser)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load racing with one is not stored
+        self._generation = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        app.config.setdefault("USER_CACHE_SIZE", 1024)
+        app.config.setdefault("USER_CACHE_TTL_SECONDS", 60)
+        self.max_size = int(app.config["USER_CACHE_SIZE"])
+        self.ttl = float(app.config["USER_CACHE_TTL_SECONDS"])
+        self.clear()
+        with self._lock:
+            self._reset_stats()
+        app.extensions["user_cache"] = self
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, user_id, load=load_user_record):
+        """Return the cached user for ``user_id``, calling ``load`` on a miss.
+
+        Misses are not cached: with SQLite a new account may reuse the id of
+        a deleted one.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        user = load(user_id)
+        if user is None or not self.enabled:
+            return user
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[user_id] = (now + self.ttl, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return user
+
+    def invalidate(self, user_id):
+        """Drop ``user_id`` so the next request reloads it from the database."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the hit rate since startup."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+user_cache = UserCache()
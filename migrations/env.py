@@ -97,6 +97,16 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # The app turns on SQLite foreign keys for every connection. Batch
+        # migrations rebuild a table by copying, dropping and renaming it,
+        # and with enforcement on the drop would delete (ON DELETE CASCADE)
+        # or refuse to delete the rows that reference it. The pragma has no
+        # effect inside a transaction, hence the commit.
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +116,10 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+            connection.commit()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
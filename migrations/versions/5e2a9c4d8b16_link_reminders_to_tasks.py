@@ -0,0 +1,43 @@
+"""Link reminders to tasks by foreign key
+
+Revision ID: 5e2a9c4d8b16
+Revises: 3b8d1f0c7a21
+Create Date: 2026-10-17 11:03:27.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c4d8b16'
+down_revision = '3b8d1f0c7a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('task_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_reminder_task_id'), ['task_id'], unique=False)
+        batch_op.create_foreign_key('fk_reminder_task_id_task', 'task', ['task_id'], ['id'], ondelete='CASCADE')
+
+    # Backfill from the "Task Reminder: <title>" message convention
+    op.execute("""
+        UPDATE reminder
+        SET task_id = (
+            SELECT task.id FROM task
+            WHERE task.user_id = reminder.user_id
+              AND 'Task Reminder: ' || task.title = reminder.message
+            ORDER BY task.id DESC
+            LIMIT 1
+        )
+        WHERE task_id IS NULL AND message LIKE 'Task Reminder: %'
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('reminder', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_reminder_task_id_task', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_reminder_task_id'))
+        batch_op.drop_column('task_id')
@@ -0,0 +1,44 @@
+"""Add numeric priority_rank to task for index-ordered listing
+
+Revision ID: 9a6f3e2c1d84
+Revises: 7c41e0b9d352
+Create Date: 2026-10-17 15:20:51.183946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6f3e2c1d84'
+down_revision = '7c41e0b9d352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority_rank', sa.Integer(), nullable=False, server_default='2'))
+
+    op.execute("""
+        UPDATE task SET priority_rank = CASE priority
+            WHEN 'Urgent' THEN 0
+            WHEN 'High' THEN 1
+            WHEN 'Medium' THEN 2
+            WHEN 'Low' THEN 3
+            ELSE 2
+        END
+    """)
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_user_priority_schedule')
+        batch_op.create_index('ix_task_user_priority_rank_schedule', ['user_id', 'priority_rank', 'scheduled_date', 'scheduled_time'], unique=False)
+
+
+def downgrade():
+    # recreate='never': rebuilding the table trips over the legacy quoted
+    # server default on task.priority, and SQLite can drop the column in place
+    with op.batch_alter_table('task', schema=None, recreate='never') as batch_op:
+        batch_op.drop_index('ix_task_user_priority_rank_schedule')
+        batch_op.create_index('ix_task_user_priority_schedule', ['user_id', 'priority', 'scheduled_date', 'scheduled_time'], unique=False)
+        batch_op.drop_column('priority_rank')
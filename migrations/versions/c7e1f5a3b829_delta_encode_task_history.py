@@ -0,0 +1,65 @@
+"""Store task history snapshots as JSON deltas against a base snapshot
+
+Revision ID: c7e1f5a3b829
+Revises: b4d2e7a9c135
+Create Date: 2026-10-17 18:05:37.914622
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1f5a3b829'
+down_revision = 'b4d2e7a9c135'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('task_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('base_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_task_history_base_id'), ['base_id'], unique=False)
+
+    # Existing rows become full snapshots
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE task_history SET data = CAST(task_data AS JSON) WHERE task_data IS NOT NULL")
+    else:
+        op.execute("UPDATE task_history SET data = task_data WHERE task_data IS NOT NULL")
+
+    with op.batch_alter_table('task_history', schema=None) as batch_op:
+        batch_op.drop_column('task_data')
+
+
+def downgrade():
+    with op.batch_alter_table('task_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('task_data', sa.TEXT(), nullable=True))
+
+    # Expand deltas back into full JSON snapshots
+    bind = op.get_bind()
+    history = sa.table(
+        'task_history',
+        sa.column('id', sa.Integer),
+        sa.column('data', sa.JSON),
+        sa.column('base_id', sa.Integer),
+        sa.column('task_data', sa.Text),
+    )
+    rows = bind.execute(
+        sa.select(history.c.id, history.c.data, history.c.base_id).where(history.c.data.isnot(None))
+    ).all()
+    snapshots = {row.id: row.data for row in rows if row.base_id is None}
+    for row in rows:
+        data = row.data
+        if row.base_id is not None:
+            data = {**snapshots.get(row.base_id, {}), **data}
+        bind.execute(
+            history.update().where(history.c.id == row.id).values(task_data=json.dumps(data))
+        )
+
+    with op.batch_alter_table('task_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_task_history_base_id'))
+        batch_op.drop_column('base_id')
+        batch_op.drop_column('data')
@@ -0,0 +1,117 @@
+"""
+Shared fixtures.
+
+Every test module gets its own application on a fresh SQLite database,
+seeded with ``user0``..``user2`` (password ``password``), twenty tasks each
+with their creation history and a due reminder, and an expired login link
+per user. The background threads ``create_app()`` starts are stopped
+straight away, so tests drive the workers and jobs themselves, and the
+process-wide singletons are reset before every test.
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+os.environ["WTF_CSRF_ENABLED"] = "False"
+
+from app import create_app, db, scheduler  # noqa: E402
+
+
+def stop_background_services():
+    """Stop every thread ``create_app()`` starts and drop the scheduled jobs."""
+    from app.account_deletion import account_deleter
+    from app.leader import leader_election
+    from app.outbox import outbox_workers
+    from app.passwords import passwords
+    from app.reminders import reminder_engine
+
+    leader_election.stop()
+    reminder_engine.stop()
+    outbox_workers.stop()
+    account_deleter.stop()
+    passwords.shutdown()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    scheduler.remove_all_jobs()
+
+
+def seed():
+    from app.models import User, Task, TaskHistory, Reminder, LoginOTP
+
+    now = datetime.utcnow()
+    for index in range(3):
+        user = User(
+            username=f"user{index}",
+            first_name=f"User{index}",
+            last_name="Test",
+            email=f"user{index}@gmail.com",
+            phone_no=f"555000{index:04d}",
+            email_verified=True
+        )
+        user.set_password("password")
+        db.session.add(user)
+        db.session.flush()
+        for task_index in range(20):
+            task = Task(
+                title=f"Task {index}-{task_index}",
+                status=["Pending", "In Progress", "Completed"][task_index % 3],
+                priority=["Low", "Medium", "High", "Urgent"][task_index % 4],
+                scheduled_date=date.today() + timedelta(days=task_index),
+                scheduled_time=time(9, 0),
+                user_id=user.id
+            )
+            db.session.add(task)
+            db.session.flush()
+            history = TaskHistory(task_id=task.id, user_id=user.id, action="created")
+            history.set_task_data(task)
+            db.session.add(history)
+            db.session.add(Reminder(
+                user_id=user.id,
+                task_id=task.id,
+                message=f"Task Reminder: {task.title}",
+                remind_at=now - timedelta(minutes=task_index)
+            ))
+        db.session.add(LoginOTP(user_id=user.id, otp_code="123456", expires_at=now - timedelta(hours=1)))
+    db.session.commit()
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    from app.database import read_db
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db')}/site.db"
+    app = create_app()
+    stop_background_services()
+    app.config["TESTING"] = True
+    # .env may hold real SMTP credentials; nothing is ever sent from tests
+    app.extensions["mail"].suppress = True
+    with app.app_context():
+        seed()
+    yield app
+    stop_background_services()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+        read_db.engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def reset_singletons(request):
+    """Give each test fresh rate limits, user cache, hashing pool and metrics."""
+    if "app" not in request.fixturenames:
+        yield
+        return
+    from app.metrics import metrics
+    from app.passwords import passwords
+    from app.ratelimit import rate_limiter
+    from app.user_cache import user_cache
+
+    app = request.getfixturevalue("app")
+    rate_limiter.init_app(app)
+    user_cache.init_app(app)
+    passwords.init_app(app)
+    metrics.reset()
+    yield
+    passwords.shutdown()
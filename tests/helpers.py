@@ -0,0 +1,117 @@
+"""Helpers shared by the test modules."""
+
+import itertools
+import re
+import threading
+
+from sqlalchemy import event
+
+from app import db
+
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+HAS_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+SEEK_TO_CURSOR = re.compile(r"USING INDEX \w+ \(user_id=\? AND \w+[<>]")
+ITEM_ID = re.compile(r'data-(?:task|history)-id="(\d+)"')
+
+_phone_numbers = itertools.count(5551000000)
+
+
+class StatementRecorder:
+    """Collect SQL issued from the current thread, including on the read-only engine."""
+
+    def __init__(self, engine):
+        from app.database import read_db
+
+        self.engines = {engine, read_db.engine}
+        self.statements = []
+        self._thread = threading.get_ident()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != self._thread or executemany:
+            return
+        if statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+
+def query_plan(app, statement, parameters):
+    """Return the detail column of EXPLAIN QUERY PLAN for one statement."""
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            connection.close()
+
+
+def full_scans(app, statements):
+    """Return (statement, plan line) pairs for statements that scan a whole table."""
+    offenders = []
+    for statement, parameters in statements:
+        if not HAS_WHERE.search(statement):
+            continue
+        for detail in query_plan(app, statement, parameters):
+            match = FULL_SCAN.match(detail)
+            # Schema introspection reads the catalog, not application data
+            if match and not match.group(1).startswith("sqlite_"):
+                offenders.append((" ".join(statement.split()), detail))
+    return offenders
+
+
+def add_user(username, password="password", **fields):
+    """Create a verified user; call inside an app context. Returns the user."""
+    from app.models import User
+
+    values = dict(
+        username=username, first_name=username.capitalize(), last_name="Test",
+        email=f"{username}@gmail.com", phone_no=str(next(_phone_numbers)), email_verified=True,
+    )
+    values.update(fields)
+    user = User(**values)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def login(client, username):
+    """Log ``client`` in as ``username`` without going through the login form."""
+    from app.models import User
+
+    with client.application.app_context():
+        user_id = User.query.filter_by(username=username).first().id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return user_id
+
+
+def walk_pages(client, path, statements, item_pattern=ITEM_ID):
+    """Follow the "load more" links from ``path``; return the items rendered per page."""
+    cursor_link = re.compile(r'href="[^"]*\?after=([\w-]+)"')
+    pages = []
+    url = path
+    while url:
+        with StatementRecorder(db.engine) as recorder:
+            response = client.get(url)
+        assert response.status_code == 200
+        statements.extend(recorder.statements)
+        html = response.get_data(as_text=True)
+        pages.append([
+            int(value) if value.isdigit() else value
+            for value in dict.fromkeys(item_pattern.findall(html))
+        ])
+        match = cursor_link.search(html)
+        url = f"{path}?after={match.group(1)}" if match else None
+    return pages
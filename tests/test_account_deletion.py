@@ -0,0 +1,95 @@
+"""Background account deletion."""
+
+from datetime import datetime
+
+from app import db
+from tests.helpers import StatementRecorder, add_user, full_scans, login
+
+
+def test_account_deletion_runs_in_chunks(app):
+    from app.account_deletion import account_deleter
+    from app.models import (
+        User, Task, TaskHistory, Reminder, LoginOTP, PasswordResetToken, AccountDeletion, OutboxMessage
+    )
+
+    with app.app_context():
+        user = add_user("leaving")
+        for index in range(10):
+            task = Task(title=f"Leaving {index}", user_id=user.id)
+            db.session.add(task)
+            db.session.flush()
+            history = TaskHistory(task_id=task.id, user_id=user.id, action="created")
+            history.set_task_data(task)
+            db.session.add(history)
+            db.session.add(Reminder(user_id=user.id, task_id=task.id, message="", remind_at=datetime.utcnow()))
+        db.session.add(PasswordResetToken(user_id=user.id, token="reset-leaving", expires_at=datetime.utcnow()))
+        db.session.commit()
+        engine = db.engine
+
+    # The worker thread is stopped by the fixture; drive it from this thread
+    # so its statements can be recorded
+    app.config["ACCOUNT_DELETION_CHUNK_SIZE"] = 4
+    try:
+        client = app.test_client()
+        user_id = login(client, "leaving")
+        response = client.post("/delete-account", data={
+            "username_confirmation": "leaving", "confirm_deletion": "on"
+        })
+        assert response.status_code == 302
+        status_url = response.headers["Location"]
+
+        # The request only queued the job and logged the user out
+        with app.app_context():
+            assert Task.query.filter_by(user_id=user_id).count() == 10
+        assert client.get("/").status_code == 302
+        assert b"Deleting Your Account" in client.get(status_url).data
+
+        with app.app_context(), StatementRecorder(engine) as recorder:
+            assert account_deleter.run_pending() == 1
+    finally:
+        app.config["ACCOUNT_DELETION_CHUNK_SIZE"] = 1000
+
+    with app.app_context():
+        job = AccountDeletion.query.filter_by(user_id=user_id).one()
+        assert job.status == "done"
+        assert job.summary["tasks"] == 10 and job.summary["task history"] == 10
+        assert job.rows_deleted == 10 + 10 + 10 + 1
+        assert (job.username, job.email, job.full_name) == (None, None, None)
+        confirmation = OutboxMessage.query.filter(OutboxMessage.subject.like("%Account Successfully Deleted%")).one()
+        assert confirmation.get_recipients() == ["leaving@gmail.com"] and "leaving" in confirmation.body
+        assert db.session.get(User, user_id) is None
+        for model in (Task, TaskHistory, Reminder, LoginOTP, PasswordResetToken):
+            assert model.query.filter_by(user_id=user_id).count() == 0
+    page = client.get(status_url).data
+    assert b"Account Deleted" in page
+    # The page needs only the token, so it must not name the deleted account
+    assert b"leaving" not in page
+
+    # Each chunk deletes at most ACCOUNT_DELETION_CHUNK_SIZE rows through an index
+    deletes = [s for s, _ in recorder.statements if s.lstrip().upper().startswith("DELETE")]
+    assert all("LIMIT" in s for s in deletes if "FROM user " not in s)
+    assert full_scans(app, recorder.statements) == []
+
+
+def test_failed_deletion_is_logged_and_kept_for_retry(app, caplog, monkeypatch):
+    from app.account_deletion import AccountDeletionWorker, account_deleter, request_account_deletion
+    from app.models import AccountDeletion, User
+
+    def fail(self, model, user_id, chunk_size):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(AccountDeletionWorker, "_delete_chunk", fail)
+    with app.app_context():
+        user = add_user("stuck")
+        user_id = user.id
+        job = request_account_deletion(user)
+        db.session.commit()
+        with caplog.at_level("INFO", logger=app.logger.name):
+            assert account_deleter.run_pending() == 1
+
+        job = db.session.get(AccountDeletion, job.id)
+        assert (job.status, job.attempts, job.username) == ("failed", 1, "stuck")
+        assert db.session.get(User, user_id) is not None
+    [record] = [record for record in caplog.records if record.name == app.logger.name]
+    assert record.levelname == "ERROR" and record.exc_info
+    assert f"user {user_id} failed" in record.getMessage()
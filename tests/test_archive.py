@@ -0,0 +1,74 @@
+"""Cold-storage tier for old history and long-completed tasks."""
+
+import re
+from datetime import date, datetime, timedelta
+
+from app import db
+from tests.helpers import StatementRecorder, add_user, full_scans, login, walk_pages
+
+
+def test_archive_tier_is_merged_into_views(app):
+    from app.archive import archive_cold_data
+    from app.models import Task, TaskHistory, TaskArchive, TaskHistoryArchive
+
+    task_title = re.compile(r'class="task-title">([^<]+)<')
+    history_details = re.compile(r'class="history-description">([^<]+)<')
+    long_ago = datetime.utcnow() - timedelta(days=400)
+
+    with app.app_context():
+        user_id = add_user("archived").id
+        for index in range(12):
+            task = Task(
+                title=f"Chore {index}",
+                status="Completed" if index % 2 else "Pending",
+                priority=["Low", "Urgent", "High"][index % 3],
+                scheduled_date=date(2020, 1, 1) + timedelta(days=index),
+                user_id=user_id
+            )
+            db.session.add(task)
+            db.session.flush()
+            task.updated_at = long_ago
+            history = TaskHistory(
+                task_id=task.id, user_id=user_id, action="created",
+                details=f"Chore {index} created", created_at=long_ago + timedelta(minutes=index)
+            )
+            history.set_task_data(task)
+            db.session.add(history)
+        db.session.commit()
+
+    client = app.test_client()
+    login(client, "archived")
+    app.config.update(TASKS_PER_PAGE=4, HISTORY_PER_PAGE=5)
+    try:
+        with app.app_context():
+            statements = []
+            tasks_before = walk_pages(client, "/", statements, task_title)
+            history_before = walk_pages(client, "/history", statements, history_details)
+
+            with StatementRecorder(db.engine) as recorder:
+                archive_cold_data(app)
+            statements.extend(recorder.statements)
+
+            assert Task.query.filter_by(user_id=user_id).count() == 6
+            assert TaskArchive.query.filter_by(user_id=user_id).count() == 6
+            assert TaskHistory.query.filter_by(user_id=user_id).count() == 0
+            assert TaskHistoryArchive.query.filter_by(user_id=user_id).count() == 12
+
+            tasks_after = walk_pages(client, "/", statements, task_title)
+            history_after = walk_pages(client, "/history", statements, history_details)
+    finally:
+        app.config.update(TASKS_PER_PAGE=50, HISTORY_PER_PAGE=100)
+
+    # Both tiers read as one list, in the same order and with the same page breaks
+    assert tasks_after == tasks_before
+    assert history_after == history_before
+    assert full_scans(app, statements) == []
+
+    with app.app_context():
+        archived = TaskArchive.query.filter_by(user_id=user_id).first()
+        title = archived.title
+    assert client.post(f"/restore/{archived.id}").status_code == 302
+    with app.app_context():
+        restored = Task.query.filter_by(user_id=user_id, title=title).one()
+        assert restored.status == "Completed"
+        assert db.session.get(TaskArchive, archived.id) is None
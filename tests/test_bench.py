@@ -0,0 +1,45 @@
+"""Benchmark dataset, load test and job harness."""
+
+import json
+
+
+def test_bench_seed_and_load(app, tmp_path):
+    from app.bench.dataset import seed
+    from app.bench.load import format_comparison, run, save
+    from app.models import Task, TaskHistory, User
+
+    with app.app_context():
+        counts = seed(3, tasks_per_user=8, progress=lambda message: None)
+        assert counts["user"] == 3 and counts["task"] == Task.query.join(User).filter(
+            User.username.like("bench_%")).count()
+        # The newest history entry of every seeded task decodes to the task itself
+        task = Task.query.join(User).filter(User.username.like("bench_%")).first()
+        latest = TaskHistory.query.filter_by(task_id=task.id).order_by(TaskHistory.id.desc()).first()
+        assert latest.get_task_data()["status"] == task.status
+
+    report = run(app, clients=2, duration=1.0)
+    assert report["total"]["errors"] == 0 and report["total"]["count"] > 0
+    assert report["operations"]["view_task"]["queries_per_op"] >= 1
+    path = save(report, tmp_path / "run.json")
+    assert "view_task" in format_comparison(report, json.loads(path.read_text()))
+
+
+def test_bench_jobs_against_smtp_sink(app):
+    from app.bench.jobs import format_report, run
+
+    real_mail = app.extensions["mail"]
+    report = run(app, reminders=12, users=4, tokens=9, smtp_failure_rate=0.0,
+                 smtp_disconnect_rate=0.2, random_seed=3, progress=lambda message: None)
+    # Dropped sessions are reconnected and retried, so every email still arrives
+    jobs = report["jobs"]
+    assert jobs["reminders"]["emails"] == jobs["reminders"]["items"] >= 12
+    assert jobs["digest"]["emails"] == 4 and jobs["digest"]["errors"] == 0
+    assert jobs["cleanup"]["removed"] >= 9 and jobs["cleanup"]["emails"] == 0
+    assert all(job["queries"] > 0 and job["peak_memory_mb"] is not None for job in jobs.values())
+    assert "reminders" in format_report(report)
+    # The real mail settings are back afterwards
+    assert app.extensions["mail"] is real_mail and app.config["MAIL_SERVER"] != "127.0.0.1"
+
+    report = run(app, jobs=("digest",), users=4, smtp_failure_rate=1.0, progress=lambda message: None)
+    digest = report["jobs"]["digest"]
+    assert (digest["emails"], digest["rejected"], digest["errors"]) == (0, 4, 4)
@@ -0,0 +1,66 @@
+"""Set-based task deletes."""
+
+from datetime import datetime
+
+from app import db
+from tests.helpers import StatementRecorder, full_scans, login
+
+
+def test_clear_all_is_set_based(app):
+    from app.models import Task, TaskHistory, Reminder
+
+    client = app.test_client()
+    user_id = login(client, "user2")
+    with app.app_context():
+        titles = sorted(task.title for task in Task.query.filter_by(user_id=user_id))
+        task_ids = [task.id for task in Task.query.filter_by(user_id=user_id)]
+        assert Reminder.query.filter(Reminder.task_id.in_(task_ids)).count() > 0
+        engine = db.engine
+
+    app.config["BULK_CHUNK_SIZE"] = 7
+    try:
+        with StatementRecorder(engine) as recorder:
+            assert client.post("/clear_all").status_code == 302
+    finally:
+        app.config["BULK_CHUNK_SIZE"] = 2000
+
+    with app.app_context():
+        assert Task.query.filter_by(user_id=user_id).count() == 0
+        assert Reminder.query.filter(Reminder.task_id.in_(task_ids)).count() == 0
+        assert TaskHistory.query.filter(TaskHistory.task_id.in_(task_ids)).count() == 0
+        deleted = TaskHistory.query.filter_by(user_id=user_id, action="deleted").all()
+        assert sorted(entry.get_task_data()["title"] for entry in deleted) == titles
+        assert all(entry.details == f'Task "{entry.get_task_data()["title"]}" deleted (bulk delete)' for entry in deleted)
+
+    # A fixed number of statements per chunk, not per task
+    chunks = -(-len(task_ids) // 7)
+    writes = [s for s, _ in recorder.statements if not s.lstrip().upper().startswith("SELECT")]
+    assert len(writes) == 4 * chunks
+    assert full_scans(app, recorder.statements) == []
+
+
+def test_single_delete_keeps_history_like_clear_all(app):
+    from app.models import Task, TaskHistory, Reminder, task_snapshot
+
+    client = app.test_client()
+    user_id = login(client, "user1")
+    with app.app_context():
+        task = Task.query.filter_by(user_id=user_id).first()
+        # Microseconds must survive the SQL-built snapshot
+        task.created_at = datetime(2026, 1, 2, 3, 4, 5, 678901)
+        db.session.commit()
+        task_id, snapshot = task.id, task_snapshot(task)
+        history_ids = [entry.id for entry in TaskHistory.query.filter_by(task_id=task_id)]
+        assert history_ids and Reminder.query.filter_by(task_id=task_id).count() == 1
+
+    assert client.post(f"/clear/{task_id}").status_code == 302
+
+    with app.app_context():
+        assert db.session.get(Task, task_id) is None
+        assert Reminder.query.filter_by(task_id=task_id).count() == 0
+        # Earlier entries are kept but detached, as clear_all does
+        kept = TaskHistory.query.filter(TaskHistory.id.in_(history_ids)).all()
+        assert len(kept) == len(history_ids) and all(entry.task_id is None for entry in kept)
+        deleted = TaskHistory.query.filter_by(user_id=user_id, action="deleted").one()
+        assert deleted.details == f'Task "{snapshot["title"]}" deleted'
+        assert deleted.get_task_data() == snapshot
@@ -0,0 +1,140 @@
+"""SQLite profile, read-only engine and per-dialect engine options."""
+
+import os
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from tests.helpers import login
+
+
+def test_sqlite_profile_and_read_only_engine(app):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    from app.database import read_db
+
+    with app.app_context():
+        pragmas = {
+            name: db.session.execute(text(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store", "foreign_keys")
+        }
+        db.session.rollback()
+        assert pragmas == {
+            "journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "temp_store": 2, "foreign_keys": 1
+        }
+
+        assert read_db.engine is not db.engine
+        with pytest.raises(OperationalError):
+            read_db.session.execute(text("DELETE FROM task"))
+        read_db.session.rollback()
+
+    # The list and history pages read through the read-only engine only
+    client = app.test_client()
+    login(client, "user0")
+    reads = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM task" in statement:
+            reads.append(statement)
+
+    event.listen(read_db.engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/").status_code == 200
+        assert client.get("/history").status_code == 200
+    finally:
+        event.remove(read_db.engine, "before_cursor_execute", record)
+    assert any("FROM task_history" in statement for statement in reads)
+    assert any(re.search(r"FROM task\b", statement) for statement in reads)
+
+
+def test_engine_options_per_dialect_and_pool_stats(app):
+    from app.database import engine_options, pool_stats
+
+    unset = {}
+    sqlite = engine_options("sqlite:////tmp/site.db", unset)
+    assert "pool_pre_ping" not in sqlite and sqlite["pool_size"] == 5
+    assert engine_options("sqlite://", unset) == {}
+
+    postgres = engine_options("postgresql+psycopg://app:secret@db/tasks", {
+        "DB_POOL_SIZE": 20, "DB_POOL_PRE_PING": False,
+        "DB_CONNECT_TIMEOUT": 5, "DB_STATEMENT_TIMEOUT_MS": 3000,
+    })
+    assert postgres["pool_size"] == 20 and postgres["pool_pre_ping"] is False
+    assert postgres["pool_recycle"] == 1800 and postgres["pool_use_lifo"]
+    assert postgres["connect_args"]["connect_timeout"] == 5
+    assert postgres["connect_args"]["options"] == "-c statement_timeout=3000"
+    assert engine_options("mysql+pymysql://app@db/tasks", unset)["pool_recycle"] == 280
+
+    client = app.test_client()
+    login(client, "user0")
+    assert client.get("/").status_code == 200
+    stats = pool_stats()
+    assert set(stats) == {"primary", "read"}
+    for engine_stats in stats.values():
+        assert engine_stats["dialect"] == "sqlite"
+        assert engine_stats["checkouts"] >= 1
+        assert engine_stats["checked_out"] <= engine_stats["peak_checked_out"]
+
+
+_POSTGRES_SMOKE = """
+import json, os
+from app import create_app, db
+from app.database import pool_stats
+from app.models import Task, TaskHistory, User
+
+app = create_app()
+app.config["TESTING"] = True
+app.extensions["mail"].suppress = True
+with app.app_context():
+    db.drop_all()
+    db.create_all()
+    user = User(username="pg", first_name="P", last_name="G", email="pg@example.com",
+                phone_no="5550000000", email_verified=True)
+    user.set_password("password")
+    db.session.add(user)
+    db.session.commit()
+    user_id = user.id
+
+client = app.test_client()
+with client.session_transaction() as session:
+    session["_user_id"] = str(user_id)
+    session["_fresh"] = True
+client.post("/add", data={"title": "On Postgres", "priority": "High"})
+statuses = [client.get("/").status_code, client.get("/history").status_code,
+            client.post("/clear_all").status_code]
+with app.app_context():
+    result = {
+        "statuses": statuses,
+        "tasks": Task.query.count(),
+        "history": [entry.action for entry in TaskHistory.query.order_by(TaskHistory.id)],
+        "dialect": pool_stats()["primary"]["dialect"],
+    }
+    # drop_all() uses its own connection, which would wait on this session's locks
+    db.session.rollback()
+    db.drop_all()
+print(json.dumps(result))
+os._exit(0)
+"""
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL not set")
+def test_app_runs_on_postgres():
+    import json
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    env = dict(os.environ, DATABASE_URL=os.environ["TEST_POSTGRES_URL"], FLASK_DEBUG="0", WTF_CSRF_ENABLED="False")
+    result = subprocess.run(
+        [sys.executable, "-c", _POSTGRES_SMOKE],
+        cwd=Path(__file__).resolve().parents[1], env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    outcome = json.loads(result.stdout.strip().splitlines()[-1])
+    assert outcome["statuses"] == [200, 200, 302]
+    assert outcome["tasks"] == 0
+    assert outcome["history"] == ["created", "deleted"]
+    assert outcome["dialect"] == "postgresql"
@@ -0,0 +1,49 @@
+"""Periodic task digest: chunking, resume cursor and throttle."""
+
+from datetime import date
+
+from app import db
+from tests.helpers import add_user
+
+
+def test_digest_resumes_from_its_cursor(app):
+    from app.jobs import jobs, load_state
+    from app.models import JobState, Task, User
+
+    with app.app_context():
+        JobState.query.filter_by(key="periodic_notifications").delete()
+        user = add_user("elsewhere", email="elsewhere@example.com")
+        db.session.add(Task(title="Not mailed", status="Pending", scheduled_date=date.today(), user_id=user.id))
+        db.session.commit()
+        user_ids = [
+            user.id for user in User.query.filter(User.username.in_(["user0", "user1", "user2"])).order_by(User.id)
+        ]
+
+    def run_digest():
+        with app.app_context():
+            with app.extensions["mail"].record_messages() as outgoing:
+                jobs.run("send_periodic_notifications")
+            return [message.recipients for message in outgoing], load_state("periodic_notifications", {})
+
+    job = jobs._jobs["send_periodic_notifications"]
+    # One user per chunk, and a zero budget stops each run after its first chunk
+    app.config["DIGEST_CHUNK_SIZE"] = 1
+    job.budget, budget = 0, job.budget
+    try:
+        runs = [run_digest() for _ in range(3)]
+    finally:
+        app.config["DIGEST_CHUNK_SIZE"] = 500
+        job.budget = budget
+
+    assert [recipients for recipients, _ in runs] == [[["user0@gmail.com"]], [["user1@gmail.com"]], [["user2@gmail.com"]]]
+    assert [state["cursor"] for _, state in runs] == user_ids
+    assert "last_sent" not in runs[0][1]
+
+    # The last chunk belongs to a user outside DIGEST_EMAIL_PATTERN; then the run completes
+    recipients, state = run_digest()
+    assert recipients == []
+    assert state["cursor"] == 0 and state["last_sent"]
+
+    # A complete run throttles the next one
+    recipients, state = run_digest()
+    assert recipients == [] and state["cursor"] == 0
@@ -0,0 +1,47 @@
+"""Delta-encoded task history."""
+
+from datetime import datetime, timedelta
+
+from app import db
+from tests.helpers import StatementRecorder, full_scans, login
+
+
+def test_history_deltas_round_trip(app):
+    from app.archive import archive_cold_data
+    from app.models import Task, TaskHistory, TaskHistoryArchive
+
+    client = app.test_client()
+    user_id = login(client, "user1")
+    with app.app_context():
+        engine = db.engine
+    with StatementRecorder(engine) as recorder:
+        client.post("/add", data={"title": "Deltas", "priority": "Low"})
+        with app.app_context():
+            task_id = Task.query.filter_by(user_id=user_id, title="Deltas").one().id
+        for _ in range(11):
+            client.post("/toggle", data={"task_id": task_id})
+    assert full_scans(app, recorder.statements) == []
+
+    statuses = ["Pending", "In Progress", "Completed"]
+    expected = [statuses[index % 3] for index in range(12)]
+    with app.app_context():
+        entries = TaskHistory.query.filter_by(task_id=task_id).order_by(TaskHistory.id).all()
+        assert [entry.get_task_data()["status"] for entry in entries] == expected
+        # One full snapshot every HISTORY_SNAPSHOT_INTERVAL entries, deltas in between
+        assert [entry.base_id is None for entry in entries] == [i % 10 == 0 for i in range(12)]
+        assert all(set(entry.data) <= {"status", "updated_at"} for entry in entries if entry.base_id)
+
+        # Archiving a snapshot re-bases the deltas that are still hot
+        long_ago = datetime.utcnow() - timedelta(days=400)
+        for entry in entries[:4]:
+            entry.created_at = long_ago
+        db.session.commit()
+        archive_cold_data(app)
+        db.session.expire_all()
+        db.session.expunge_all()
+
+        hot = TaskHistory.query.filter_by(task_id=task_id).order_by(TaskHistory.id).all()
+        assert [entry.get_task_data()["status"] for entry in hot] == expected[4:]
+        assert hot[0].base_id is None
+        archived = TaskHistoryArchive.query.filter_by(task_id=task_id).order_by(TaskHistoryArchive.id).all()
+        assert [entry.get_task_data()["status"] for entry in archived] == expected[:4]
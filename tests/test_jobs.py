@@ -0,0 +1,42 @@
+"""Scheduler job framework."""
+
+from datetime import datetime
+
+from app import db
+from tests.helpers import StatementRecorder
+
+
+def test_job_framework_guards_and_times_runs(app):
+    from app.jobs import jobs
+    from app.models import LoginOTP, User
+
+    with app.app_context():
+        user_id = User.query.filter_by(username="user0").first().id
+        for index in range(6):
+            db.session.add(LoginOTP(user_id=user_id, otp_code=f"gc{index}", expires_at=datetime.utcnow()))
+        db.session.commit()
+        engine = db.engine
+
+    # The first run reads the table list for every job
+    assert jobs.run("sync_reminders")
+    job = jobs._jobs["cleanup_expired_tokens"]
+    # A zero budget stops the run after its first chunk
+    app.config["TOKEN_GC_BATCH_SIZE"] = 2
+    job.budget, budget = 0, job.budget
+    try:
+        with StatementRecorder(engine) as recorder:
+            assert jobs.run("cleanup_expired_tokens")
+    finally:
+        app.config["TOKEN_GC_BATCH_SIZE"] = 1000
+        job.budget = budget
+
+    stats = jobs.stats()["cleanup_expired_tokens"]
+    assert stats["runs"] == 1 and stats["last_items"] == 2 and stats["over_budget"] == 1
+    assert stats["last_duration"] is not None
+    # ...later runs do not introspect the schema again
+    assert not any("sqlite_master" in s for s, _ in recorder.statements)
+
+    # A run that starts while the previous one holds the lock is skipped
+    with job.lock:
+        assert not jobs.run("cleanup_expired_tokens")
+    assert jobs.stats()["cleanup_expired_tokens"]["skipped"] == 1
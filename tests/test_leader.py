@@ -0,0 +1,32 @@
+"""Scheduler leader election."""
+
+from datetime import datetime, timedelta
+
+from app import db
+
+
+def test_scheduler_lease_has_one_holder(app):
+    from app.leader import LeaderElection
+    from app.models import SchedulerLease
+
+    # The fixture stopped this process's own election, so only these two compete
+    first, second = LeaderElection(), LeaderElection()
+    for election in (first, second):
+        election.init_app(app, app.apscheduler)
+
+    with app.app_context():
+        SchedulerLease.query.delete()
+        db.session.commit()
+
+        assert first._try_acquire()
+        first.is_leader = True
+        assert not second._try_acquire()
+        # The holder renews its own lease
+        assert first._try_acquire()
+
+        # Once the leader stops heartbeating, the lease expires and moves on
+        SchedulerLease.query.update({SchedulerLease.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert second._try_acquire()
+        assert not first._try_acquire()
+        assert db.session.get(SchedulerLease, "scheduler").holder == second.holder_id
@@ -0,0 +1,122 @@
+"""Batched SMTP delivery against a fake connection."""
+
+import smtplib
+
+import pytest
+from flask_mail import Message
+
+
+class FakeConnection:
+    """Stands in for ``flask_mail.Connection``; ``failures`` are raised by the next sends."""
+
+    def __init__(self, server):
+        self.server = server
+        self.sent = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def send(self, message):
+        if self.server.failures:
+            raise self.server.failures.pop(0)
+        self.sent.append(message.subject)
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections = []
+        self.failures = []
+
+    def connect(self):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+
+@pytest.fixture
+def server(monkeypatch):
+    from app import mailer
+
+    server = FakeServer()
+    monkeypatch.setattr(mailer.mail, "connect", server.connect)
+    return server
+
+
+def messages(count):
+    return [Message(f"Message {index}", recipients=["someone@gmail.com"], body="Body") for index in range(count)]
+
+
+def test_one_connection_is_reused_for_the_batch(app, server):
+    from app.mailer import BatchMailer
+
+    with app.app_context():
+        with BatchMailer(max_per_connection=100) as mailer:
+            for message in messages(5):
+                mailer.send(message)
+
+    assert len(server.connections) == 1
+    assert server.connections[0].sent == [f"Message {index}" for index in range(5)]
+    assert server.connections[0].closed
+    assert (mailer.sent, mailer.connections_opened, mailer.reconnects) == (5, 1, 0)
+
+
+def test_connection_is_rotated_at_the_cap(app, server):
+    from app.mailer import BatchMailer
+
+    with app.app_context():
+        with BatchMailer(max_per_connection=2) as mailer:
+            for message in messages(5):
+                mailer.send(message)
+
+    assert [len(connection.sent) for connection in server.connections] == [2, 2, 1]
+    assert all(connection.closed for connection in server.connections)
+    assert (mailer.sent, mailer.connections_opened, mailer.reconnects) == (5, 3, 0)
+
+
+@pytest.mark.parametrize("error", [
+    smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+    smtplib.SMTPResponseException(421, b"Service not available, closing channel"),
+])
+def test_dropped_connection_is_retried_once(app, server, error):
+    from app.mailer import BatchMailer
+
+    with app.app_context():
+        with BatchMailer() as mailer:
+            mailer.send(messages(1)[0])
+            server.failures.append(error)
+            mailer.send(Message("Retried", recipients=["someone@gmail.com"], body="Body"))
+
+    assert len(server.connections) == 2
+    assert server.connections[0].closed
+    assert server.connections[1].sent == ["Retried"]
+    assert (mailer.sent, mailer.connections_opened, mailer.reconnects) == (2, 2, 1)
+
+
+def test_rejected_message_is_not_retried(app, server):
+    from app.mailer import BatchMailer
+
+    with app.app_context():
+        with BatchMailer() as mailer:
+            server.failures.append(smtplib.SMTPRecipientsRefused({"someone@gmail.com": (550, b"No such user")}))
+            with pytest.raises(smtplib.SMTPRecipientsRefused):
+                mailer.send(messages(1)[0])
+
+    assert len(server.connections) == 1
+    assert mailer.reconnects == 0
+
+
+def test_gives_up_after_max_reconnects(app, server):
+    from app.mailer import BatchMailer
+
+    with app.app_context():
+        with BatchMailer(max_reconnects=2) as mailer:
+            server.failures.extend(smtplib.SMTPServerDisconnected("gone") for _ in range(3))
+            with pytest.raises(smtplib.SMTPServerDisconnected):
+                mailer.send(messages(1)[0])
+
+    assert len(server.connections) == 3
+    assert (mailer.sent, mailer.reconnects) == (0, 2)
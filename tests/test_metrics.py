@@ -0,0 +1,35 @@
+"""Prometheus metrics endpoint."""
+
+import re
+
+from tests.helpers import login
+
+
+def test_metrics_endpoint(app):
+    from app.jobs import jobs
+    from app.metrics import metrics
+
+    client = app.test_client()
+    login(client, "user1")
+    assert client.get("/").status_code == 200
+    jobs.run("cleanup_expired_tokens")
+    metrics.reminder_lag.observe(2.0)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    for line in text.splitlines():
+        assert line.startswith("# ") or re.match(r'^[a-z_]+(\{[^}]*\})? \S+$', line), line
+    assert 'http_request_duration_seconds_bucket{endpoint="tasks.view_task",method="GET",le="+Inf"}' in text
+    assert 'job_duration_seconds_count{job="cleanup_expired_tokens"}' in text
+    assert re.search(r'^reminder_dispatch_lag_seconds_count [1-9]', text, re.M)
+    assert re.search(r'^db_pool_checkouts_total\{engine="primary"\} [1-9]', text, re.M)
+
+    # Not served to other hosts without a token; with one it is required
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 404
+    app.config["METRICS_TOKEN"] = "secret"
+    try:
+        assert client.get("/metrics").status_code == 404
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+    finally:
+        app.config["METRICS_TOKEN"] = ""
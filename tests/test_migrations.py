@@ -0,0 +1,98 @@
+"""Data migrations, run against a hand-built copy of the schema they expect."""
+
+import importlib.util
+from pathlib import Path
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, event, text
+
+from app.database import _pragma_listener, sqlite_pragmas
+
+VERSIONS = Path(__file__).resolve().parents[1] / "migrations" / "versions"
+
+
+def load_migration(revision):
+    [path] = VERSIONS.glob(f"{revision}_*.py")
+    spec = importlib.util.spec_from_file_location(f"migration_{revision}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(engine, step):
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            step()
+
+
+def test_reminders_are_linked_to_their_tasks(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/site.db")
+    with engine.begin() as connection:
+        for statement in (
+            "CREATE TABLE user (id INTEGER PRIMARY KEY)",
+            "CREATE TABLE task (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id), title VARCHAR(100))",
+            "CREATE TABLE reminder (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id), message VARCHAR(255))",
+            "INSERT INTO user (id) VALUES (1), (2)",
+            "INSERT INTO task (id, user_id, title) VALUES (1, 1, 'Report'), (2, 1, 'Report'), (3, 2, 'Report')",
+            """INSERT INTO reminder (id, user_id, message) VALUES
+                (1, 1, 'Task Reminder: Report'), (2, 2, 'Task Reminder: Report'),
+                (3, 1, 'Task Reminder: Gone'), (4, 1, 'Call the bank')""",
+        ):
+            connection.execute(text(statement))
+
+    migration = load_migration("5e2a9c4d8b16")
+    run(engine, migration.upgrade)
+
+    with engine.connect() as connection:
+        linked = dict(connection.execute(text("SELECT id, task_id FROM reminder ORDER BY id")).all())
+    # The newest task of the same user with the matching title; nothing for the rest
+    assert linked == {1: 2, 2: 3, 3: None, 4: None}
+
+    # With the app's pragmas, deleting a task deletes its reminders
+    event.listen(engine, "connect", _pragma_listener(sqlite_pragmas({"SQLITE_PROFILE": "default"})))
+    engine.dispose()
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM task WHERE id = 2"))
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT id FROM reminder ORDER BY id")).scalars().all() == [2, 3, 4]
+
+    run(engine, migration.downgrade)
+    with engine.connect() as connection:
+        columns = [row[1] for row in connection.execute(text("PRAGMA table_info(reminder)"))]
+    assert columns == ["id", "user_id", "message"]
+    engine.dispose()
+
+
+def test_user_foreign_keys_cascade_after_a_rebuild(tmp_path):
+    migration = load_migration("d2a8f4b6e913")
+    engine = create_engine(f"sqlite:///{tmp_path}/site.db")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE user (id INTEGER PRIMARY KEY)"))
+        # The legacy task table, with the quoted default SQLite will not copy as is
+        connection.execute(text(
+            'CREATE TABLE task (id INTEGER NOT NULL, user_id INTEGER, '
+            'priority VARCHAR(6) NOT NULL DEFAULT "Medium", '
+            'PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id))'
+        ))
+        for table in migration.USER_TABLES[1:]:
+            connection.execute(text(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES user (id))"))
+        connection.execute(text("INSERT INTO user (id) VALUES (1)"))
+        connection.execute(text("INSERT INTO task (id, user_id) VALUES (1, 1)"))
+
+    def on_delete():
+        with engine.connect() as connection:
+            return {
+                table: [row[6] for row in connection.execute(text(f"PRAGMA foreign_key_list({table})"))]
+                for table in migration.USER_TABLES
+            }
+
+    run(engine, lambda: migration._replace_user_fks("CASCADE"))
+    assert on_delete() == {table: ["CASCADE"] for table in migration.USER_TABLES}
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO task (id, user_id) VALUES (2, 1)"))
+        assert connection.execute(text("SELECT id, priority FROM task ORDER BY id")).all() == [(1, "Medium"), (2, "Medium")]
+
+    run(engine, lambda: migration._replace_user_fks(None))
+    assert on_delete() == {table: ["NO ACTION"] for table in migration.USER_TABLES}
+    engine.dispose()
@@ -0,0 +1,171 @@
+"""Outbox claiming, retries and retention."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def outbox(app):
+    from app.models import OutboxMessage
+    from app.outbox import outbox_workers
+
+    with app.app_context():
+        OutboxMessage.query.delete()
+        db.session.commit()
+    outbox_workers._wakeup.clear()
+    yield outbox_workers
+    with app.app_context():
+        OutboxMessage.query.delete()
+        db.session.commit()
+
+
+def add_message(subject, **fields):
+    from app.models import OutboxMessage
+
+    values = dict(subject=subject, body="Body", status="pending", attempts=0, next_attempt_at=datetime.utcnow())
+    values.update(fields)
+    message = OutboxMessage(**values)
+    message.set_recipients(["someone@gmail.com"])
+    db.session.add(message)
+    db.session.commit()
+    return message.id
+
+
+def test_claim_token_keeps_a_batch_to_one_worker(app, outbox):
+    from app.models import OutboxMessage
+
+    with app.app_context():
+        due = [add_message(f"Due {index}") for index in range(3)]
+        add_message("Later", next_attempt_at=datetime.utcnow() + timedelta(hours=1))
+
+        batch = outbox._claim_batch()
+        assert sorted(message.id for message in batch) == due
+        assert {message.status for message in batch} == {"sending"}
+        assert len({message.claimed_by for message in batch}) == 1
+        # Another worker finds nothing left to claim
+        assert outbox._claim_batch() == []
+        assert OutboxMessage.query.filter_by(status="pending").count() == 1
+
+
+def test_stale_claim_is_reclaimed(app, outbox):
+    from app.models import OutboxMessage
+
+    timeout = app.config["OUTBOX_CLAIM_TIMEOUT"]
+    with app.app_context():
+        now = datetime.utcnow()
+        stale = add_message("Stale", status="sending", claimed_by="dead-worker",
+                            claimed_at=now - timedelta(seconds=timeout + 1))
+        add_message("Busy", status="sending", claimed_by="live-worker", claimed_at=now)
+
+        batch = outbox._claim_batch()
+        assert [message.id for message in batch] == [stale]
+        assert batch[0].claimed_by != "dead-worker"
+        assert OutboxMessage.query.filter_by(claimed_by="live-worker").count() == 1
+
+
+def test_failures_back_off_exponentially_then_give_up(app, outbox, monkeypatch):
+    from app.mailer import BatchMailer
+    from app.models import OutboxMessage
+
+    def refuse(self, message):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+    monkeypatch.setattr(BatchMailer, "send", refuse)
+    base = app.config["OUTBOX_RETRY_BASE_SECONDS"]
+    max_attempts = app.config["OUTBOX_MAX_ATTEMPTS"]
+    with app.app_context():
+        message_id = add_message("Flaky")
+        for attempt in range(1, max_attempts):
+            before = datetime.utcnow()
+            assert outbox.drain_once() == 1
+            message = db.session.get(OutboxMessage, message_id)
+            assert (message.status, message.attempts) == ("pending", attempt)
+            assert "SMTP server unavailable" in message.last_error
+            delay = (message.next_attempt_at - before).total_seconds()
+            expected = base * 2 ** (attempt - 1)
+            assert expected * 0.8 - 1 <= delay <= expected * 1.2 + 1
+            # Not retried before it is due again
+            assert outbox.drain_once() == 0
+            message.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+
+        assert outbox.drain_once() == 1
+        message = db.session.get(OutboxMessage, message_id)
+        assert (message.status, message.attempts) == ("failed", max_attempts)
+        assert outbox.drain_once() == 0
+
+
+def test_delivery_marks_message_sent(app, outbox):
+    from app.models import OutboxMessage
+
+    with app.app_context():
+        message_id = add_message("Hello")
+        with app.extensions["mail"].record_messages() as outgoing:
+            assert outbox.drain_once() == 1
+        message = db.session.get(OutboxMessage, message_id)
+        assert (message.status, message.attempts, message.claimed_by) == ("sent", 1, None)
+        assert message.sent_at is not None
+        assert [sent.subject for sent in outgoing] == ["Hello"]
+
+
+def test_workers_are_woken_only_after_commit(app, outbox):
+    from app.outbox import queue_email
+
+    with app.app_context():
+        queue_email("Rolled back", ["someone@gmail.com"], "Body")
+        db.session.rollback()
+        assert not outbox._wakeup.is_set()
+        # A later commit must not pick up the discarded flag either
+        db.session.commit()
+        assert not outbox._wakeup.is_set()
+
+        queue_email("Committed", ["someone@gmail.com"], "Body")
+        assert not outbox._wakeup.is_set()
+        db.session.commit()
+        assert outbox._wakeup.is_set()
+
+
+def test_token_cleanup_purges_old_delivered_messages(app, outbox):
+    from app import cleanup_expired_tokens
+    from app.models import OutboxMessage
+
+    retention = timedelta(hours=app.config["OUTBOX_RETENTION_HOURS"])
+    with app.app_context():
+        old = datetime.utcnow() - retention - timedelta(minutes=1)
+        add_message("Old sent", status="sent", attempts=1, next_attempt_at=old, sent_at=old)
+        add_message("Old failed", status="failed", attempts=5, next_attempt_at=old)
+        add_message("Recent sent", status="sent", attempts=1, sent_at=datetime.utcnow())
+        add_message("Old pending", next_attempt_at=old)
+
+    cleanup_expired_tokens(app)
+
+    with app.app_context():
+        assert sorted(message.subject for message in OutboxMessage.query) == ["Old pending", "Recent sent"]
+
+
+def test_racing_first_events_share_one_pending_message(app, outbox):
+    from app.models import OutboxMessage
+    from app.outbox import queue_coalesced_email
+
+    raced = []
+
+    def render(count, first_at):
+        if not raced:
+            # Another request opens the window between the lookup and the insert
+            raced.append(True)
+            with db.engine.begin() as connection:
+                connection.execute(OutboxMessage.__table__.insert().values(
+                    subject="Alert", body="Body", recipients='["someone@gmail.com"]', status="pending",
+                    attempts=0, next_attempt_at=datetime.utcnow(), coalesce_key="alert",
+                    coalesced_count=1, created_at=datetime.utcnow(),
+                ))
+        return "Alert", f"{count} events"
+
+    with app.app_context():
+        queue_coalesced_email("alert", ["someone@gmail.com"], 900, render)
+        db.session.commit()
+        [message] = OutboxMessage.query.filter_by(coalesce_key="alert").all()
+        assert (message.status, message.coalesced_count, message.body) == ("pending", 2, "2 events")
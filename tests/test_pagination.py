@@ -0,0 +1,99 @@
+"""Keyset pagination of the task list and history."""
+
+import re
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from tests.helpers import SEEK_TO_CURSOR, add_user, full_scans, login, query_plan, walk_pages
+
+
+def test_keyset_pagination_walks_every_row(app):
+    from app.models import Task, TaskHistory
+
+    client = app.test_client()
+    user_id = login(client, "user2")
+    with app.app_context():
+        # Unscheduled tasks exercise the NULL branches of the keyset filter
+        for index in range(4):
+            db.session.add(Task(
+                title=f"Someday {index}", status="Pending", priority="Medium",
+                scheduled_time=time(12, 0) if index % 2 else None, user_id=user_id
+            ))
+        db.session.commit()
+        expected_tasks = [
+            task.id for task in Task.query.filter_by(user_id=user_id).order_by(
+                Task.priority_rank, Task.scheduled_date, Task.scheduled_time, Task.id
+            )
+        ]
+        expected_history = [
+            entry.id for entry in TaskHistory.query.filter_by(user_id=user_id).order_by(
+                TaskHistory.created_at.desc(), TaskHistory.id.desc()
+            )
+        ]
+
+    app.config.update(TASKS_PER_PAGE=5, HISTORY_PER_PAGE=7)
+    try:
+        with app.app_context():
+            statements = []
+            task_pages = walk_pages(client, "/", statements)
+            history_pages = walk_pages(client, "/history", statements)
+    finally:
+        app.config.update(TASKS_PER_PAGE=50, HISTORY_PER_PAGE=100)
+
+    assert [task_id for page in task_pages for task_id in page] == expected_tasks
+    assert all(len(page) <= 5 for page in task_pages)
+    assert [entry_id for page in history_pages for entry_id in page] == expected_history
+    assert len(history_pages) > 1
+
+    assert full_scans(app, statements) == []
+    for statement, parameters in statements:
+        if "ORDER BY" in statement:
+            details = query_plan(app, statement, parameters)
+            assert not any("TEMP B-TREE" in detail for detail in details), details
+            if " OR " in statement:
+                # Deeper pages seek straight to the cursor instead of walking the index
+                assert any(SEEK_TO_CURSOR.search(detail) for detail in details), details
+
+
+def test_unscheduled_tasks_cross_page_and_tier_boundaries(app):
+    from app.archive import archive_cold_data
+    from app.models import Task
+
+    task_title = re.compile(r'class="task-title">([^<]+)<')
+    day = date(2021, 3, 1)
+    # Every schedule is distinct, so the order is the same whichever tier a task is in
+    schedules = [
+        (None, None), (None, time(9, 0)), (None, time(10, 0)), (day, None),
+        (day, time(9, 0)), (day + timedelta(days=1), None), (day + timedelta(days=1), time(8, 0)),
+    ]
+    with app.app_context():
+        user_id = add_user("unscheduled").id
+        for index, (scheduled_date, scheduled_time) in reversed(list(enumerate(schedules))):
+            task = Task(
+                title=f"Slot {index}", status="Completed" if index % 2 else "Pending", priority="Medium",
+                scheduled_date=scheduled_date, scheduled_time=scheduled_time, user_id=user_id
+            )
+            db.session.add(task)
+            db.session.flush()
+            task.updated_at = datetime.utcnow() - timedelta(days=400)
+        db.session.commit()
+
+    client = app.test_client()
+    login(client, "unscheduled")
+    expected = [f"Slot {index}" for index in range(len(schedules))]
+    app.config.update(TASKS_PER_PAGE=2)
+    try:
+        with app.app_context():
+            statements = []
+            before = walk_pages(client, "/", statements, task_title)
+            archive_cold_data(app)
+            assert Task.query.filter_by(user_id=user_id).count() == 4
+            after = walk_pages(client, "/", statements, task_title)
+    finally:
+        app.config.update(TASKS_PER_PAGE=50)
+
+    assert [title for page in before for title in page] == expected
+    assert [title for page in after for title in page] == expected
+    # The order is spelled out, so the cursor logic holds on PostgreSQL too
+    task_queries = [statement for statement, _ in statements if re.search(r"FROM task(_archive)?\b", statement)]
+    assert task_queries and all("scheduled_date ASC NULLS FIRST" in statement for statement in task_queries)
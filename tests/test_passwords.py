@@ -0,0 +1,70 @@
+"""Password hashing concurrency limit."""
+
+import threading
+
+import pytest
+
+from tests.helpers import add_user
+
+
+def test_login_rehashes_and_sheds_load(app):
+    from app.models import User
+    from app.passwords import passwords
+
+    with app.app_context():
+        passwords.method = "pbkdf2:sha256:1000"
+        add_user("rehash")
+
+    client = app.test_client()
+    passwords.method = "pbkdf2:sha256:2000"
+    response = client.post("/login", data={"username": "rehash", "password": "password"})
+    assert response.status_code == 302 and "/auth-pending" in response.location
+    with app.app_context():
+        assert User.query.filter_by(username="rehash").one().password_hash.startswith("pbkdf2:sha256:2000$")
+
+    # With every slot taken, logins are turned away instead of queueing
+    slots = passwords.workers + passwords.max_pending
+    for _ in range(slots):
+        passwords._slots.acquire()
+    try:
+        response = client.post("/login", data={"username": "rehash", "password": "password"})
+    finally:
+        for _ in range(slots):
+            passwords._slots.release()
+    assert response.status_code == 302 and response.location.endswith("/login")
+    assert passwords.stats()["rejected"] >= 1
+
+
+def test_full_pool_times_out_and_login_falls_back(app):
+    from app.passwords import PasswordHashingBusy, passwords
+
+    with app.app_context():
+        passwords.method = "pbkdf2:sha256:1000"
+        add_user("waiting")
+
+    passwords.configure(method="pbkdf2:sha256:1000", workers=1, max_pending=1, timeout=0.2)
+    rejected = passwords.stats()["rejected"]
+    started, release = threading.Event(), threading.Event()
+
+    def hold_worker():
+        with pytest.raises(PasswordHashingBusy):
+            passwords._run_limited(lambda: started.set() or release.wait(5))
+
+    # Keep the only worker busy until the end of the test
+    holder = threading.Thread(target=hold_worker)
+    holder.start()
+    assert started.wait(5)
+    try:
+        # The one waiting slot is free, but the worker never gets to this check
+        with pytest.raises(PasswordHashingBusy, match="timed out"):
+            passwords.verify("pbkdf2:sha256:1000$salt$hash", "password")
+
+        # That check still holds the waiting slot, so the login is turned away at once
+        client = app.test_client()
+        response = client.post("/login", data={"username": "waiting", "password": "password"})
+        assert response.status_code == 302 and response.location.endswith("/login")
+    finally:
+        release.set()
+        holder.join()
+    # The holder timed out as well
+    assert passwords.stats()["rejected"] - rejected == 3
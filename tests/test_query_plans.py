@@ -0,0 +1,94 @@
+"""
+Query-plan regression tests.
+
+Every statement issued by the task routes and the scheduler jobs is captured
+and run through SQLite's ``EXPLAIN QUERY PLAN``. A test fails if any of them
+falls back to a full table scan instead of using an index.
+"""
+
+import re
+from datetime import date, timedelta
+
+from app import db
+from tests.helpers import StatementRecorder, full_scans, login, query_plan
+
+
+def test_task_routes_use_indexes(app):
+    from app.models import Task
+
+    client = app.test_client()
+    user_id = login(client, "user0")
+    with app.app_context():
+        task_ids = [task.id for task in Task.query.filter_by(user_id=user_id).limit(3)]
+
+    with app.app_context():
+        engine = db.engine
+    with StatementRecorder(engine) as recorder:
+        assert client.get("/").status_code == 200
+        assert client.get("/history").status_code == 200
+        client.post("/add", data={
+            "title": "Planned", "priority": "High",
+            "scheduled_date": (date.today() + timedelta(days=3)).isoformat(),
+            "scheduled_time": "10:30"
+        })
+        client.post("/toggle", data={"task_id": task_ids[0]})
+        client.post("/edit", data={
+            "task_id": task_ids[1], "title": "Renamed", "priority": "Urgent",
+            "scheduled_date": (date.today() + timedelta(days=5)).isoformat(),
+            "scheduled_time": "08:15"
+        })
+        client.post(f"/clear/{task_ids[2]}")
+        client.post("/clear_all")
+
+    assert recorder.statements
+    assert full_scans(app, recorder.statements) == []
+
+
+def test_scheduler_jobs_use_indexes(app):
+    from app import check_reminders, send_periodic_notifications, cleanup_expired_tokens
+    from app.archive import archive_cold_data
+    from app.models import JobState
+    from app.reminders import reminder_engine
+
+    with app.app_context():
+        # Let the digest run regardless of the throttle
+        JobState.query.filter_by(key="periodic_notifications").delete()
+        db.session.commit()
+        engine = db.engine
+    with StatementRecorder(engine) as recorder:
+        reminder_engine.resync()
+        check_reminders(app)
+        send_periodic_notifications(app)
+        cleanup_expired_tokens(app)
+        archive_cold_data(app)
+
+    assert recorder.statements
+    assert full_scans(app, recorder.statements) == []
+
+
+def test_task_list_is_ordered_by_index(app):
+    from app.models import Task
+
+    client = app.test_client()
+    user_id = login(client, "user1")
+
+    with app.app_context():
+        engine = db.engine
+    with StatementRecorder(engine) as recorder:
+        assert client.get("/").status_code == 200
+
+    task_queries = [
+        (statement, parameters) for statement, parameters in recorder.statements
+        if re.search(r"FROM task\b", statement) and "ORDER BY" in statement
+    ]
+    assert len(task_queries) == 1
+    details = query_plan(app, *task_queries[0])
+    assert not any("TEMP B-TREE" in detail for detail in details), details
+
+    with app.app_context():
+        priorities = [
+            task.priority for task in Task.query.filter_by(user_id=user_id).order_by(
+                Task.priority_rank, Task.scheduled_date, Task.scheduled_time, Task.id
+            )
+        ]
+    assert priorities == sorted(priorities, key=["Urgent", "High", "Medium", "Low"].index)
@@ -0,0 +1,45 @@
+"""Per-request and per-job SQL instrumentation."""
+
+import json
+import re
+
+from app import db
+from tests.helpers import login
+
+
+def test_query_stats_per_request_and_job(app, tmp_path):
+    from app.jobs import jobs
+    from app.models import Task
+    from app.query_stats import query_stats
+
+    client = app.test_client()
+    login(client, "user0")
+    app.config["SQL_STATS_HEADER"] = True
+    try:
+        response = client.get("/")
+    finally:
+        app.config["SQL_STATS_HEADER"] = False
+    assert response.status_code == 200
+    assert re.match(r'db;dur=[\d.]+;desc="\d+ queries, 0 repeated"', response.headers["Server-Timing"])
+    assert query_stats.stats()["tasks.view_task"]["queries"] >= 1
+
+    # One lookup per row is flagged; slow statements are logged by parameter type only
+    log = tmp_path / "slow.jsonl"
+    query_stats.slow_log, query_stats.slow_seconds = str(log), 0.0
+    try:
+        with app.app_context():
+            unit = query_stats.begin("n-plus-one")
+            for task_id in range(1, query_stats.threshold + 1):
+                db.session.get(Task, task_id)
+            query_stats.end()
+    finally:
+        query_stats.slow_log, query_stats.slow_seconds = None, 0.2
+    assert unit.repeated(query_stats.threshold)[0][1] == query_stats.threshold
+    assert query_stats.stats()["n-plus-one"]["n_plus_one"] == 1
+    entry = json.loads(log.read_text().splitlines()[-1])
+    assert entry["context"] == "n-plus-one" and entry["parameters"] == ["int"]
+
+    # Job runs record their query counts
+    jobs.run("cleanup_expired_tokens")
+    assert jobs.stats()["cleanup_expired_tokens"]["last_queries"] >= 1
+    assert query_stats.stats()["job:cleanup_expired_tokens"]["runs"] >= 1
@@ -0,0 +1,93 @@
+"""Rate limits on login and email-sending routes."""
+
+import sqlite3
+from datetime import datetime
+
+from tests.helpers import add_user
+
+
+def test_login_is_limited_and_later_failures_coalesce_into_one_alert(app):
+    from app.models import OutboxMessage
+    from app.outbox import outbox_workers
+
+    with app.app_context():
+        user_id = add_user("limited").id
+
+    def alerts():
+        with app.app_context():
+            return OutboxMessage.query.filter_by(coalesce_key=f"failed-login:{user_id}").order_by(OutboxMessage.id).all()
+
+    client = app.test_client()
+    app.config["RATE_LIMIT_LOGIN_ACCOUNT"] = "3/900"
+    try:
+        response = client.post("/login", data={"username": "limited", "password": "wrong"})
+        assert response.status_code == 200
+        # The first failure is alerted right away
+        [first] = alerts()
+        assert first.coalesced_count == 1 and first.next_attempt_at <= datetime.utcnow()
+        with app.app_context(), app.extensions["mail"].record_messages() as outgoing:
+            outbox_workers.drain_once()
+        assert len(outgoing) == 1
+
+        for _ in range(2):
+            response = client.post("/login", data={"username": "limited", "password": "wrong"})
+            assert response.status_code == 200
+        response = client.post("/login", data={"username": "limited", "password": "password"})
+        assert response.status_code == 429 and int(response.headers["Retry-After"]) > 0
+    finally:
+        app.config["RATE_LIMIT_LOGIN_ACCOUNT"] = "10/900"
+
+    # The rest of the window is one held summary that counts them
+    first, summary = alerts()
+    assert first.status == "sent"
+    assert summary.status == "pending" and summary.coalesced_count == 2
+    assert "Failed Login Attempts: 2" in summary.body
+    assert summary.next_attempt_at == summary.coalesce_until == first.coalesce_until > datetime.utcnow()
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    from app.ratelimit import SQLiteStore
+
+    path = str(tmp_path / "ratelimit.db")
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    assert first.hit("key", 2, 60, 1000.0)[0]
+    assert second.hit("key", 2, 60, 1001.0)[0]
+    allowed, count, retry_after = first.hit("key", 2, 60, 1002.0)
+    assert not allowed and count == 2 and retry_after == 58.0
+    assert second.hit("key", 2, 60, 1061.0)[0]
+
+
+def test_sqlite_store_sweeps_by_the_longest_configured_window(tmp_path):
+    from app.ratelimit import SQLiteStore
+
+    path = str(tmp_path / "ratelimit.db")
+    store = SQLiteStore(path, max_window=100.0)
+
+    def keys():
+        with sqlite3.connect(path) as connection:
+            return sorted(row[0] for row in connection.execute("SELECT key FROM rate_limit_hit"))
+
+    store.hit("short", None, 10, 1000.0)
+    store.hit("long", None, 100, 1050.0)
+    # Within SWEEP_INTERVAL of the last sweep: nothing else is touched
+    store.hit("other", None, 10, 1055.0)
+    assert keys() == ["long", "other", "short"]
+    # The next sweep keeps hits younger than the longest window only
+    store.hit("fresh", None, 10, 1120.0)
+    assert keys() == ["fresh", "long", "other"]
+
+    store.clear()
+    assert keys() == []
+
+
+def test_store_errors_fail_open_with_a_warning(app, caplog, monkeypatch):
+    from app.ratelimit import rate_limiter
+
+    def broken(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(rate_limiter.store, "hit", broken)
+    with app.test_request_context("/login", method="POST"), caplog.at_level("WARNING"):
+        assert rate_limiter.check("login", "someone") == 0.0
+    assert "Rate limiter error, allowing request: database is locked" in caplog.text
+    assert rate_limiter.limited == 0
@@ -0,0 +1,188 @@
+"""In-memory reminder dispatch."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from tests.helpers import StatementRecorder
+
+
+@pytest.fixture
+def engine(app):
+    from app.reminders import ReminderEngine, reminder_engine
+
+    engine = ReminderEngine()
+    engine.init_app(app)
+    yield engine
+    engine.stop()
+    app.extensions["reminder_engine"] = reminder_engine
+
+
+def add_reminder(remind_at):
+    from app.models import Reminder, User
+
+    user = User.query.filter_by(username="user0").first()
+    reminder = Reminder(user_id=user.id, message="Later", remind_at=remind_at)
+    db.session.add(reminder)
+    db.session.flush()
+    return reminder
+
+
+def queued_ids(engine):
+    return {reminder_id for _, reminder_id in engine._heap}
+
+
+def test_only_the_leader_loads_the_horizon(app, engine):
+    from app.leader import LeaderElection
+    from app.models import Reminder
+
+    horizon = app.config["REMINDER_HORIZON_MINUTES"]
+    with app.app_context():
+        now = datetime.utcnow()
+        soon = add_reminder(now + timedelta(minutes=horizon - 5)).id
+        later = add_reminder(now + timedelta(minutes=horizon + 5)).id
+        db.session.commit()
+        unsent = Reminder.query.filter(Reminder.sent.is_(False), Reminder.id != later).count()
+
+    election = LeaderElection()
+    election.init_app(app, app.apscheduler)
+    election.on_change(engine.set_leader)
+    # A process that is not the leader holds nothing from the database
+    engine.start()
+    assert engine.pending_count() == 0
+
+    election._set_leader(True)
+    assert soon in queued_ids(engine) and later not in queued_ids(engine)
+    assert engine.pending_count() == unsent
+
+    election._set_leader(False)
+    assert engine.pending_count() == 0
+
+    with app.app_context():
+        Reminder.query.filter(Reminder.id.in_((soon, later))).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_horizon_moves_with_the_clock(app, engine, monkeypatch):
+    from app import reminders
+
+    horizon = timedelta(minutes=app.config["REMINDER_HORIZON_MINUTES"])
+    started = datetime.utcnow()
+    engine.schedule(1, started + horizon - timedelta(minutes=1))
+    engine.schedule(2, started + horizon + timedelta(minutes=10))
+    assert queued_ids(engine) == {1}
+
+    class HalfAnHourLater(datetime):
+        @classmethod
+        def utcnow(cls):
+            return started + timedelta(minutes=30)
+
+    # Without a resync, a reminder created later is still held once it is within the horizon
+    monkeypatch.setattr(reminders, "datetime", HalfAnHourLater)
+    engine.schedule(2, started + horizon + timedelta(minutes=10))
+    engine.schedule(1, started + horizon - timedelta(minutes=1))
+    assert sorted(engine._heap) == [
+        (started + horizon - timedelta(minutes=1), 1),
+        (started + horizon + timedelta(minutes=10), 2),
+    ]
+
+
+def test_reminders_are_scheduled_only_once_committed(app):
+    from app.models import Reminder
+    from app.reminders import reminder_engine, schedule_after_commit
+
+    reminder_engine.set_leader(False)
+    with app.app_context():
+        schedule_after_commit(add_reminder(datetime.utcnow() + timedelta(minutes=5)))
+        db.session.rollback()
+        assert reminder_engine.pending_count() == 0
+
+        reminder = add_reminder(datetime.utcnow() + timedelta(minutes=5))
+        schedule_after_commit(reminder)
+        assert reminder_engine.pending_count() == 0
+        db.session.commit()
+        assert queued_ids(reminder_engine) == {reminder.id}
+
+        Reminder.query.filter_by(id=reminder.id).delete()
+        db.session.commit()
+    reminder_engine.set_leader(False)
+
+
+def test_reminder_is_dispatched_at_its_due_time(app, engine, monkeypatch):
+    import app as app_module
+
+    dispatched = []
+    done = threading.Event()
+
+    def record(app, reminder_ids=None):
+        dispatched.append((reminder_ids, datetime.utcnow()))
+        done.set()
+
+    monkeypatch.setattr(app_module, "check_reminders", record)
+    engine.start()
+    remind_at = datetime.utcnow() + timedelta(seconds=0.3)
+    engine.schedule(42, remind_at)
+    engine.schedule(43, remind_at + timedelta(minutes=30))
+
+    assert done.wait(5)
+    [(reminder_ids, dispatched_at)] = dispatched
+    assert reminder_ids == [42]
+    assert remind_at <= dispatched_at < remind_at + timedelta(seconds=2)
+    assert queued_ids(engine) == {43}
+
+
+def test_due_reminders_are_claimed_in_one_statement(app):
+    from app import _claim_reminders, check_reminders
+    from app.models import Reminder
+
+    with app.app_context():
+        due = Reminder.query.filter(Reminder.sent.is_(False), Reminder.remind_at <= datetime.utcnow()).count()
+        assert due >= 60
+        engine = db.engine
+
+    with app.app_context(), app.extensions["mail"].record_messages() as outgoing:
+        with StatementRecorder(engine) as recorder:
+            check_reminders(app)
+    updates = [s for s, _ in recorder.statements if s.lstrip().upper().startswith("UPDATE REMINDER")]
+    assert len(updates) == 1
+    assert len(outgoing) == due
+
+    with app.app_context():
+        assert Reminder.query.filter(Reminder.sent.is_(False), Reminder.remind_at <= datetime.utcnow()).count() == 0
+        # Explicit ids are claimed once; a second dispatcher gets nothing
+        ids = [add_reminder(datetime.utcnow() - timedelta(minutes=1)).id for _ in range(3)]
+        db.session.commit()
+        claim_token = _claim_reminders(datetime.utcnow(), ids)
+        assert claim_token is not None
+        assert _claim_reminders(datetime.utcnow(), ids) is None
+        assert sorted(r.id for r in Reminder.query.filter_by(claimed_by=claim_token)) == ids
+
+
+def test_dispatch_is_counted_in_query_stats(app, engine):
+    from app.models import Reminder
+    from app.query_stats import query_stats
+
+    def runs():
+        return query_stats.stats().get("job:reminders", {}).get("runs", 0)
+
+    with app.app_context():
+        reminder = add_reminder(datetime.utcnow())
+        db.session.commit()
+        reminder_id = reminder.id
+
+    before = runs()
+    engine.start()
+    engine.schedule(reminder_id, datetime.utcnow())
+    deadline = time.monotonic() + 5
+    while runs() == before and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert runs() == before + 1
+    assert query_stats.stats()["job:reminders"]["queries"] >= 1
+    with app.app_context():
+        assert db.session.get(Reminder, reminder_id).sent
+        Reminder.query.filter_by(id=reminder_id).delete()
+        db.session.commit()
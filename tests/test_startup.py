@@ -0,0 +1,49 @@
+"""Startup schema check."""
+
+from app import db
+
+
+def test_startup_schema_check_reads_migration_head(app):
+    from pathlib import Path
+
+    from sqlalchemy import text
+
+    from app import _check_schema_version, _migration_heads
+
+    heads = _migration_heads(Path(app.root_path).parent / "migrations" / "versions")
+    assert len(heads) == 1
+
+    with app.app_context():
+        # create_all() does not stamp the database
+        assert not _check_schema_version(app)
+        db.session.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        db.session.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": next(iter(heads))})
+        db.session.commit()
+        try:
+            assert _check_schema_version(app)
+        finally:
+            db.session.execute(text("DROP TABLE alembic_version"))
+            db.session.commit()
+
+
+def test_only_migration_commands_skip_create_all(monkeypatch):
+    import sys
+
+    from app import _running_migrations
+
+    monkeypatch.delenv("FLASK_RUN_FROM_CLI", raising=False)
+    monkeypatch.setattr(sys, "argv", ["gunicorn", "db"])
+    assert not _running_migrations()
+
+    monkeypatch.setenv("FLASK_RUN_FROM_CLI", "true")
+    for argv, migrating in [
+        (["flask", "db", "upgrade"], True),
+        (["flask", "--app", "app", "db", "upgrade"], True),
+        (["flask", "-e", "prod.env", "--debug", "db", "migrate"], True),
+        (["flask", "run"], False),
+        (["flask", "--app", "db", "run", "--host", "db"], False),
+        (["flask", "bench", "jobs"], False),
+        (["flask", "shell"], False),
+    ]:
+        monkeypatch.setattr(sys, "argv", argv)
+        assert _running_migrations() is migrating, argv
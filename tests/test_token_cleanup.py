@@ -0,0 +1,52 @@
+"""Expired and used token garbage collection."""
+
+from datetime import datetime, timedelta
+
+from app import db
+from tests.helpers import StatementRecorder, full_scans
+
+
+def test_token_cleanup_is_chunked_and_bounded(app):
+    from app import cleanup_expired_tokens
+    from app.models import User, LoginOTP, PasswordResetToken, EmailVerificationToken
+
+    now = datetime.utcnow()
+    with app.app_context():
+        user_id = User.query.filter_by(username="user0").first().id
+        LoginOTP.query.delete()
+        for index in range(7):
+            db.session.add(LoginOTP(user_id=user_id, otp_code=f"old{index}", expires_at=now - timedelta(minutes=1)))
+            db.session.add(PasswordResetToken(
+                user_id=user_id, token=f"used-{index}", expires_at=now + timedelta(hours=1),
+                used=True, created_at=now - timedelta(days=2)
+            ))
+        db.session.add(LoginOTP(user_id=user_id, otp_code="live", expires_at=now + timedelta(minutes=10)))
+        db.session.add(PasswordResetToken(
+            user_id=user_id, token="used-recently", expires_at=now + timedelta(hours=1),
+            used=True, created_at=now
+        ))
+        db.session.add(EmailVerificationToken(user_id=user_id, token="verify-old", expires_at=now - timedelta(days=1)))
+        db.session.commit()
+        engine = db.engine
+
+    app.config.update(TOKEN_GC_BATCH_SIZE=3, TOKEN_GC_MAX_BATCHES=2)
+    try:
+        with StatementRecorder(engine) as recorder:
+            cleanup_expired_tokens(app)
+        with app.app_context():
+            # Two chunks of three per run; the rest waits for the next run
+            assert LoginOTP.query.count() == 2
+            assert PasswordResetToken.query.filter(PasswordResetToken.token.like("used-%")).count() == 2
+            assert EmailVerificationToken.query.filter_by(token="verify-old").count() == 0
+        cleanup_expired_tokens(app)
+    finally:
+        app.config.update(TOKEN_GC_BATCH_SIZE=1000, TOKEN_GC_MAX_BATCHES=20)
+
+    with app.app_context():
+        assert [otp.otp_code for otp in LoginOTP.query] == ["live"]
+        assert [token.token for token in PasswordResetToken.query.filter(
+            PasswordResetToken.token.like("used-%"))] == ["used-recently"]
+
+    deletes = [s for s, _ in recorder.statements if s.lstrip().upper().startswith("DELETE")]
+    assert all("LIMIT" in s for s in deletes)
+    assert full_scans(app, recorder.statements) == []
@@ -0,0 +1,33 @@
+"""Cached user loader."""
+
+import re
+
+from app import db
+from tests.helpers import StatementRecorder, login
+
+
+def test_user_loader_is_cached_and_invalidated(app):
+    from app.user_cache import user_cache
+
+    client = app.test_client()
+    user_id = login(client, "user1")
+    user_cache.invalidate(user_id)
+    before = user_cache.stats()
+
+    with app.app_context():
+        engine = db.engine
+    with StatementRecorder(engine) as recorder:
+        for _ in range(3):
+            assert client.get("/history").status_code == 200
+    user_loads = [statement for statement, _ in recorder.statements if re.search(r'FROM "?user"?\b', statement)]
+    assert len(user_loads) == 1
+
+    stats = user_cache.stats()
+    assert stats["misses"] - before["misses"] == 1
+    assert stats["hits"] - before["hits"] == 2
+
+    # An invalidated user is read again on the next request
+    user_cache.invalidate(user_id)
+    with StatementRecorder(engine) as recorder:
+        assert client.get("/history").status_code == 200
+    assert any(re.search(r'FROM "?user"?\b', statement) for statement, _ in recorder.statements)